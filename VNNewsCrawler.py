@@ -2,10 +2,15 @@ import argparse
 from utils import utils
 from crawler.factory import get_crawler
 from crawler.crawl_and_import_es import UnifiedCrawler
+from crawler.metrics import start_metrics
 
 
-def main(config_fpath):
+def main(config_fpath, full_sweep=False):
     config = utils.get_config(config_fpath)
+    if full_sweep:
+        config['full_sweep'] = True
+
+    metrics_services = start_metrics(config)
 
     try:
         # Check if unified mode (multiple crawlers)
@@ -21,11 +26,15 @@ def main(config_fpath):
         print("\nStopped")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        for service in metrics_services:
+            service.close()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="VN Military News Crawler")
     parser.add_argument("--config", default="config_quansu.yml", help="Config file")
+    parser.add_argument("--full-sweep", action="store_true", help="Fetch all total_pages listing pages in the first cycle")
 
     args = parser.parse_args()
-    main(args.config)
\ No newline at end of file
+    main(args.config, args.full_sweep)
\ No newline at end of file
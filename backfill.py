@@ -0,0 +1,289 @@
+"""
+Backfill: index the articles already on disk (result/) without re-crawling
+
+    python backfill.py --config config_quansu.yml --workers 8
+    python backfill.py --config config_quansu.yml --reset     # Bỏ checkpoint, index lại từ đầu
+
+Walks the segment stores (<dir>/store) and the legacy url_NNN.txt files
+under --root, parses chunks of articles in a process pool, streams the
+documents to _bulk and records every acknowledged chunk in a checkpoint
+file, so an interrupted run resumes where it stopped. Documents go through
+the indexer's near-duplicate detection like crawled articles (--no-dedup to skip it)
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import json
+import os
+import time
+
+from elasticsearch.helpers import parallel_bulk
+from tqdm import tqdm
+
+from crawler.article_store import SegmentedArticleStore
+from crawler.state_store import CrawlStateStore
+from elastic_indexer import ElasticIndexer, article_to_document, parse_article_content
+from utils.utils import get_config
+
+
+class Checkpoint:
+    """Keys of the chunks already indexed, saved (atomically) at most every interval seconds"""
+
+    def __init__(self, fpath, interval=2.0):
+        self.fpath = fpath
+        self.interval = interval
+        self.done = set()
+        self._saved_at = time.monotonic()
+        if os.path.exists(fpath):
+            with open(fpath, encoding="utf-8") as f:
+                self.done = set(json.load(f)["done"])
+
+    def mark(self, key):
+        self.done.add(key)
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self):
+        tmp_fpath = f"{self.fpath}.tmp"
+        with open(tmp_fpath, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp_fpath, self.fpath)
+        self._saved_at = time.monotonic()
+
+
+def source_of(dpath, root):
+    """Source of the articles below dpath: '<source>_quansu' folder name (or the first folder under root)"""
+    parts = os.path.relpath(dpath, root).split(os.sep)
+    for part in parts:
+        if part.endswith("_quansu"):
+            return part[:-len("_quansu")]
+    return parts[0] if parts[0] != "." else os.path.basename(os.path.abspath(root))
+
+
+def find_tasks(root, chunk_size):
+    """
+    Chunks of work under root, in a stable order:
+    segment stores -> {kind: 'store', offsets of the latest copy of each url},
+    url_NNN.txt files -> {kind: 'files', paths}. The key of a files chunk
+    includes the newest mtime, so rewritten files are indexed again
+    """
+    tasks = []
+    for dpath, dnames, fnames in os.walk(root):
+        dnames.sort()
+        if "manifest.sqlite3" in fnames and "segments" in dnames:
+            store = SegmentedArticleStore(dpath)
+            state_db = os.path.join(os.path.dirname(dpath), "crawl_state.sqlite3")
+            for segment, offsets in sorted(store.latest_locations().items()):
+                for i in range(0, len(offsets), chunk_size):
+                    chunk = offsets[i:i + chunk_size]
+                    tasks.append({
+                        "key": f"store:{dpath}:{segment}:{chunk[0]}-{chunk[-1]}",
+                        "kind": "store",
+                        "path": store.segment_path(segment),
+                        "offsets": chunk,
+                        "state_db": state_db if os.path.exists(state_db) else None,
+                    })
+            store.close()
+            dnames.remove("segments")
+            continue
+
+        files = sorted(f for f in fnames if f.startswith("url_") and f.endswith(".txt"))
+        for i in range(0, len(files), chunk_size):
+            paths = [os.path.join(dpath, f) for f in files[i:i + chunk_size]]
+            mtime = int(max(os.path.getmtime(path) for path in paths))
+            tasks.append({
+                "key": f"files:{dpath}:{files[i]}-{files[min(i + chunk_size, len(files)) - 1]}:{mtime}",
+                "kind": "files",
+                "paths": paths,
+                "source": source_of(dpath, root),
+                # Tên thư mục loại bài = category (như BaseCrawler.category_of)
+                "category": os.path.basename(dpath),
+            })
+    return tasks
+
+
+def task_size(task):
+    return len(task["offsets"]) if task["kind"] == "store" else len(task["paths"])
+
+
+def parse_chunk(task):
+    """Worker process: documents of one chunk (urls only known for store records)"""
+    documents = []
+    if task["kind"] == "store":
+        for article in SegmentedArticleStore.read_records(task["path"], task["offsets"]):
+            documents.append(article_to_document(article))
+    else:
+        for path in task["paths"]:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            # File .txt không lưu url của bài
+            document = parse_article_content(content, task["source"], task["category"], "")
+            if document:
+                documents.append(document)
+    return documents
+
+
+def parsed_chunks(executor, tasks, window):
+    """(task, documents) in task order, at most window chunks parsed ahead (bounded memory)"""
+    futures = collections.deque()
+    tasks = iter(tasks)
+    for task in tasks:
+        futures.append((task, executor.submit(parse_chunk, task)))
+        if len(futures) >= window:
+            break
+    while futures:
+        task, future = futures.popleft()
+        next_task = next(tasks, None)
+        if next_task is not None:
+            futures.append((next_task, executor.submit(parse_chunk, next_task)))
+        yield task, future.result()
+
+
+class Backfill:
+
+    def __init__(self, indexer, checkpoint, workers=4, window=None, bulk_threads=4, bulk_chunk_size=500,
+                 bulk_max_bytes=10 * 1024 * 1024):
+        """
+            indexer: ElasticIndexer (index name, partitions)
+            checkpoint: Checkpoint of the finished chunks
+            workers: Parsing processes
+            window: Chunks parsed ahead of _bulk (default 2 x workers)
+            bulk_threads: Concurrent _bulk requests
+        """
+        self.indexer = indexer
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.window = window or 2 * workers
+        self.bulk_threads = bulk_threads
+        self.bulk_chunk_size = bulk_chunk_size
+        self.bulk_max_bytes = bulk_max_bytes
+        self.stats = {"indexed": 0, "linked": 0, "failed": 0, "chunks": 0, "skipped_chunks": 0}
+        self._state_stores = {}
+
+    def run(self, tasks):
+        pending = [task for task in tasks if task["key"] not in self.checkpoint.done]
+        self.stats["skipped_chunks"] = len(tasks) - len(pending)
+        if not pending:
+            return self.stats
+
+        # Chunk đang chờ ES xác nhận, theo thứ tự: [task, on_indexed của từng action còn chờ, có lỗi, urls]
+        inflight = collections.deque()
+        progress = tqdm(total=sum(task_size(task) for task in pending), unit="doc", desc="backfill")
+
+        def actions():
+            for task, documents in parsed_chunks(executor, pending, self.window):
+                urls = [document["url"] for document in documents if document["url"]]
+                # Như submit_article: xóa bản cũ ở partition khác, bản gần trùng chỉ gắn url vào bài gốc
+                chunk_actions, callbacks = [], collections.deque()
+                for document in documents:
+                    document_actions, on_indexed = self.indexer.document_actions(document)
+                    chunk_actions.extend(document_actions)
+                    callbacks.extend([None] * (len(document_actions) - 1) + [on_indexed])
+                # Đủ callback trước khi gửi action đầu tiên: kết quả có thể về khi chunk chưa gửi hết
+                inflight.append([task, callbacks, False, urls])
+                progress.update(task_size(task) - len(documents))  # Bài rỗng không gửi đi
+                yield from chunk_actions
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for ok, info in parallel_bulk(self.indexer.es, actions(), thread_count=self.bulk_threads,
+                                              chunk_size=self.bulk_chunk_size, max_chunk_bytes=self.bulk_max_bytes,
+                                              raise_on_error=False, raise_on_exception=False):
+                    self._finish_ready(inflight)
+                    head = inflight[0]
+                    on_indexed = head[1].popleft()
+                    op_type, item = next(iter(info.items()))
+                    if op_type == "delete":
+                        # Xóa bản cũ: 404 = không có bản cũ
+                        head[2] = head[2] or not (ok or item.get("status") == 404)
+                        continue
+                    if ok and on_indexed:
+                        on_indexed()
+                    head[2] = head[2] or not ok
+                    self.stats[("linked" if op_type == "update" else "indexed") if ok else "failed"] += 1
+                    progress.update(1)
+                self._finish_ready(inflight)
+            finally:
+                progress.close()
+                self.checkpoint.save()
+                for state_store in self._state_stores.values():
+                    state_store.close()
+        return self.stats
+
+    def _finish_ready(self, inflight):
+        """Checkpoint the leading chunks whose documents were all acknowledged"""
+        while inflight and not inflight[0][1]:
+            task, _, failed, urls = inflight.popleft()
+            self.stats["chunks"] += 1
+            if failed:
+                continue  # Chạy lại lần sau
+            self.checkpoint.mark(task["key"])
+            if task.get("state_db") and urls:
+                # Crawler không crawl lại các bài đã có trên ES
+                if task["state_db"] not in self._state_stores:
+                    self._state_stores[task["state_db"]] = CrawlStateStore(task["state_db"])
+                self._state_stores[task["state_db"]].mark_indexed_many(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the stored articles into Elasticsearch")
+    parser.add_argument("--config", default="config_quansu.yml", help="Config file (es_* keys, output_dpath)")
+    parser.add_argument("--root", help="Directory to walk (default: output_dpath or result)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parsing processes")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Articles per parsing chunk")
+    parser.add_argument("--bulk-threads", type=int, default=4, help="Concurrent _bulk requests")
+    parser.add_argument("--checkpoint", help="Default: <root>/backfill_checkpoint.json")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and index everything again")
+    parser.add_argument("--no-bulk-settings", action="store_true",
+                        help="Keep refresh_interval/replicas unchanged during the load")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Index near-duplicates too instead of linking them to the first copy")
+    args = parser.parse_args()
+
+    config = get_config(args.config)
+    root = args.root or config.get('output_dpath', 'result')
+    checkpoint_fpath = args.checkpoint or os.path.join(root, "backfill_checkpoint.json")
+    if args.reset and os.path.exists(checkpoint_fpath):
+        os.remove(checkpoint_fpath)
+
+    indexer = ElasticIndexer(
+        es_url=config.get('es_url', 'http://localhost:9200'),
+        username=config.get('es_username'),
+        password=config.get('es_password'),
+        index_name=config.get('es_index', 'news_quansu'),
+        partition=config.get('es_partition')
+    )
+    if config.get('dedup', True) and not args.no_dedup:
+        # Cùng SimHash index với crawler (crawl_and_import_es)
+        indexer.enable_dedup(
+            config.get('dedup_db') or os.path.join(config.get('output_dpath', 'result'), "dedup.sqlite3"),
+            max_distance=config.get('dedup_max_distance', 3)
+        )
+
+    tasks = find_tasks(root, args.chunk_size)
+    print(f"{len(tasks)} chunks, {sum(task_size(task) for task in tasks)} articles under {root}")
+
+    backfill = Backfill(indexer, Checkpoint(checkpoint_fpath), workers=args.workers, bulk_threads=args.bulk_threads)
+    start = time.perf_counter()
+    try:
+        with contextlib.nullcontext() if args.no_bulk_settings else indexer.bulk_load():
+            stats = backfill.run(tasks)
+    except KeyboardInterrupt:
+        print("\nInterrupted, checkpoint saved: the next run resumes from here")
+        stats = backfill.stats
+    elapsed = time.perf_counter() - start
+
+    print(f"Indexed {stats['indexed']} documents ({stats['linked']} near-duplicates linked, "
+          f"{stats['failed']} failed) in {elapsed:.1f}s, "
+          f"{stats['indexed'] / elapsed if elapsed else 0:.0f} docs/s; "
+          f"{stats['skipped_chunks']} chunks already done")
+    indexer.close()
+
+
+if __name__ == "__main__":
+    main()
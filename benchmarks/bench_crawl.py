@@ -0,0 +1,259 @@
+"""
+Crawl benchmark against the local fixture server (no live site is hit).
+
+    python -m benchmarks.bench_crawl --crawler all --engine thread async --num-workers 4 16 \
+        --latency 0.05 --jitter 0.02 --error-rate 0.01 --output bench.json
+
+Every (crawler, engine, num_workers, parser) case runs crawl_once in a fresh
+process and reports articles/sec, p50/p99 per stage, peak RSS and CPU time
+as JSON
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.fixture_server import FixtureServer
+from crawler.async_engine import AsyncCrawlEngine
+from crawler.factory import CRAWLERS, get_crawler
+from crawler.metrics import metrics
+from crawler.scheduler import GlobalScheduler
+from utils.date_utils import VN_TZ
+from utils.utils import get_config
+
+
+ARTICLE_TYPE = "the-gioi/quan-su"
+
+
+class StageTimer:
+    """Collects durations per stage and summarises them as percentiles (ms)"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, func):
+        """func timed under stage; stage may be a callable(*args) choosing the stage name"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage(*args) if callable(stage) else stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        stages = {}
+        for stage, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            stages[stage] = {
+                'count': len(samples),
+                'total_s': round(sum(samples), 4),
+                'mean_ms': round(1000 * sum(samples) / len(samples), 3),
+                'p50_ms': round(1000 * percentile(samples, 50), 3),
+                'p99_ms': round(1000 * percentile(samples, 99), 3),
+            }
+        return stages
+
+
+def percentile(sorted_samples, p):
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+class TimedAsyncEngine(AsyncCrawlEngine):
+    """AsyncCrawlEngine recording fetch durations in a StageTimer"""
+
+    def __init__(self, crawlers, timer, fetch_stage, **options):
+        super().__init__(crawlers, **options)
+        self.timer = timer
+        self.fetch_stage = fetch_stage
+
+    async def _fetch(self, crawler, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super()._fetch(crawler, url, **kwargs)
+        finally:
+            self.timer.record(self.fetch_stage(url), time.perf_counter() - start)
+
+
+def listing_paths(crawler_name, total_pages):
+    """Paths of listing pages 1..total_pages as the crawler builds them"""
+    unbound = SimpleNamespace(base_url="")
+    get_listing_url = CRAWLERS[crawler_name].get_listing_url
+    return [get_listing_url(unbound, ARTICLE_TYPE, page) for page in range(1, total_pages + 1)]
+
+
+def instrument(crawler, timer, fetch_stage):
+    """Time the crawler stages used by the thread engine and the global scheduler"""
+    crawler.fetch = timer.wrap(fetch_stage, crawler.fetch)
+    crawler.parse_listing = timer.wrap("parse_listing", crawler.parse_listing)
+    crawler.parse_article = timer.wrap("parse_article", crawler.parse_article)
+    crawler.write_article = timer.wrap("write_article", crawler.write_article)
+    crawler.on_article_written = timer.wrap("record_article", crawler.on_article_written)
+
+
+def run_case(case):
+    """Run one benchmark case (in its own process), return the result dict"""
+    server = FixtureServer(
+        latency=case['latency'], jitter=case['jitter'], error_rate=case['error_rate'], seed=case['seed'],
+        site=case['crawler'], listing_paths=listing_paths(case['crawler'], case['total_pages']),
+        article_type=ARTICLE_TYPE, articles_per_page=case['articles_per_page'],
+        paragraphs=case['paragraphs'], page_kb=case['page_kb'],
+        # Với max_days_old, bài mới nhất đăng lúc chạy benchmark để có một khoảng bài "còn mới"
+        published_at=datetime.now(VN_TZ) if case['max_days_old'] else None)
+    output_dpath = tempfile.mkdtemp(prefix=f"bench_{case['crawler']}_")
+
+    with server:
+        config = dict(case['config'])
+        config.update({
+            'webname': case['crawler'],
+            'base_url': server.base_url,
+            'task': 'type',
+            'article_type': ARTICLE_TYPE,
+            'total_pages': case['total_pages'],
+            'num_workers': case['num_workers'],
+            'html_parser': case['parser'],
+            'output_dpath': output_dpath,
+            'listing_mode': 'full',
+            'continuous_mode': False,
+            'persist_state': False,
+            'enable_elastic': False,
+            'max_days_old': case['max_days_old'],
+        })
+        crawler = get_crawler(**config)
+
+        listing_urls = {server.base_url + path for path in listing_paths(case['crawler'], case['total_pages'])}
+
+        def fetch_stage(url, *args):
+            return "fetch_listing" if url in listing_urls else "fetch_article"
+
+        timer = StageTimer()
+        instrument(crawler, timer, fetch_stage)
+
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        if case['engine'] == "async":
+            engine = TimedAsyncEngine([crawler], timer, fetch_stage, **AsyncCrawlEngine.options_from_config(config))
+            engine.crawl_once()
+        elif case['engine'] == "global":
+            GlobalScheduler([crawler], max_workers=case['num_workers']).crawl_once()
+        else:
+            crawler.crawl_once()
+        wall_time = time.perf_counter() - start
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+
+        articles = crawler.article_store.count() if crawler.article_store else len(crawler.crawled_urls)
+        too_old = metrics.snapshot()['stages'].get('too_old', {}).get(crawler.source, {}).get('outcomes', {})
+        listing_pages = sum(s['count'] for stage, s in timer.summary().items() if stage == "fetch_listing")
+        # Trang danh sách không được tải (dừng theo ngày) không tính
+        expected = listing_pages * case['articles_per_page'] - sum(too_old.values())
+
+    if crawler.article_store:
+        crawler.article_store.close()
+    shutil.rmtree(output_dpath, ignore_errors=True)
+
+    return {
+        'case': {k: case[k] for k in ('crawler', 'engine', 'num_workers', 'parser', 'max_days_old')},
+        'server': {k: case[k] for k in ('latency', 'jitter', 'error_rate', 'total_pages',
+                                         'articles_per_page', 'paragraphs', 'page_kb')},
+        'articles': articles,
+        'failed': expected - articles,
+        # Bài bỏ qua vì cũ hơn max_days_old, theo nơi phát hiện (listing, head, article)
+        'too_old': too_old,
+        'listing_pages_fetched': listing_pages,
+        'wall_time_s': round(wall_time, 4),
+        'articles_per_sec': round(articles / wall_time, 2) if wall_time else 0.0,
+        'stages': timer.summary(),
+        # ru_maxrss: KB trên Linux
+        'peak_rss_mb': round(usage_end.ru_maxrss / 1024, 2),
+        'cpu_time_s': {
+            'user': round(usage_end.ru_utime - usage_start.ru_utime, 4),
+            'system': round(usage_end.ru_stime - usage_start.ru_stime, 4),
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark crawlers against local HTML fixtures")
+    parser.add_argument("--crawler", nargs="+", default=["all"], help=f"{', '.join(CRAWLERS)} or all")
+    parser.add_argument("--engine", nargs="+", default=["thread"], choices=["thread", "async", "global"])
+    parser.add_argument("--num-workers", nargs="+", type=int, default=[4])
+    parser.add_argument("--parser", nargs="+", default=["lxml"], help="html_parser backends to compare")
+    parser.add_argument("--config", help="YAML config merged into every crawler (e.g. config_quansu.yml)")
+    parser.add_argument("--total-pages", type=int, default=3)
+    parser.add_argument("--articles-per-page", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--page-kb", type=int, default=60, help="Boilerplate size added to every page")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean server delay (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Delay varies in latency +/- jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503 responses")
+    parser.add_argument("--max-days-old", type=float,
+                        help="Crawl only articles of the last N days (the fixture articles are then dated from now)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Mặc định tắt rate limit để đo crawler, không đo token bucket; bật lại qua --config
+    config = {'rate_limit': False}
+    if args.config:
+        config.update(get_config(args.config))
+    config.pop('crawlers', None)
+
+    crawlers = list(CRAWLERS) if "all" in args.crawler else args.crawler
+    cases = [{
+        'crawler': crawler, 'engine': engine, 'num_workers': num_workers, 'parser': parser,
+        'config': config, 'total_pages': args.total_pages, 'articles_per_page': args.articles_per_page,
+        'paragraphs': args.paragraphs, 'page_kb': args.page_kb, 'latency': args.latency,
+        'jitter': args.jitter, 'error_rate': args.error_rate, 'seed': args.seed, 'max_days_old': args.max_days_old,
+    } for crawler, engine, num_workers, parser in itertools.product(crawlers, args.engine, args.num_workers, args.parser)]
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        print(f"[bench] {case['crawler']} engine={case['engine']} num_workers={case['num_workers']} "
+              f"parser={case['parser']}", file=sys.stderr)
+        # Mỗi case một process mới để peak RSS/CPU không cộng dồn
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, case).result()
+        print(f"[bench]   {result['articles']} articles, {result['articles_per_sec']} articles/s", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    report_json = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
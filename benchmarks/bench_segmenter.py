@@ -0,0 +1,127 @@
+"""
+Word segmenter throughput on the crawled corpus (or on synthetic articles).
+
+    python -m benchmarks.bench_segmenter --config config_quansu.yml --limit 20000
+    python -m benchmarks.bench_segmenter --synthetic 5000 --paragraphs 12
+
+Segments title + body of every article with the WordSegmenter used at ingest
+(title_seg/body_seg) and reports articles/sec, MB/sec and syllables/sec, the
+share of compound words and the trie build time as JSON
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.fixture_server import SENTENCES
+from crawler.article_store import SegmentedArticleStore
+from crawler.segmenter import SYLLABLE_RE, WordSegmenter
+from elastic_indexer import VIETNAMESE_STOPWORDS
+from local_index import store_dpaths
+from utils.utils import get_config
+
+
+def stored_texts(dpaths, limit):
+    """title + body of up to limit articles of the segment stores"""
+    texts = []
+    for dpath in dpaths:
+        if not os.path.exists(os.path.join(dpath, "manifest.sqlite3")):
+            continue
+        store = SegmentedArticleStore(dpath)
+        try:
+            for article in itertools.islice(store.iter_articles(), limit - len(texts)):
+                texts.append(f"{article.title}\n{article.body}")
+        finally:
+            store.close()
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def synthetic_texts(count, paragraphs, seed):
+    """Articles made of the fixture sentences (same vocabulary as the fixture server)"""
+    rng = random.Random(seed)
+    return ["\n".join(" ".join(rng.choices(SENTENCES, k=4)) for _ in range(paragraphs + 1))
+            for _ in range(count)]
+
+
+def run(segmenter, texts, repeat):
+    total_bytes = sum(len(text.encode("utf-8")) for text in texts)
+    syllables = sum(len(SYLLABLE_RE.findall(text)) for text in texts)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        words = [segmenter.words(text) for text in texts]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    total_words = sum(len(w) for w in words)
+    compounds = sum(1 for w in itertools.chain.from_iterable(words) if "_" in w)
+    return {
+        'articles': len(texts),
+        'mb': round(total_bytes / 1e6, 2),
+        'syllables': syllables,
+        'words': total_words,
+        'compound_ratio': round(compounds / total_words, 4) if total_words else 0.0,
+        'seconds': round(best, 3),
+        'articles_per_sec': round(len(texts) / best, 1) if best else None,
+        'mb_per_sec': round(total_bytes / 1e6 / best, 2) if best else None,
+        'syllables_per_sec': round(syllables / best) if best else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ingest word segmenter")
+    parser.add_argument("--config", help="YAML config: segment stores of its crawlers (output_dpath)")
+    parser.add_argument("--store", nargs="+", help="Segment store directories (instead of --config)")
+    parser.add_argument("--limit", type=int, default=10000, help="Articles read from the stores")
+    parser.add_argument("--synthetic", type=int, default=2000,
+                        help="Synthetic articles, used when no stored article is found")
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of n runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    segmenter = WordSegmenter.from_files(stopwords=VIETNAMESE_STOPWORDS)
+    build_seconds = time.perf_counter() - start
+
+    dpaths = args.store or (store_dpaths(get_config(args.config)) if args.config else [])
+    texts = stored_texts(dpaths, args.limit)
+    corpus = "store"
+    if not texts:
+        texts = synthetic_texts(args.synthetic, args.paragraphs, args.seed)
+        corpus = "synthetic"
+    print(f"[bench] segmenting {len(texts)} {corpus} articles", file=sys.stderr)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'dictionary_words': segmenter.size,
+        'build_seconds': round(build_seconds, 4),
+        'result': run(segmenter, texts, args.repeat),
+    }
+    report_json = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Local HTTP stand-in for the news sites.
+Serves the HTML templates of benchmarks/fixtures/<site> for the listing and
+article urls of one crawler, with configurable latency, jitter and error rate
+"""
+
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from string import Template
+
+
+FIXTURES_DPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Định dạng ngày như trên từng trang
+DATE_FORMATS = {
+    "vnexpress": "{weekday}, {dt:%d/%m/%Y}, {dt:%H:%M} (GMT+7)",
+    "dantri": "{weekday}, {dt:%d/%m/%Y} - {dt:%H:%M}",
+    "vietnamnet": "{dt:%d/%m/%Y} {dt:%H:%M}",
+    "qdnd": "{weekday}, {dt:%d/%m/%Y} {dt:%H:%M}",
+}
+# Ngày đăng của bài đầu tiên trang 1 (mặc định cố định để trang sinh ra giống nhau mỗi lần chạy)
+PUBLISHED_AT = datetime(2025, 10, 13, 8, 0, tzinfo=timezone(timedelta(hours=7)))
+WEEKDAYS = ["Thứ hai", "Thứ ba", "Thứ tư", "Thứ năm", "Thứ sáu", "Thứ bảy", "Chủ nhật"]
+
+SENTENCES = [
+    "Bộ Quốc phòng cho biết cuộc diễn tập quy mô lớn sẽ kéo dài trong ba ngày tại khu vực biên giới phía bắc.",
+    "Lực lượng hải quân đã điều động thêm hai tàu khu trục tới vùng biển tranh chấp để tuần tra.",
+    "Các chuyên gia nhận định hệ thống phòng không mới có thể đánh chặn tên lửa hành trình ở độ cao thấp.",
+    "Theo báo cáo, ngân sách quốc phòng năm nay tăng khoảng tám phần trăm so với năm trước.",
+    "Hai bên đã ký kết thỏa thuận hợp tác huấn luyện và chia sẻ thông tin tình báo.",
+    "Máy bay không người lái được sử dụng để trinh sát và chỉ thị mục tiêu cho pháo binh.",
+    "Người phát ngôn quân đội khẳng định không có thương vong trong vụ việc.",
+    "Cuộc tập trận chung có sự tham gia của hơn năm nghìn binh sĩ cùng hàng trăm phương tiện cơ giới.",
+    "Giới phân tích cho rằng động thái này nhằm gửi thông điệp răn đe tới các đối thủ trong khu vực.",
+    "Hệ thống radar cảnh báo sớm đã phát hiện mục tiêu từ khoảng cách hơn bốn trăm kilômét.",
+]
+
+
+def load_templates(site):
+    """Templates (listing, listing_item, article) of a site"""
+    templates = {}
+    for name in ("listing", "listing_item", "article"):
+        with open(os.path.join(FIXTURES_DPATH, site, f"{name}.html"), encoding="utf-8") as f:
+            templates[name] = Template(f.read())
+    return templates
+
+
+def make_chrome(size_kb):
+    """Navigation/script boilerplate so pages weigh about size_kb like the real ones"""
+    links = []
+    size, i = 0, 0
+    while size < size_kb * 1024:
+        link = f'<li class="menu-item"><a href="/chuyen-muc-{i}" title="Chuyên mục {i}">Chuyên mục {i}</a></li>\n'
+        links.append(link)
+        size += len(link.encode("utf-8"))
+        i += 1
+    return f'<script>window.__CONFIG__ = {{"ads": true, "tracking": "bench"}};</script>\n<ul class="main-nav">\n{"".join(links)}</ul>'
+
+
+class FixtureSite:
+    """
+    Page generator for one crawler: listing pages 1..total_pages of
+    articles_per_page articles each, deterministic per url
+    """
+
+    def __init__(self, site, base_url, listing_paths, article_type="the-gioi/quan-su",
+                 articles_per_page=20, paragraphs=12, page_kb=60, published_at=None):
+        """
+            site: Fixture folder (vnexpress, dantri, vietnamnet, qdnd)
+            base_url: Root url of the server, written in absolute links
+            listing_paths: Paths of listing pages 1..N, as built by the crawler
+            articles_per_page: Articles linked from each listing page
+            paragraphs: Paragraphs per article
+            page_kb: Boilerplate added to every page
+            published_at: Publish time of the newest article (default PUBLISHED_AT)
+        """
+        self.site = site
+        self.base_url = base_url
+        self.article_type = article_type
+        self.articles_per_page = articles_per_page
+        self.paragraphs = paragraphs
+        self.templates = load_templates(site)
+        self.chrome = make_chrome(page_kb)
+        self.listing_pages = {path: page for page, path in enumerate(listing_paths, 1)}
+        self.published_at = published_at or PUBLISHED_AT
+
+    def article_path(self, page, position):
+        return f"/{self.article_type}/bai-viet-{page}-{position}.htm"
+
+    def article_urls(self):
+        return [self.base_url + self.article_path(page, position)
+                for page in self.listing_pages.values() for position in range(self.articles_per_page)]
+
+    def render(self, path):
+        """HTML of path, None if the path is unknown"""
+        if path in self.listing_pages:
+            return self.render_listing(self.listing_pages[path])
+
+        prefix = f"/{self.article_type}/bai-viet-"
+        if path.startswith(prefix) and path.endswith(".htm"):
+            try:
+                page, position = map(int, path[len(prefix):-len(".htm")].split("-"))
+            except ValueError:
+                return None
+            return self.render_article(page, position)
+        return None
+
+    def render_listing(self, page):
+        items = []
+        for position in range(self.articles_per_page):
+            path = self.article_path(page, position)
+            rng = random.Random(path)
+            items.append(self.templates["listing_item"].substitute(
+                path=path, url=self.base_url + path, position=position, title=self._title(page, position),
+                summary=rng.choice(SENTENCES), publishtime=int(self.published(page, position).timestamp())))
+        return self.templates["listing"].substitute(chrome=self.chrome, items="\n".join(items))
+
+    def render_article(self, page, position):
+        rng = random.Random(f"{self.site}-{page}-{position}")
+        published = self.published(page, position)
+        date = DATE_FORMATS[self.site].format(weekday=WEEKDAYS[published.weekday()], dt=published)
+
+        paragraphs = "\n".join(
+            f'<p class="Normal">{" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 5)))}</p>'
+            for _ in range(self.paragraphs))
+        return self.templates["article"].substitute(
+            chrome=self.chrome, title=self._title(page, position), date=date,
+            date_iso=published.isoformat(), summary=rng.choice(SENTENCES), paragraphs=paragraphs)
+
+    def published(self, page, position):
+        """Publish time of an article (GMT+7): 37 minutes apart, newest on page 1, from published_at"""
+        return self.published_at - timedelta(minutes=37 * ((page - 1) * self.articles_per_page + position))
+
+    @staticmethod
+    def _title(page, position):
+        return f"Tin quân sự {page}-{position}: {SENTENCES[(page * 7 + position) % len(SENTENCES)][:60]}"
+
+
+def make_handler(site, latency, jitter, error_rate, seed):
+    rng = random.Random(seed)
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            delay = latency + rng.uniform(-jitter, jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            if error_rate and rng.random() < error_rate:
+                return self._send(503, b"Service Unavailable")
+
+            html = site.render(self.path.split("?")[0])
+            if html is None:
+                return self._send(404, b"Not Found")
+            self._send(200, html.encode("utf-8"))
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def _serve(ready, site_options, latency, jitter, error_rate, seed):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), None)
+    server.daemon_threads = True
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    site = FixtureSite(base_url=base_url, **site_options)
+    server.RequestHandlerClass = make_handler(site, latency, jitter, error_rate, seed)
+    ready.send(base_url)
+    server.serve_forever()
+
+
+class FixtureServer:
+    """
+    Fixture site served from a separate process, so its CPU time and memory
+    do not count towards the measured crawler
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, **site_options):
+        """
+            latency: Mean delay (seconds) before each response
+            jitter: Delay varies uniformly in latency +/- jitter
+            error_rate: Share of requests answered with 503
+            site_options: FixtureSite arguments (site, listing_paths, ...)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.site_options = site_options
+        self.process = None
+        self.base_url = None
+
+    def start(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=_serve, args=(sender, self.site_options, self.latency, self.jitter, self.error_rate, self.seed),
+            daemon=True)
+        self.process.start()
+        self.base_url = receiver.recv()
+        return self.base_url
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,51 @@
+from dataclasses import dataclass, field
+from utils.date_utils import normalize_date
+
+
+@dataclass(slots=True)
+class Article:
+    """Article extracted by a crawler, passed as-is to the file writer and the indexer"""
+
+    title: str
+    date: str = "N/A"                                # Ngày đăng như trên trang
+    publish_date: str = None                         # Ngày đăng ISO 8601 có múi giờ (normalize_date)
+    description: list = field(default_factory=list)  # Các dòng sapo
+    paragraphs: list = field(default_factory=list)   # Các đoạn nội dung
+    url: str = ""
+    source: str = ""
+    category: str = ""
+
+    @property
+    def body(self):
+        return "\n".join(self.lines()).strip()
+
+    def lines(self):
+        yield from self.description
+        yield from self.paragraphs
+
+    def to_text(self):
+        """Text format of result/<source>_quansu/<type>/url_NNN.txt"""
+        lines = "".join(f"{line}\n" for line in self.lines())
+        return f"{self.title}\nNgày: {self.date}\n\n{lines}"
+
+    @classmethod
+    def from_text(cls, content, source="", category="", url=""):
+        """Parse an article written by to_text (None if empty)"""
+        lines = content.strip().split('\n')
+        if not lines or not lines[0].strip():
+            return None
+
+        date = ""
+        if len(lines) > 1 and "Ngày:" in lines[1]:
+            date = lines[1].replace("Ngày:", "").strip()
+
+        body = "\n".join(lines[2:]).strip() if len(lines) > 2 else ""
+        return cls(
+            title=lines[0].strip(),
+            date=date,
+            publish_date=normalize_date(date, source),
+            paragraphs=body.split('\n') if body else [],
+            url=url,
+            source=source,
+            category=category
+        )
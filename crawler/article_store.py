@@ -0,0 +1,201 @@
+import dataclasses
+import json
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from datetime import datetime
+from crawler.article import Article
+from utils.utils import create_dir
+
+
+LENGTH = struct.Struct(">I")
+
+
+class SegmentedArticleStore:
+    """
+    Append-only article store replacing one url_NNN.txt per article.
+
+    Records are length-prefixed, zlib-compressed JSON appended to segment
+    files (segments/seg-YYYYMMDD-NNNN.dat), rotated by size or by day.
+    A SQLite manifest maps url -> (segment, offset, length) for O(1)
+    lookups; iter_articles streams segments sequentially
+    """
+
+    def __init__(self, root, max_segment_bytes=64 * 1024 * 1024, compression_level=6):
+        """
+            root: Store directory (segments/ and manifest.sqlite3 live inside)
+            max_segment_bytes: Rotate the active segment past this size
+            compression_level: zlib level per record
+        """
+        self.root = root
+        self.segments_dpath = os.path.join(root, "segments")
+        self.max_segment_bytes = max_segment_bytes
+        self.compression_level = compression_level
+        create_dir(self.segments_dpath)
+
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_file = None
+
+        self.conn = sqlite3.connect(os.path.join(root, "manifest.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                url TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                stored_at TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def segments(self):
+        """Segment file names, oldest first"""
+        return sorted(name for name in os.listdir(self.segments_dpath) if name.endswith(".dat"))
+
+    def _segment_path(self, segment):
+        return os.path.join(self.segments_dpath, segment)
+
+    def _active_segment(self, size):
+        """Open (or rotate to) the segment that receives the next record"""
+        today = datetime.now().strftime("%Y%m%d")
+        if self._segment_file:
+            same_day = self._segment.startswith(f"seg-{today}-")
+            if same_day and self._segment_file.tell() + size <= self.max_segment_bytes:
+                return self._segment, self._segment_file
+            self._segment_file.close()
+            self._segment_file = None
+
+        todays = [name for name in self.segments() if name.startswith(f"seg-{today}-")]
+        segment = todays[-1] if todays else f"seg-{today}-0001.dat"
+        if todays and os.path.getsize(self._segment_path(segment)) + size > self.max_segment_bytes:
+            number = int(segment.rsplit("-", 1)[1].split(".")[0]) + 1
+            segment = f"seg-{today}-{number:04d}.dat"
+
+        self._segment = segment
+        self._segment_file = open(self._segment_path(segment), "ab")
+        self._truncate_partial_record()
+        return self._segment, self._segment_file
+
+    def _truncate_partial_record(self):
+        """Drop a record left half-written by a crash so new records stay readable"""
+        end = 0
+        for end in self._record_ends(self._segment):
+            pass
+        if end < self._segment_file.tell():
+            self._segment_file.truncate(end)
+            self._segment_file.seek(end)
+
+    def _record_ends(self, segment):
+        with open(self._segment_path(segment), "rb") as f:
+            while True:
+                header = f.read(LENGTH.size)
+                if len(header) < LENGTH.size:
+                    return
+                length = LENGTH.unpack(header)[0]
+                if len(f.read(length)) < length:
+                    return
+                yield f.tell()
+
+    def append(self, article):
+        """Append an Article; the manifest then points its url to this newest copy"""
+        record = dataclasses.asdict(article)
+        record["stored_at"] = datetime.now().isoformat(timespec="seconds")
+        payload = zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"), self.compression_level)
+
+        with self._lock:
+            segment, f = self._active_segment(LENGTH.size + len(payload))
+            offset = f.tell()
+            f.write(LENGTH.pack(len(payload)))
+            f.write(payload)
+            f.flush()
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO records (url, segment, offset, length, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (article.url, segment, offset, len(payload), record["stored_at"]))
+            self.conn.commit()
+        return segment, offset
+
+    def get(self, url):
+        """Article stored for url (latest copy), None if unknown"""
+        with self._lock:
+            row = self.conn.execute("SELECT segment, offset, length FROM records WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return None
+
+        segment, offset, length = row
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset + LENGTH.size)
+            return self._decode(f.read(length))
+
+    def __contains__(self, url):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM records WHERE url = ?", (url,)).fetchone() is not None
+
+    def count(self):
+        """Number of distinct urls stored"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def iter_records(self, segments=None):
+        """Stream (segment, offset, Article) for every record, in append order"""
+        for segment in segments or self.segments():
+            with open(self._segment_path(segment), "rb") as f:
+                while True:
+                    offset = f.tell()
+                    header = f.read(LENGTH.size)
+                    if len(header) < LENGTH.size:
+                        break
+                    length = LENGTH.unpack(header)[0]
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        break  # bản ghi ghi dở (crash), bỏ qua
+                    yield segment, offset, self._decode(payload)
+
+    def latest_locations(self):
+        """{segment: sorted offsets} of the latest copy of every url"""
+        locations = {}
+        with self._lock:
+            for segment, offset in self.conn.execute("SELECT segment, offset FROM records ORDER BY segment, offset"):
+                locations.setdefault(segment, []).append(offset)
+        return locations
+
+    def segment_path(self, segment):
+        return self._segment_path(segment)
+
+    def iter_articles(self, latest_only=True):
+        """Stream stored Articles; with latest_only older copies of re-crawled urls are skipped"""
+        latest = None
+        if latest_only:
+            with self._lock:
+                latest = {url: (segment, offset) for url, segment, offset in
+                          self.conn.execute("SELECT url, segment, offset FROM records")}
+
+        for segment, offset, article in self.iter_records():
+            if latest is None or latest.get(article.url) == (segment, offset):
+                yield article
+
+    @staticmethod
+    def _decode(payload):
+        record = json.loads(zlib.decompress(payload).decode("utf-8"))
+        record.pop("stored_at", None)
+        return Article(**record)
+
+    @staticmethod
+    def read_records(segment_fpath, offsets):
+        """Articles at the given offsets of one segment file (no manifest needed, e.g. in worker processes)"""
+        with open(segment_fpath, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                length = LENGTH.unpack(f.read(LENGTH.size))[0]
+                yield SegmentedArticleStore._decode(f.read(length))
+
+    def close(self):
+        with self._lock:
+            if self._segment_file:
+                self._segment_file.close()
+                self._segment_file = None
+            self.conn.close()
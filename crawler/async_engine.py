@@ -0,0 +1,304 @@
+"""
+asyncio crawl engine (engine: async)
+Runs listing pages and article fetches of every crawler on one event loop;
+site crawlers only provide get_listing_url/parse_listing/parse_article.
+Requests use each crawler's headers (transport) and listing/article timeouts
+like the thread path; parsing and writing run in worker threads
+"""
+
+import asyncio
+import time
+from tqdm import tqdm
+from crawler.base_crawler import HEAD_CHUNK_SIZE, NotModified, TooOld
+from crawler.metrics import metrics, http_outcome
+from utils.utils import init_output_dirs, read_file
+
+
+class AsyncCrawlEngine:
+
+    def __init__(self, crawlers, max_in_flight=200, per_host_limit=50, timeout=20, dns_cache_ttl=300):
+        """
+            crawlers: BaseCrawler instances to run together
+            max_in_flight: Max concurrent requests over all hosts
+            per_host_limit: Max concurrent requests to one host (0 = no limit)
+            timeout: Connect/read timeout (seconds) of requests without a site timeout
+            dns_cache_ttl: Seconds to cache DNS answers
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("engine: async requires aiohttp (pip install aiohttp)")
+
+        self.aiohttp = aiohttp
+        self.crawlers = crawlers
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.session = None
+
+    @staticmethod
+    def options_from_config(config):
+        """Engine options from a crawler/unified YAML config"""
+        return {
+            'max_in_flight': config.get('max_in_flight', 200),
+            'per_host_limit': config.get('per_host_limit', 50),
+            'timeout': config.get('request_timeout', 20),
+            'dns_cache_ttl': config.get('dns_cache_ttl', 300),
+        }
+
+    def crawl_once(self):
+        """Run one cycle for all crawlers. Returns {crawler_name: failed urls}"""
+        return asyncio.run(self._crawl_all())
+
+    async def _crawl_all(self):
+        connector = self.aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.per_host_limit,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+        timeout = self._timeout(self.timeout)
+
+        async with self.aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.session = session
+            results = await asyncio.gather(*(self._crawl_crawler(c) for c in self.crawlers))
+
+        return {crawler.crawler_name: error_urls for crawler, error_urls in zip(self.crawlers, results)}
+
+    def _timeout(self, seconds):
+        """Same meaning as a requests timeout: limit on connecting and on each socket read"""
+        return self.aiohttp.ClientTimeout(total=None, sock_connect=seconds, sock_read=seconds)
+
+    async def _fetch(self, crawler, url, stage="fetch_article"):
+        """
+        Conditional GET of url for crawler, returns body bytes or None on error.
+        Raises NotModified on 304, TooOld when the <head> of an article shows a
+        publish date older than crawler.max_days_old
+        """
+        # Header (DEFAULT_HEADERS + http_headers) của transport, timeout theo trang như BaseCrawler.fetch
+        headers = {**crawler.transport.session.headers, **crawler.conditional_headers(url)}
+        timeout = crawler.listing_timeout if stage == "fetch_listing" else crawler.article_timeout
+        limiter = crawler.transport.limiter.get(url) if crawler.transport.limiter else None
+        if limiter:
+            await limiter.acquire_async()
+
+        start = time.monotonic()
+        outcome = {'error': True}
+        stage_outcome = "error"
+        try:
+            async with self.session.get(url, headers=headers, timeout=self._timeout(timeout)) as response:
+                outcome = {'status': response.status, 'retry_after': response.headers.get('Retry-After')}
+                stage_outcome = http_outcome(response.status)
+                if response.status == 304:
+                    raise NotModified(url)
+                if stage == "fetch_article" and crawler.max_days_old and response.status < 400:
+                    content = await self._read_article(crawler, url, response)
+                else:
+                    content = await response.read()
+                crawler.cycle_stats.add(crawler.source, 'bytes', len(content))
+                if response.status >= 400:
+                    return None
+                crawler.remember_validators(url, response.headers)
+                return content
+        except (NotModified, TooOld):
+            raise
+        except asyncio.TimeoutError:
+            outcome = {'timeout': True}
+            stage_outcome = "timeout"
+            return None
+        except Exception:
+            return None
+        finally:
+            if limiter:
+                limiter.release(time.monotonic() - start, **outcome)
+            metrics.observe(stage, crawler.source, stage_outcome, time.monotonic() - start)
+
+    @staticmethod
+    async def _read_article(crawler, url, response):
+        """Body of an article response, read head first; stops there if the article is too old"""
+        content = b""
+        while True:
+            chunk = await response.content.read(HEAD_CHUNK_SIZE)
+            if not chunk:
+                return content
+            content += chunk
+            expired = crawler.head_expired(content)
+            if expired is not None:
+                break
+        if expired:
+            crawler.cycle_stats.add(crawler.source, 'bytes', len(content))
+            raise TooOld(url, "head")
+        return content + await response.content.read()
+
+    async def _fetch_listing(self, crawler, url):
+        try:
+            return await self._fetch(crawler, url, stage="fetch_listing")
+        except NotModified:
+            return None
+
+    async def _crawl_crawler(self, crawler):
+        crawler.cycle_stats.start_source(crawler.source)
+        try:
+            if crawler.task == "url":
+                urls = list(read_file(crawler.urls_fpath))
+                return await self._crawl_urls(crawler, urls, crawler.output_dpath)
+            if crawler.task == "type":
+                return await self._crawl_types(crawler)
+        except Exception as e:
+            print(f"[{crawler.crawler_name}] error: {e}")
+        finally:
+            crawler.cycle_stats.finish_source(crawler.source)
+        return []
+
+    async def _crawl_types(self, crawler):
+        urls_dpath, results_dpath = init_output_dirs(crawler.output_dpath)
+
+        error_urls = []
+        for article_type in crawler.get_article_types():
+            safe_article_type = article_type.replace("/", "_")
+            results_type_dpath = "/".join([results_dpath, safe_article_type])
+            type_error_urls = []
+            start = 0
+
+            async def crawl_wave(urls):
+                nonlocal start
+                type_error_urls.extend(await self._crawl_urls(crawler, urls, results_type_dpath, start))
+                start += len(urls)
+
+            # Với max_days_old, bài của mỗi đợt được crawl trước khi tải đợt sau (BaseCrawler.crawl_type)
+            print(f"[{crawler.crawler_name}] Getting URLs from {article_type}...")
+            articles_urls = await self._get_urls_of_type(crawler, article_type,
+                                                         crawl_wave if crawler.max_days_old else None)
+            print(f"[{crawler.crawler_name}] Found {len(articles_urls)} unique URLs")
+            crawler.cycle_stats.add(crawler.source, 'discovered', len(articles_urls))
+
+            articles_urls_fpath = "/".join([urls_dpath, f"{safe_article_type}.txt"])
+            with open(articles_urls_fpath, "w", encoding="utf-8") as urls_file:
+                urls_file.write("\n".join(articles_urls))
+
+            if not crawler.max_days_old:
+                type_error_urls = await self._crawl_urls(crawler, articles_urls, results_type_dpath)
+            crawler.finish_listing(article_type, type_error_urls)
+            error_urls.extend(type_error_urls)
+
+        crawler.full_sweep_pending = False
+        return error_urls
+
+    async def _get_urls_of_type(self, crawler, article_type, crawl_wave=None):
+        """Async counterpart of BaseCrawler.get_urls_of_type (crawl_wave is a coroutine function)"""
+        articles_urls = set()
+        waves = crawler.listing_waves()
+        incremental = crawler.is_incremental_listing()
+
+        for wave in waves:
+            contents = await asyncio.gather(
+                *(self._fetch_listing(crawler, crawler.get_listing_url(article_type, p)) for p in wave))
+
+            pages = []
+            expired = False
+            for content in contents:
+                if content is None:
+                    continue
+                try:
+                    with metrics.stage("parse_listing", crawler.source) as m:
+                        urls, page_expired = crawler.listing_urls(content)
+                        if not urls:
+                            m.outcome = "miss"
+                    pages.append(urls)
+                    expired = expired or page_expired
+                except Exception:
+                    pass
+            wave_urls = [url for urls in pages for url in urls]
+
+            done = crawler.is_listing_done(wave_urls, articles_urls, expired, incremental)
+            new_urls = [url for url in dict.fromkeys(wave_urls) if url not in articles_urls]
+            articles_urls.update(wave_urls)
+            if crawl_wave:
+                await crawl_wave(new_urls)
+                done = done or any(crawler.is_page_expired(urls) for urls in pages)
+            if done:
+                break
+
+        return list(articles_urls)
+
+    async def _crawl_urls(self, crawler, urls, output_dpath, start=0):
+        crawler.create_output_dir(output_dpath)
+
+        if crawler.continuous_mode:
+            new_urls = [u for u in urls if u not in crawler.crawled_urls]
+            crawler.cycle_stats.add(crawler.source, 'skipped', len(urls) - len(new_urls))
+            urls = new_urls
+            if not urls:
+                print(f"[{crawler.crawler_name}] No new URLs to crawl")
+                return []
+
+        num_urls = len(urls)
+        print(f"[{crawler.crawler_name}] Crawling {num_urls} URLs...")
+        crawler.index_len = len(str(start + num_urls))
+
+        with tqdm(total=num_urls, desc=f"{crawler.crawler_name}") as progress:
+            async def crawl_url(url, index):
+                try:
+                    error_url = await self._crawl_url(crawler, output_dpath, url, index)
+                    if error_url is not None:
+                        crawler.cycle_stats.add(crawler.source, 'failed')
+                    return error_url
+                finally:
+                    # Bài đã ghi thì validators đã được giữ (on_article_written)
+                    crawler.drop_validators(url)
+                    progress.update(1)
+
+            results = await asyncio.gather(*(crawl_url(url, i) for i, url in enumerate(urls, start)))
+
+        return [result for result in results if result is not None]
+
+    async def _crawl_url(self, crawler, output_dpath, url, index):
+        """Async counterpart of BaseCrawler.crawl_url_thread"""
+        if url in crawler.crawled_urls:
+            crawler.cycle_stats.add(crawler.source, 'skipped')
+            return None
+
+        try:
+            content = await self._fetch(crawler, url)
+        except NotModified:
+            crawler.cycle_stats.add(crawler.source, 'skipped')
+            return None
+        except TooOld as e:
+            await asyncio.to_thread(crawler.skip_too_old, url, e.args[1])
+            return None
+        if content is None:
+            return url
+
+        try:
+            # Parse tốn CPU, không chạy trên event loop
+            article = await asyncio.to_thread(self._parse_article, crawler, content)
+        except Exception:
+            return url
+        if not article:
+            return url
+        if crawler.is_too_old(article.publish_date):
+            await asyncio.to_thread(crawler.skip_too_old, url, "article")
+            return None
+
+        article.url = url
+        article.source = crawler.source
+        article.category = crawler.category_of(output_dpath)
+
+        output_fpath = crawler.get_output_fpath(output_dpath, index)
+
+        # Compression, state store and bulk queue may block, keep them off the event loop
+        await asyncio.to_thread(self._write_article, crawler, output_fpath, article)
+        return None
+
+    @staticmethod
+    def _parse_article(crawler, content):
+        with metrics.stage("parse_article", crawler.source) as m:
+            article = crawler.parse_article(content)
+            if not article:
+                m.outcome = "miss"
+        return article
+
+    @staticmethod
+    def _write_article(crawler, output_fpath, article):
+        crawler.write_article(output_fpath, article)
+        crawler.on_article_written(article)
@@ -1,34 +1,128 @@
 from abc import ABC, abstractmethod
 import concurrent.futures
+import re
 import time
 import hashlib
-import requests
 from datetime import datetime
 from tqdm import tqdm
+from crawler.transport import HttpTransport
+from crawler.state_store import CrawlStateStore
+from crawler.article_store import SegmentedArticleStore
+from crawler.metrics import metrics, http_outcome
+from crawler.cycle_stats import CycleStats
+from utils.bs4_utils import make_soup, resolve_parser
+from utils.date_utils import is_recent_article
 from utils.utils import init_output_dirs, create_dir, read_file
 
 
+# Ngày đăng trong <head> của trang bài viết: meta article:published_time / datePublished / pubdate, ld+json
+HEAD_DATE_RE = re.compile(
+    rb"""(?:article:published_time|datePublished|pubdate)["']?\s*(?:content=|:\s*)["']([^"'<>]{8,40})["']""")
+HEAD_CHUNK_SIZE = 8192
+
+
+class NotModified(Exception):
+    """Raised by BaseCrawler.fetch when the server answers 304 Not Modified"""
+
+
+class TooOld(Exception):
+    """Raised when an article turns out older than max_days_old (args: url, where it was detected)"""
+
+
+class ListedUrl(str):
+    """Article url from a listing page, carrying the publish date shown next to it (date, None if not shown)"""
+
+    def __new__(cls, url, date=None):
+        listed = super().__new__(cls, url)
+        listed.date = date
+        return listed
+
+
 class BaseCrawler(ABC):
 
+    # Default timeouts (seconds), sites may override
+    article_timeout = 20
+    listing_timeout = 20
+
+    # With max_days_old: bytes of an article page read while looking for its publish date
+    head_max_bytes = 128 * 1024
+
+    # Charset of the site (skips encoding detection) and SoupStrainers
+    # limiting the parsed tree to the nodes parse_article/parse_listing use
+    charset = "utf-8"
+    article_strainer = None
+    listing_strainer = None
+
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
 
         # Crawler name for prefixing outputs
         self.crawler_name = kwargs.get('webname', self.__class__.__name__.replace('Crawler', '').lower())
+        # Source name stored with indexed articles
+        self.source = self.__class__.__name__.replace('Crawler', '').lower()
 
         # Tracking for continuous mode
         self.crawled_urls = set()
-        self.url_hashes = {}
+        self.url_validators = {}  # url -> (ETag, Last-Modified)
+        # Validators of fetched pages, kept once the page was fully handled (article written,
+        # every article of a listing crawled) so a failure is not hidden behind a 304 later
+        self.pending_validators = {}
 
         # Config for continuous crawling
         self.continuous_mode = kwargs.get('continuous_mode', False)
         self.crawl_interval = kwargs.get('crawl_interval', 10800)  # 3 hours
-        self.use_head_check = kwargs.get('use_head_check', False)
+        # Conditional GET (If-None-Match/If-Modified-Since); 'use_head_check' kept for old configs
+        self.use_conditional_get = kwargs.get('use_conditional_get', kwargs.get('use_head_check', False))
+
+        # Listing pages: 'full' (default) always fetches total_pages; 'incremental' (opt-in)
+        # walks pages in waves and stops when a wave brings (almost) no unseen URLs
+        self.listing_mode = kwargs.get('listing_mode', 'full')
+        self.listing_wave_size = max(kwargs.get('listing_wave_size', 2), 1)
+        self.listing_min_new_ratio = kwargs.get('listing_min_new_ratio', 0.0)
+        self.full_sweep_pending = kwargs.get('full_sweep', False)
+
+        # Only crawl articles published in the last max_days_old days (None = no limit): checked on
+        # listing dates, then on the <head> of the article page. The articles of each listing wave are
+        # crawled before the next wave, and listing stops at a page whose articles all are too old
+        self.max_days_old = kwargs.get('max_days_old')
+        self.too_old_urls = set()
+
+        # HTML parser backend (lxml | html.parser | html5lib) and partial-tree parsing
+        self.html_parser = resolve_parser(kwargs.get('html_parser', 'lxml'))
+        self.partial_parse = kwargs.get('partial_parse', True)
+
+        # Per-cycle counters; UnifiedCrawler passes one shared instance via 'cycle_stats'
+        self.owns_cycle_stats = kwargs.get('cycle_stats') is None
+        if self.owns_cycle_stats:
+            self.cycle_stats = CycleStats(kwargs.get('stats_history', 50))
+
+        # Shared HTTP transport (keep-alive pools, DNS cache, default headers/timeouts).
+        # UnifiedCrawler passes one instance to every crawler via 'transport'
+        self.transport = kwargs.get('transport') or HttpTransport.from_config(kwargs)
+
+        # Persistent crawl state, loaded at startup so restarts skip known articles
+        self.state_store = None
+        if kwargs.get('persist_state', True) and kwargs.get('output_dpath'):
+            try:
+                create_dir(self.output_dpath)
+                state_db = kwargs.get('state_db') or f"{self.output_dpath}/crawl_state.sqlite3"
+                self.state_store = CrawlStateStore(state_db)
+            except Exception as e:
+                print(f"[{self.crawler_name}] Crawl state disabled: {e}")
+
+        # Article storage: 'segments' appends to a compressed segmented store
+        # (<output_dpath>/store), 'files' keeps one url_NNN.txt per article
+        self.article_store = None
+        if kwargs.get('storage', 'segments') == 'segments' and kwargs.get('output_dpath'):
+            self.article_store = SegmentedArticleStore(
+                kwargs.get('store_dpath') or f"{self.output_dpath}/store",
+                max_segment_bytes=int(kwargs.get('segment_max_mb', 64) * 1024 * 1024)
+            )
 
         # Elasticsearch indexing
         self.enable_elastic = kwargs.get('enable_elastic', False)
-        self.elastic_indexer = None
-        if self.enable_elastic:
+        self.elastic_indexer = kwargs.get('elastic_indexer')  # UnifiedCrawler chia sẻ một indexer
+        if self.enable_elastic and self.elastic_indexer is None:
             try:
                 from elastic_indexer import ElasticIndexer
                 es_url = kwargs.get('es_url', 'http://localhost:9200')
@@ -40,41 +134,285 @@ class BaseCrawler(ABC):
                     es_url=es_url,
                     username=es_username,
                     password=es_password,
-                    index_name=es_index
+                    index_name=es_index,
+                    partition=kwargs.get('es_partition')
                 )
+                configure_indexer(self.elastic_indexer, kwargs, self.output_dpath)
             except Exception as e:
                 print(f"Elasticsearch init failed: {e}")
                 self.enable_elastic = False
 
-    @abstractmethod
-    def extract_content(self, url):
+        self.load_state()
+
+    def load_state(self):
+        """Restore crawled_urls and url_validators from the state store"""
+        if not self.state_store:
+            return
+
+        for url, row in self.state_store.load(self.crawler_name).items():
+            if row['skipped'] == 'too_old':
+                # Bài cũ hơn max_days_old ở lần chạy trước: không tải lại <head> để kiểm tra ngày.
+                # Bỏ max_days_old thì các bài này được crawl bình thường
+                if self.max_days_old:
+                    self.too_old_urls.add(url)
+                    self.crawled_urls.add(url)
+                continue
+
+            # Bài đã crawl nhưng chưa index xong thì crawl lại (không gửi validators để lấy lại nội dung)
+            pending_index = row['fetched_at'] and self.enable_elastic and not row['indexed']
+            if pending_index:
+                continue
+
+            if row['etag'] or row['last_modified']:
+                self.url_validators[url] = (row['etag'], row['last_modified'])
+            if row['fetched_at']:
+                self.crawled_urls.add(url)
+
+    def fetch(self, url, timeout=None, stage="fetch_article", stream=False):
+        """
+        GET url through the shared transport. With use_conditional_get the
+        stored ETag/Last-Modified are sent and a 304 raises NotModified.
+        With stream the body is left unread (the caller counts its bytes)
+        """
+        headers = self.conditional_headers(url)
+        with metrics.stage(stage, self.source) as m:
+            response = self.transport.get(url, timeout=timeout, headers=headers, stream=stream)
+            m.outcome = http_outcome(response.status_code)
+
+        if response.status_code == 304:
+            response.close()
+            raise NotModified(url)
+
+        if not stream:
+            self.cycle_stats.add(self.source, 'bytes', len(response.content))
+        if response.status_code < 400:
+            self.remember_validators(url, response.headers)
+        return response
+
+    def fetch_article(self, url):
+        """
+        GET an article page, returns (status code, body). With max_days_old the
+        body is streamed and the download stops as soon as the <head> shows a
+        publish date older than the cutoff (raises TooOld)
+        """
+        if not self.max_days_old:
+            response = self.fetch(url, timeout=self.article_timeout)
+            return response.status_code, response.content
+
+        with self.fetch(url, timeout=self.article_timeout, stream=True) as response:
+            chunks = response.iter_content(HEAD_CHUNK_SIZE)
+            content = b""
+            for chunk in chunks:
+                content += chunk
+                expired = self.head_expired(content)
+                if expired is not None:
+                    break
+            else:
+                expired = False
+            if expired:
+                self.cycle_stats.add(self.source, 'bytes', len(content))
+                raise TooOld(url, "head")
+            content += b"".join(chunks)
+        self.cycle_stats.add(self.source, 'bytes', len(content))
+        return response.status_code, content
+
+    def is_too_old(self, date_str):
+        """True if date_str is a publish date older than max_days_old (False without a limit or a date)"""
+        if not self.max_days_old or not date_str:
+            return False
+        return not is_recent_article(date_str, self.max_days_old, self.source)
+
+    def head_date(self, head):
+        """Publish date text in the beginning of an article page (meta tags, ld+json), None if not there"""
+        match = HEAD_DATE_RE.search(head)
+        return match.group(1).decode("utf-8", "replace") if match else None
+
+    def head_expired(self, head):
+        """
+        Check of the first bytes of an article page: True if its publish date is
+        too old, False if recent or not found in the <head>, None to read more
+        """
+        date = self.head_date(head)
+        if date:
+            return self.is_too_old(date)
+        if b"</head>" in head or len(head) >= self.head_max_bytes:
+            return False
+        return None
+
+    def skip_too_old(self, url, where):
+        """Count an article skipped for its age; it is not requested again in later cycles or after a restart"""
+        self.too_old_urls.add(url)
+        self.crawled_urls.add(url)
+        self.cycle_stats.add(self.source, 'skipped')
+        metrics.count("too_old", self.source, where)
+        if self.state_store:
+            self.state_store.record_fetch(url, self.crawler_name, skipped='too_old')
+
+    def conditional_headers(self, url):
+        if not self.use_conditional_get or url not in self.url_validators:
+            return {}
+
+        etag, last_modified = self.url_validators[url]
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def remember_validators(self, url, response_headers):
+        """Hold the ETag/Last-Modified of a successful response until confirm_validators(url)"""
+        if not self.use_conditional_get:
+            return
+
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if etag or last_modified:
+            self.pending_validators[url] = (etag, last_modified)
+
+    def confirm_validators(self, url):
+        """Page handled: send its validators from now on (and save them in the state store)"""
+        validators = self.pending_validators.pop(url, None)
+        if not validators or self.url_validators.get(url) == validators:
+            return
+
+        self.url_validators[url] = validators
+        if self.state_store:
+            self.state_store.record_validators(url, self.crawler_name, *validators)
+
+    def drop_validators(self, url):
+        """Page not handled: forget the validators of this fetch, the next cycle gets the full page"""
+        self.pending_validators.pop(url, None)
+
+    def finish_listing(self, article_type, error_urls):
+        """
+        Every article found on the listing pages of article_type was crawled:
+        keep the validators of those pages. If some failed, the pages are
+        fetched in full next cycle so the failed articles are listed again
+        """
+        for page in range(1, self.total_pages + 1):
+            url = self.get_listing_url(article_type, page)
+            if error_urls:
+                self.drop_validators(url)
+            else:
+                self.confirm_validators(url)
+
+    def extract_content(self, url, category=""):
+        """
+        Extract title, date, description and paragraphs from url
+        @param url (str): url to crawl
+        @param category (str): article type the url was listed under
+        @return (Article): None if the page is not an article or failed
+        Raises NotModified if the article did not change since the last fetch
+        """
+        try:
+            status_code, content = self.fetch_article(url)
+            if status_code >= 400:
+                return None
+            with metrics.stage("parse_article", self.source) as m:
+                article = self.parse_article(content)
+                if not article:
+                    m.outcome = "miss"
+        except (NotModified, TooOld):
+            raise
+        except:
+            return None
+
+        if article and self.is_too_old(article.publish_date):
+            # Trang không ghi ngày trong <head>: biết ngày sau khi parse
+            raise TooOld(url, "article")
+        if article:
+            article.url = url
+            article.source = self.source
+            article.category = category
+        return article
+
+    def write_content(self, url, output_fpath, category=""):
         """
-        Extract title, description and paragraphs from url
+        From url, extract the article then store it (write_article)
         @param url (str): url to crawl
-        @return title (str)
-        @return description (generator)
-        @return paragraphs (generator)
+        @param output_fpath (str): file path to save crawled result, None with the segmented store
+        @return (Article): the written article, None if crawl failed
         """
-        title = str()
-        description = list()
-        paragraphs = list()
-        return title, description, paragraphs
+        article = self.extract_content(url, category)
+        if not article:
+            return None
+
+        self.write_article(output_fpath, article)
+        return article
+
+    def get_urls_of_type_thread(self, article_type, page_number):
+        """
+        Get urls of articles in a specific type in a page
+        @return (list, bool): urls, and whether the whole page is older than max_days_old
+        """
+        try:
+            url = self.get_listing_url(article_type, page_number)
+            response = self.fetch(url, timeout=self.listing_timeout, stage="fetch_listing")
+            if response.status_code >= 400:
+                return [], False
+            with metrics.stage("parse_listing", self.source) as m:
+                urls, expired = self.listing_urls(response.content)
+                if not urls:
+                    m.outcome = "miss"
+            return urls, expired
+        except NotModified:
+            # Trang danh sách không đổi từ lần trước: không có bài mới
+            return [], False
+        except:
+            return [], False
+
+    def listing_urls(self, content):
+        """
+        Urls of a listing page without the articles listed with a publish date
+        older than max_days_old. Returns (urls, expired): expired when every
+        article of the page is dated and too old, so older pages can be skipped
+        """
+        urls = self.parse_listing(content)
+        if not self.max_days_old:
+            return urls, False
+
+        recent = [url for url in urls if not self.is_too_old(getattr(url, "date", None))]
+        if len(recent) < len(urls):
+            self.cycle_stats.add(self.source, 'skipped', len(urls) - len(recent))
+            metrics.count("too_old", self.source, "listing", len(urls) - len(recent))
+        return recent, bool(urls) and not recent
 
     @abstractmethod
-    def write_content(self, url, output_fpath):
+    def parse_article(self, content):
         """
-        From url, extract title, description and paragraphs then write in output_fpath
-        @param url (str): url to crawl
-        @param output_fpath (str): file path to save crawled result
-        @return (bool): True if crawl successfully and otherwise
+        Parse a downloaded article page (no network access)
+        @param content (bytes): raw HTML of the article
+        @return (Article): title/date/description/paragraphs, None if not an article
         """
-        return True
+        return None
 
     @abstractmethod
-    def get_urls_of_type_thread(self, article_type, page_number):
-        """" Get urls of articles in a specific type in a page"""
-        articles_urls = list()
-        return articles_urls
+    def get_listing_url(self, article_type, page_number):
+        """ Build the url of a listing page of article_type """
+        return str()
+
+    @abstractmethod
+    def parse_listing(self, content):
+        """ Parse a downloaded listing page into article urls (no network access) """
+        return list()
+
+    def make_soup(self, content, strainer=None):
+        """Parse content with the configured backend, only materialising strainer matches"""
+        return make_soup(content, self.html_parser, strainer if self.partial_parse else None, self.charset)
+
+    def write_article(self, output_fpath, article):
+        """
+        Append an extracted article to the segmented store, or write it to
+        output_fpath (storage: files; get_output_fpath gives None otherwise)
+        """
+        with metrics.stage("write", self.source):
+            if self.article_store:
+                self.article_store.append(article)
+                return
+
+            with open(output_fpath, "w", encoding="utf-8") as f:
+                f.write(article.to_text())
 
     def start_crawling(self):
         if self.continuous_mode:
@@ -84,10 +422,32 @@ class BaseCrawler(ABC):
 
     def crawl_once(self):
         """Run a single crawl cycle"""
-        if self.task == "url":
+        if self.owns_cycle_stats:
+            self.cycle_stats.start_cycle()
+        self.cycle_stats.start_source(self.source)
+
+        with metrics.stage("cycle", self.source):
+            self._crawl_cycle()
+
+        # Đẩy nốt các document còn trong hàng đợi bulk
+        if self.enable_elastic and self.elastic_indexer:
+            self.elastic_indexer.flush()
+
+        self.cycle_stats.finish_source(self.source)
+        if self.owns_cycle_stats:
+            self.cycle_stats.finish_cycle()
+            print(self.cycle_stats.format_cycle())
+
+    def _crawl_cycle(self):
+        if getattr(self, 'engine', 'thread') == "async":
+            from crawler.async_engine import AsyncCrawlEngine
+            engine = AsyncCrawlEngine([self], **AsyncCrawlEngine.options_from_config(self.__dict__))
+            error_urls = engine.crawl_once()[self.crawler_name]
+        elif self.task == "url":
             error_urls = self.crawl_urls(self.urls_fpath, self.output_dpath)
         elif self.task == "type":
             error_urls = self.crawl_types()
+            self.full_sweep_pending = False
         else:
             error_urls = []
 
@@ -106,36 +466,29 @@ class BaseCrawler(ABC):
                 cycle += 1
             except KeyboardInterrupt:
                 print("\nStopped by user")
+                if self.elastic_indexer:
+                    self.elastic_indexer.close()
+                if self.article_store:
+                    self.article_store.close()
                 break
             except Exception as e:
                 print(f"Cycle error: {e}")
                 time.sleep(60)
 
-    def check_url_modified(self, url):
-        """Check if URL has been modified using HEAD request"""
-        if not self.use_head_check:
-            return True
-
-        try:
-            response = requests.head(url, timeout=10, allow_redirects=True)
-            hash_str = f"{response.headers.get('ETag', '')}{response.headers.get('Last-Modified', '')}"
-            url_hash = hashlib.md5(hash_str.encode()).hexdigest()
-
-            if url in self.url_hashes and self.url_hashes[url] == url_hash:
-                return False
-
-            self.url_hashes[url] = url_hash
-            return True
-        except:
-            return True
-
     def crawl_urls(self, urls_fpath, output_dpath):
         """Crawl contents from a list of urls. Returns list of failed urls."""
-        create_dir(output_dpath)
-        urls = list(read_file(urls_fpath))
+        return self.crawl_url_list(list(read_file(urls_fpath)), output_dpath)
 
+    def crawl_url_list(self, urls, output_dpath, start=0):
+        """
+        Crawl urls into output_dpath, numbering output files from start.
+        Returns list of failed urls
+        """
+        self.create_output_dir(output_dpath)
         if self.continuous_mode:
-            urls = [u for u in urls if u not in self.crawled_urls]
+            new_urls = [u for u in urls if u not in self.crawled_urls]
+            self.cycle_stats.add(self.source, 'skipped', len(urls) - len(new_urls))
+            urls = new_urls
             if not urls:
                 print(f"[{self.crawler_name}] No new URLs to crawl")
                 return []
@@ -143,9 +496,9 @@ class BaseCrawler(ABC):
         num_urls = len(urls)
         print(f"[{self.crawler_name}] Crawling {num_urls} URLs...")
 
-        self.index_len = len(str(num_urls))
+        self.index_len = len(str(start + num_urls))
 
-        args = ([output_dpath] * num_urls, urls, range(num_urls))
+        args = ([output_dpath] * num_urls, urls, range(start, start + num_urls))
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
             results = list(tqdm(executor.map(self.crawl_url_thread, *args), total=num_urls, desc=f"{self.crawler_name}"))
 
@@ -154,34 +507,69 @@ class BaseCrawler(ABC):
     def crawl_url_thread(self, output_dpath, url, index):
         """Crawl content of the specific url"""
         if url in self.crawled_urls:
+            self.cycle_stats.add(self.source, 'skipped')
             return None
 
-        if not self.check_url_modified(url):
+        output_fpath = self.get_output_fpath(output_dpath, index)
+        try:
+            article = self.write_content(url, output_fpath, self.category_of(output_dpath))
+        except NotModified:
+            self.cycle_stats.add(self.source, 'skipped')
+            return None
+        except TooOld as e:
+            self.drop_validators(url)
+            self.skip_too_old(url, e.args[1])
             return None
 
-        file_index = str(index + 1).zfill(self.index_len)
-        output_fpath = "".join([output_dpath, "/url_", file_index, ".txt"])
-        is_success = self.write_content(url, output_fpath)
+        if article:
+            self.on_article_written(article)
+            return None
+        else:
+            # Validators chỉ được giữ khi bài đã ghi xong (on_article_written)
+            self.drop_validators(url)
+            self.cycle_stats.add(self.source, 'failed')
+            return url
 
-        if is_success:
-            self.crawled_urls.add(url)
+    @staticmethod
+    def category_of(output_dpath):
+        """Category = name of the result folder of the article type"""
+        return output_dpath.split('/')[-1] if '/' in output_dpath else output_dpath.split('\\')[-1]
 
-            # Index to Elasticsearch if enabled
-            if self.enable_elastic and self.elastic_indexer:
-                try:
-                    with open(output_fpath, 'r', encoding='utf-8') as f:
-                        content = f.read()
+    def create_output_dir(self, output_dpath):
+        """Create the folder of the url_NNN.txt files (storage: files); the segmented store keeps its own"""
+        if not self.article_store:
+            create_dir(output_dpath)
 
-                    source = self.__class__.__name__.replace('Crawler', '').lower()
-                    category = output_dpath.split('/')[-1] if '/' in output_dpath else output_dpath.split('\\')[-1]
+    def get_output_fpath(self, output_dpath, index):
+        """url_NNN.txt path of an article (storage: files), None with the segmented store"""
+        if self.article_store:
+            return None
+        file_index = str(index + 1).zfill(self.index_len)
+        return "".join([output_dpath, "/url_", file_index, ".txt"])
 
-                    self.elastic_indexer.index_article(content, source, category, url)
-                except:
-                    pass
+    def on_article_written(self, article):
+        """Mark article as crawled, record it in the state store and index it"""
+        url = article.url
+        self.crawled_urls.add(url)
+        self.cycle_stats.add(self.source, 'fetched')
+        self.confirm_validators(url)
 
-            return None
-        else:
-            return url
+        if self.state_store:
+            content_hash = hashlib.md5(article.to_text().encode()).hexdigest()
+            self.state_store.record_fetch(url, self.crawler_name, content_hash)
+
+        # Index to Elasticsearch if enabled
+        if self.enable_elastic and self.elastic_indexer:
+            try:
+                def on_indexed():
+                    self.cycle_stats.add(self.source, 'indexed')
+                    if self.state_store:
+                        self.state_store.mark_indexed(url)
+
+                with metrics.stage("index_enqueue", self.source):
+                    self.elastic_indexer.submit_article(article, on_indexed=on_indexed)
+            except:
+                pass
 
     def crawl_types(self):
         """ Crawling contents of a specific type or all types """
@@ -197,21 +585,32 @@ class BaseCrawler(ABC):
         """" Crawl total_pages of articles in specific type """
         error_urls = list()
 
-        # getting urls
-        print(f"[{self.crawler_name}] Getting URLs from {article_type}...")
-        articles_urls = self.get_urls_of_type(article_type)
-        print(f"[{self.crawler_name}] Found {len(articles_urls)} unique URLs")
-
         # Replace / with _ for file/folder names to avoid directory issues
         safe_article_type = article_type.replace("/", "_")
+        results_type_dpath = "/".join([results_dpath, safe_article_type])
+
+        start = 0
+
+        def crawl_wave(urls):
+            nonlocal start
+            error_urls.extend(self.crawl_url_list(urls, results_type_dpath, start))
+            start += len(urls)
+
+        # getting urls; với max_days_old, bài của mỗi đợt được crawl trước khi tải đợt sau
+        # (ngày đăng trong <head> của bài quyết định dừng phân trang)
+        print(f"[{self.crawler_name}] Getting URLs from {article_type}...")
+        articles_urls = self.get_urls_of_type(article_type, crawl_wave if self.max_days_old else None)
+        print(f"[{self.crawler_name}] Found {len(articles_urls)} unique URLs")
+        self.cycle_stats.add(self.source, 'discovered', len(articles_urls))
 
         articles_urls_fpath = "/".join([urls_dpath, f"{safe_article_type}.txt"])
         with open(articles_urls_fpath, "w", encoding="utf-8") as urls_file:
             urls_file.write("\n".join(articles_urls))
 
         # crawling urls
-        results_type_dpath = "/".join([results_dpath, safe_article_type])
-        error_urls = self.crawl_urls(articles_urls_fpath, results_type_dpath)
+        if not self.max_days_old:
+            error_urls = self.crawl_urls(articles_urls_fpath, results_type_dpath)
+        self.finish_listing(article_type, error_urls)
 
         return error_urls
 
@@ -219,9 +618,7 @@ class BaseCrawler(ABC):
         """" Crawl articles from all categories with total_pages per category """
         total_error_urls = list()
 
-        num_types = len(self.article_type_dict)
-        for i in range(num_types):
-            article_type = self.article_type_dict[i]
+        for article_type in self.get_article_types():
             error_urls = self.crawl_type(article_type, urls_dpath, results_dpath)
             if error_urls:
                 print(f"{article_type}: {len(error_urls)} failed URLs")
@@ -229,12 +626,98 @@ class BaseCrawler(ABC):
 
         return total_error_urls
 
-    def get_urls_of_type(self, article_type):
-        """Get urls of articles in a specific type"""
-        args = ([article_type] * self.total_pages, range(1, self.total_pages + 1))
+    def get_article_types(self):
+        """ Article types crawled by task 'type' """
+        if self.article_type != "all":
+            return [self.article_type]
+        return [self.article_type_dict[i] for i in range(len(self.article_type_dict))]
+
+    def request_full_sweep(self):
+        """Fetch all total_pages listing pages in the next cycle"""
+        self.full_sweep_pending = True
+
+    def is_incremental_listing(self):
+        """Incremental listing this cycle: not on first run, on demand (full sweep) or in 'full' mode"""
+        return self.listing_mode == "incremental" and not self.full_sweep_pending and bool(self.crawled_urls)
+
+    def listing_waves(self):
+        """
+        Listing page numbers grouped in waves fetched one after another.
+        A single wave (full sweep) unless listing is incremental or bounded
+        by max_days_old (listing pages go from the newest to the oldest)
+        """
+        pages = list(range(1, self.total_pages + 1))
+        if not self.is_incremental_listing() and not self.max_days_old:
+            return [pages]
+
+        size = self.listing_wave_size
+        return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+    def is_listing_exhausted(self, wave_urls, found_urls):
+        """True when a wave brought no unseen URLs (or at most listing_min_new_ratio of them)"""
+        wave_urls = set(wave_urls)
+        new_urls = [u for u in wave_urls if u not in self.crawled_urls and u not in found_urls]
+        return not new_urls or len(new_urls) <= self.listing_min_new_ratio * len(wave_urls)
+
+    def is_listing_done(self, wave_urls, found_urls, expired, incremental):
+        """
+        After a wave: stop when one of its pages only lists articles older than
+        max_days_old, or (incremental listing) when it brought no unseen URLs
+        """
+        return expired or (incremental and self.is_listing_exhausted(wave_urls, found_urls))
+
+    def is_page_expired(self, urls):
+        """After crawling a listing page: all its articles turned out older than max_days_old"""
+        return bool(urls) and all(url in self.too_old_urls for url in urls)
+
+    def get_urls_of_type(self, article_type, crawl_wave=None):
+        """
+        Get urls of articles in a specific type
+        @param crawl_wave (callable): crawl_wave(urls) crawls the new urls of each wave before
+               the next one is fetched; listing then also stops after a page whose articles
+               all were too old (dates only found in the article pages)
+        """
+        articles_urls = set()
+        waves = self.listing_waves()
+        incremental = self.is_incremental_listing()
+
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
-            results = list(
-                tqdm(executor.map(self.get_urls_of_type_thread, *args), total=self.total_pages, desc="Pages"))
+            for wave in tqdm(waves, desc="Pages", disable=len(waves) > 1):
+                args = ([article_type] * len(wave), wave)
+                results = list(executor.map(self.get_urls_of_type_thread, *args))
+                wave_urls = [url for urls, _ in results for url in urls]
+
+                done = self.is_listing_done(wave_urls, articles_urls, any(e for _, e in results), incremental)
+                new_urls = [url for url in dict.fromkeys(wave_urls) if url not in articles_urls]
+                articles_urls.update(wave_urls)
+                if crawl_wave:
+                    crawl_wave(new_urls)
+                    done = done or any(self.is_page_expired(urls) for urls, _ in results)
+                if done:
+                    break
+
+        return list(articles_urls)
 
-        articles_urls = sum(results, [])
-        return list(set(articles_urls))
\ No newline at end of file
+
+def configure_indexer(indexer, config, output_dpath):
+    """Start the bulk pipeline and near-duplicate detection of indexer per the YAML config"""
+    if config.get('bulk_index', True):
+        indexer.start_bulk_pipeline(**bulk_options_from_config(config))
+
+    if config.get('dedup', True):
+        create_dir(output_dpath)
+        indexer.enable_dedup(
+            config.get('dedup_db') or f"{output_dpath}/dedup.sqlite3",
+            max_distance=config.get('dedup_max_distance', 3)
+        )
+
+
+def bulk_options_from_config(config):
+    """BulkIndexer options from the YAML config"""
+    options = {
+        'max_docs': config.get('bulk_max_docs'),
+        'max_bytes': config.get('bulk_max_bytes'),
+        'max_latency': config.get('bulk_max_latency'),
+        'queue_size': config.get('bulk_queue_size'),
+    }
+    return {k: v for k, v in options.items() if v is not None}
@@ -3,6 +3,10 @@ import time
 import threading
 from datetime import datetime
 from .factory import get_crawler
+from .base_crawler import configure_indexer
+from .transport import HttpTransport
+from .metrics import metrics
+from .cycle_stats import CycleStats
 from elastic_indexer import ElasticIndexer
 
 # Lock để tránh outputs bị lẫn lộn
@@ -19,6 +23,9 @@ class UnifiedCrawler:
         self.continuous_mode = kwargs.get('continuous_mode', False)
         self.crawl_interval = kwargs.get('crawl_interval', 10800)
         self.output_dpath = kwargs.get('output_dpath', 'result')
+        self.engine = kwargs.get('engine', 'thread')  # thread | async
+        self.scheduler = kwargs.get('scheduler', 'per_source')  # per_source | global
+        self.global_workers = kwargs.get('global_workers', 8)
 
         # Elasticsearch
         self.enable_elastic = kwargs.get('enable_elastic', False)
@@ -35,13 +42,24 @@ class UnifiedCrawler:
                     es_url=es_url,
                     username=es_username,
                     password=es_password,
-                    index_name=es_index
+                    index_name=es_index,
+                    partition=kwargs.get('es_partition')
                 )
+                configure_indexer(self.elastic_indexer, kwargs, self.output_dpath)
                 print(f"Elasticsearch: {es_url}/{es_index}")
             except Exception as e:
                 print(f"Elasticsearch init failed: {e}")
                 self.enable_elastic = False
 
+        # Thống kê từng cycle (giữ trong process), tổng số trên ES chỉ lấy khi cần và được cache
+        self.cycle_stats = CycleStats(kwargs.get('stats_history', 50))
+        self.show_es_totals = kwargs.get('show_es_totals', False)
+        self.es_totals_ttl = kwargs.get('es_totals_ttl', 600)
+        self._es_totals = None  # (fetched_at, total, {source: count})
+
+        # Một transport dùng chung cho mọi crawler: mỗi host có pool keep-alive và rate limiter riêng
+        self.transport = HttpTransport.from_config(kwargs)
+
         # Initialize crawlers
         self.crawlers = []
         self._init_crawlers()
@@ -58,8 +76,15 @@ class UnifiedCrawler:
                     **self.config,
                     'webname': crawler_name,
                     'article_type': article_type,
+                    # Nguồn có thể đặt max_days_old riêng
+                    'max_days_old': crawler_config.get('max_days_old', self.config.get('max_days_old')),
                     'output_dpath': f"{self.output_dpath}/{crawler_name}_quansu",
                     'continuous_mode': False,
+                    'transport': self.transport,
+                    'enable_elastic': self.enable_elastic,
+                    'elastic_indexer': self.elastic_indexer,
+                    'cycle_stats': self.cycle_stats,
+                    'engine': 'thread',  # async engine được điều phối ở đây
                 }
 
                 # Remove crawlers list from individual config
@@ -91,9 +116,33 @@ class UnifiedCrawler:
     def _crawl_once(self):
         """Chạy song song tất cả crawlers"""
         print(f"\n{'='*60}")
-        print(f"Starting crawl cycle - PARALLEL MODE")
+        print(f"Starting crawl cycle - {'ASYNC' if self.engine == 'async' else 'PARALLEL'} MODE")
         print(f"{'='*60}\n")
 
+        self._run_all_crawlers()
+
+        # Hiển thị thống kê
+        self._show_stats()
+
+    def _run_all_crawlers(self):
+        """Chạy một cycle cho tất cả crawlers (thread mỗi nguồn hoặc async engine)"""
+        self.cycle_stats.start_cycle()
+        with metrics.stage("cycle", "all"):
+            self._run_cycle()
+
+        # Chờ ES xác nhận các bài của cycle này để đếm 'indexed'
+        if self.elastic_indexer:
+            self.elastic_indexer.flush()
+        self.cycle_stats.finish_cycle()
+
+    def _run_cycle(self):
+        if self.engine == "async":
+            self._run_async_engine()
+            return
+        if self.scheduler == "global":
+            self._run_global_scheduler()
+            return
+
         threads = []
 
         # Tạo thread cho mỗi crawler
@@ -110,8 +159,43 @@ class UnifiedCrawler:
         for thread in threads:
             thread.join()
 
-        # Hiển thị thống kê
-        self._show_stats()
+    def _run_global_scheduler(self):
+        """Một frontier và một ngân sách worker cho tất cả nguồn"""
+        from .scheduler import GlobalScheduler
+
+        try:
+            scheduler = GlobalScheduler(
+                [crawler_info['instance'] for crawler_info in self.crawlers],
+                max_workers=self.global_workers
+            )
+            results = scheduler.crawl_once()
+        except Exception as e:
+            print(f"Global scheduler error: {e}")
+            return
+
+        for name, error_urls in results.items():
+            if error_urls:
+                print(f"[{name}] Failed URLs: {len(error_urls)}")
+            print(f"{name} completed")
+
+    def _run_async_engine(self):
+        """Chạy tất cả nguồn trên một event loop"""
+        from .async_engine import AsyncCrawlEngine
+
+        try:
+            engine = AsyncCrawlEngine(
+                [crawler_info['instance'] for crawler_info in self.crawlers],
+                **AsyncCrawlEngine.options_from_config(self.config)
+            )
+            results = engine.crawl_once()
+        except Exception as e:
+            print(f"Async engine error: {e}")
+            return
+
+        for name, error_urls in results.items():
+            if error_urls:
+                print(f"[{name}] Failed URLs: {len(error_urls)}")
+            print(f"{name} completed")
 
     def _run_crawler(self, crawler_info):
         """Chạy một crawler trong thread riêng"""
@@ -141,26 +225,7 @@ class UnifiedCrawler:
                 print(f"CYCLE {cycle} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print(f"{'='*60}\n")
 
-                for crawler_info in self.crawlers:
-                    crawler = crawler_info['instance']
-                    if hasattr(crawler, 'reset_blocked_status'):
-                        crawler.reset_blocked_status()
-
-                threads = []
-
-                # Tạo thread cho mỗi crawler
-                for crawler_info in self.crawlers:
-                    thread = threading.Thread(
-                        target=self._run_crawler,
-                        args=(crawler_info,),
-                        daemon=True
-                    )
-                    threads.append(thread)
-                    thread.start()
-
-                # Chờ tất cả threads hoàn thành
-                for thread in threads:
-                    thread.join()
+                self._run_all_crawlers()
 
                 self._show_stats()
 
@@ -173,6 +238,11 @@ class UnifiedCrawler:
 
             except KeyboardInterrupt:
                 print("\n\nStopped by user")
+                if self.elastic_indexer:
+                    self.elastic_indexer.close()
+                for crawler_info in self.crawlers:
+                    if crawler_info['instance'].article_store:
+                        crawler_info['instance'].article_store.close()
                 break
             except Exception as e:
                 print(f"\nCycle error: {e}")
@@ -180,48 +250,54 @@ class UnifiedCrawler:
                 time.sleep(60)
 
     def _show_stats(self):
-        """Show statistics after crawl cycle"""
+        """Show statistics of the cycle that just finished (no Elasticsearch query)"""
         print(f"\n{'='*60}")
         print("STATISTICS")
         print(f"{'='*60}")
+        print(self.cycle_stats.format_cycle())
 
-        # Count articles from Elasticsearch
-        if self.enable_elastic and self.elastic_indexer:
-            try:
-                # Get document count
-                count = self.elastic_indexer.es.count(index=self.elastic_indexer.index_name)
-                total_docs = count['count']
-
-                print(f"Total articles in Elasticsearch: {total_docs}")
-
-                # Count by source
-                aggs_query = {
-                    "size": 0,
-                    "aggs": {
-                        "by_source": {
-                            "terms": {
-                                "field": "source",
-                                "size": 100
-                            }
-                        }
-                    }
-                }
+        if len(self.cycle_stats.history) > 1:
+            print("\nRecent cycles:")
+            print(self.cycle_stats.format_history())
 
-                result = self.elastic_indexer.es.search(
-                    index=self.elastic_indexer.index_name,
-                    body=aggs_query
-                )
+        if self.show_es_totals:
+            self._print_es_totals()
 
-                print("\nBy source:")
-                for bucket in result['aggregations']['by_source']['buckets']:
-                    source = bucket['key']
-                    count = bucket['doc_count']
-                    print(f"  {source:12} : {count:5} articles")
+        print(f"{'='*60}\n")
 
-            except Exception as e:
-                print(f"Could not retrieve stats: {e}")
-        else:
-            print("Elasticsearch not enabled")
+    def get_es_totals(self, refresh=False):
+        """
+        Total documents in the index and count by source, cached for es_totals_ttl seconds
+        @return (tuple): (total, {source: count}), None if Elasticsearch is disabled or failed
+        """
+        if not (self.enable_elastic and self.elastic_indexer):
+            return None
 
-        print(f"{'='*60}\n")
+        if not refresh and self._es_totals and time.monotonic() - self._es_totals[0] < self.es_totals_ttl:
+            return self._es_totals[1:]
+
+        try:
+            es = self.elastic_indexer.es
+            index_name = self.elastic_indexer.read_index
+            total = es.count(index=index_name)['count']
+            result = es.search(index=index_name, body={
+                "size": 0,
+                "aggs": {"by_source": {"terms": {"field": "source", "size": 100}}}
+            })
+            by_source = {b['key']: b['doc_count'] for b in result['aggregations']['by_source']['buckets']}
+        except Exception as e:
+            print(f"Could not retrieve stats: {e}")
+            return self._es_totals[1:] if self._es_totals else None
+
+        self._es_totals = (time.monotonic(), total, by_source)
+        return total, by_source
+
+    def _print_es_totals(self):
+        totals = self.get_es_totals()
+        if not totals:
+            return
 
+        total, by_source = totals
+        print(f"\nTotal articles in Elasticsearch: {total}")
+        for source, count in sorted(by_source.items()):
+            print(f"  {source:12} : {count:5} articles")
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+# Counters kept per source and cycle
+COUNTERS = ("discovered", "skipped", "fetched", "failed", "indexed", "bytes")
+
+
+class CycleStats:
+    """
+    In-process per-cycle, per-source counters (discovered, skipped, fetched,
+    failed, indexed, bytes, duration), kept as a rolling history of the last
+    cycles. Updated by the crawlers while they run, so printing is instant
+    """
+
+    def __init__(self, history=50):
+        """
+            history: Number of finished cycles to keep
+        """
+        self.history = deque(maxlen=max(history, 1))
+        self.current = None
+        self._cycle = 0
+        self._lock = threading.Lock()
+
+    def start_cycle(self):
+        with self._lock:
+            return self._new_cycle()
+
+    def _new_cycle(self):
+        self._cycle += 1
+        self.current = {
+            'cycle': self._cycle,
+            'started_at': datetime.now().isoformat(timespec="seconds"),
+            'start': time.monotonic(),
+            'duration': None,
+            'sources': {},
+        }
+        return self.current
+
+    def _source(self, source):
+        # Cập nhật đến sau khi cycle đã đóng (vd. ES xác nhận index muộn) tính cho cycle vừa xong
+        cycle = self.current or (self.history[-1] if self.history else self._new_cycle())
+        return cycle['sources'].setdefault(source, {
+            **{key: 0 for key in COUNTERS}, 'start': time.monotonic(), 'duration': None})
+
+    def start_source(self, source):
+        with self._lock:
+            self._source(source)['start'] = time.monotonic()
+
+    def add(self, source, key, n=1):
+        with self._lock:
+            self._source(source)[key] += n
+
+    def finish_source(self, source):
+        with self._lock:
+            entry = self._source(source)
+            entry['duration'] = time.monotonic() - entry['start']
+
+    def finish_cycle(self):
+        """Close the current cycle, move it to the history and return it"""
+        with self._lock:
+            cycle = self.current
+            if cycle is None:
+                return None
+            cycle['duration'] = time.monotonic() - cycle['start']
+            for entry in cycle['sources'].values():
+                if entry['duration'] is None:
+                    entry['duration'] = cycle['duration']
+            self.history.append(cycle)
+            self.current = None
+            return cycle
+
+    def last_cycle(self):
+        with self._lock:
+            return self.history[-1] if self.history else None
+
+    def format_cycle(self, cycle=None):
+        """Table of one cycle (the last finished one by default)"""
+        cycle = cycle or self.last_cycle()
+        if not cycle:
+            return "No cycle finished yet"
+
+        header = f"{'source':12} {'found':>6} {'skip':>6} {'fetch':>6} {'fail':>6} {'index':>6} {'MB':>8} {'time':>8}"
+        lines = [f"Cycle {cycle['cycle']} ({cycle['started_at']}, {cycle['duration']:.1f}s)", header]
+        totals = {key: 0 for key in COUNTERS}
+        for source, entry in sorted(cycle['sources'].items()):
+            for key in COUNTERS:
+                totals[key] += entry[key]
+            lines.append(self._format_row(source, entry, entry['duration']))
+        if len(cycle['sources']) > 1:
+            lines.append(self._format_row("total", totals, cycle['duration']))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_row(name, entry, duration):
+        return (f"{name:12} {entry['discovered']:>6} {entry['skipped']:>6} {entry['fetched']:>6} "
+                f"{entry['failed']:>6} {entry['indexed']:>6} {entry['bytes'] / 1e6:>8.2f} {duration:>7.1f}s")
+
+    def format_history(self, last=10):
+        """One line per recent cycle: fetched/failed/indexed and duration"""
+        with self._lock:
+            cycles = list(self.history)[-last:]
+        lines = []
+        for cycle in cycles:
+            fetched = sum(e['fetched'] for e in cycle['sources'].values())
+            failed = sum(e['failed'] for e in cycle['sources'].values())
+            indexed = sum(e['indexed'] for e in cycle['sources'].values())
+            lines.append(f"  #{cycle['cycle']:<4} {cycle['started_at']}  fetched {fetched:>5}  failed {failed:>4}  "
+                         f"indexed {indexed:>5}  {cycle['duration']:.1f}s")
+        return "\n".join(lines)
@@ -0,0 +1,128 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash over word shingles of text (None if text is too short)"""
+    words = WORD_RE.findall(unicodedata.normalize("NFC", text).lower())
+    if len(words) < shingle_size:
+        return None
+
+    weights = [0] * 64
+    for i in range(len(words) - shingle_size + 1):
+        shingle = " ".join(words[i:i + shingle_size])
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """
+    SimHash fingerprints of indexed articles with an LSH band index.
+    With 4 bands of 16 bits, any two fingerprints within Hamming distance 3
+    share at least one band, so lookups only compare a few candidates.
+    Fingerprints are persisted in SQLite and loaded at startup
+    """
+
+    BANDS = 4
+    BAND_BITS = 16
+
+    def __init__(self, db_path, max_distance=3, min_words=30):
+        """
+            db_path: SQLite file holding fingerprints
+            max_distance: Max Hamming distance to call two bodies near-duplicates
+            min_words: Bodies shorter than this are never deduplicated
+        """
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self._bands = {}      # (band, value) -> [(fingerprint, doc_id)]
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                doc_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                source TEXT,
+                url TEXT
+            )
+        """)
+        self.conn.commit()
+
+        for doc_id, fingerprint in self.conn.execute("SELECT doc_id, fingerprint FROM fingerprints"):
+            self._add_bands(int(fingerprint, 16), doc_id)
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.BAND_BITS) - 1
+        return [(band, fingerprint >> (band * self.BAND_BITS) & mask) for band in range(self.BANDS)]
+
+    def _add_bands(self, fingerprint, doc_id):
+        for key in self._band_keys(fingerprint):
+            self._bands.setdefault(key, []).append((fingerprint, doc_id))
+
+    def fingerprint(self, body):
+        if len(WORD_RE.findall(body)) < self.min_words:
+            return None
+        return simhash(body)
+
+    def find(self, doc_id, body):
+        """
+        Return (doc_id of an already indexed near-duplicate of body or None,
+        fingerprint to register with add() once doc_id is indexed). The
+        fingerprint is None for short bodies and for doc_id itself (re-crawl)
+        """
+        fingerprint = self.fingerprint(body)
+        if fingerprint is None:
+            return None, None
+
+        with self._lock:
+            best = None
+            for key in self._band_keys(fingerprint):
+                for other, other_id in self._bands.get(key, ()):
+                    if other_id == doc_id:
+                        # Cùng bài (crawl lại): không phải bản trùng
+                        return None, None
+                    distance = hamming_distance(fingerprint, other)
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, other_id)
+        if best:
+            return best[1], None
+        return None, fingerprint
+
+    def add(self, doc_id, fingerprint, source="", url=""):
+        """
+        Register the fingerprint of a document Elasticsearch accepted. Only
+        indexed documents are registered, so a near-copy is never linked to a
+        document whose indexing failed (copies submitted before the first one
+        is acknowledged are all indexed)
+        """
+        with self._lock:
+            key = self._band_keys(fingerprint)[0]
+            if any(other_id == doc_id for _, other_id in self._bands.get(key, ())):
+                return
+            self._add_bands(fingerprint, doc_id)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (doc_id, fingerprint, source, url) VALUES (?, ?, ?, ?)",
+                (doc_id, format(fingerprint, "016x"), source, url))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
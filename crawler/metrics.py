@@ -0,0 +1,253 @@
+"""
+Per-stage crawler metrics: counters by (stage, source, outcome) and latency
+histograms by (stage, source), exposed on a local HTTP endpoint
+(/metrics in Prometheus text format, /metrics.json) and dumped periodically
+to a JSON file.
+
+Stages: fetch_listing, fetch_article, parse_listing, parse_article, write,
+index_enqueue (handing the document to the bulk queue), bulk_request (the
+_bulk round trip), cycle.
+Outcomes: ok, not_modified, timeout, http_error, miss (parse found nothing), error
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+
+
+# Upper bounds (seconds) of histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Estimate of the q quantile, interpolated inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if BUCKETS[i] != float("inf") else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-2]
+
+
+class StageTimer:
+    """Context manager timing one stage; set .outcome inside the block, exceptions are classified on exit"""
+
+    def __init__(self, registry, stage, source):
+        self.registry = registry
+        self.stage = stage
+        self.source = source
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type and self.outcome == "ok":
+            self.outcome = classify_exception(exc)
+        self.registry.observe(self.stage, self.source, self.outcome, time.perf_counter() - self.start)
+        return False
+
+
+def classify_exception(exc):
+    if isinstance(exc, (requests.exceptions.Timeout, asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    return "error"
+
+
+def http_outcome(status):
+    if status == 304:
+        return "not_modified"
+    return "http_error" if status >= 400 else "ok"
+
+
+class Metrics:
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters = {}     # (stage, source, outcome) -> count
+        self._histograms = {}   # (stage, source) -> Histogram
+        self._lock = threading.Lock()
+
+    def stage(self, stage, source):
+        """with metrics.stage("parse_article", "vnexpress") as m: ...; m.outcome = "miss" """
+        return StageTimer(self, stage, source)
+
+    def observe(self, stage, source, outcome, seconds):
+        with self._lock:
+            key = (stage, source, outcome)
+            self._counters[key] = self._counters.get(key, 0) + 1
+            self._histograms.setdefault((stage, source), Histogram()).observe(seconds)
+
+    def count(self, stage, source, outcome, n=1):
+        """Counter only (no latency), e.g. documents of a bulk request"""
+        with self._lock:
+            key = (stage, source, outcome)
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def snapshot(self):
+        """{stage: {source: {outcomes, count, sum_s, mean_ms, p50_ms, p99_ms}}}"""
+        with self._lock:
+            stages = {}
+            for (stage, source, outcome), n in sorted(self._counters.items()):
+                entry = stages.setdefault(stage, {}).setdefault(source, {'outcomes': {}})
+                entry['outcomes'][outcome] = n
+
+            for (stage, source), histogram in self._histograms.items():
+                stages[stage][source].update({
+                    'count': histogram.count,
+                    'sum_s': round(histogram.sum, 4),
+                    'mean_ms': round(1000 * histogram.sum / histogram.count, 3),
+                    'p50_ms': round(1000 * histogram.quantile(0.5), 3),
+                    'p99_ms': round(1000 * histogram.quantile(0.99), 3),
+                })
+
+        return {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'stages': stages,
+        }
+
+    def to_prometheus(self):
+        lines = [
+            "# TYPE crawler_stage_total counter",
+        ]
+        with self._lock:
+            for (stage, source, outcome), n in sorted(self._counters.items()):
+                lines.append(f'crawler_stage_total{{stage="{stage}",source="{source}",outcome="{outcome}"}} {n}')
+
+            lines.append("# TYPE crawler_stage_seconds histogram")
+            for (stage, source), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",source="{source}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS, histogram.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'crawler_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'crawler_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'crawler_stage_seconds_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, fpath):
+        """Write the JSON snapshot to fpath (atomically)"""
+        tmp_fpath = f"{fpath}.tmp"
+        with open(tmp_fpath, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_fpath, fpath)
+
+
+# Registry dùng chung cho mọi crawler, engine và indexer trong process
+metrics = Metrics()
+
+
+class MetricsServer:
+    """Local HTTP endpoint: GET /metrics (Prometheus text) and /metrics.json"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        registry_ = registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/metrics":
+                    body, content_type = registry_.to_prometheus().encode(), "text/plain; version=0.0.4"
+                elif path == "/metrics.json":
+                    body = json.dumps(registry_.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsDumper:
+    """Background thread writing the JSON snapshot to fpath every interval seconds"""
+
+    def __init__(self, registry, fpath, interval=60):
+        self.registry = registry
+        self.fpath = fpath
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._dump()
+
+    def _dump(self):
+        try:
+            self.registry.dump(self.fpath)
+        except Exception as e:
+            print(f"Metrics dump failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._dump()
+
+
+def start_metrics(config):
+    """
+    Start the metrics endpoint (metrics_port) and the periodic JSON dump
+    (metrics_dump, every metrics_dump_interval seconds) from the YAML config.
+    Returns the started services
+    """
+    services = []
+    if config.get('metrics_port'):
+        host = config.get('metrics_host', '127.0.0.1')
+        try:
+            services.append(MetricsServer(metrics, host, config['metrics_port']).start())
+            print(f"Metrics: http://{host}:{config['metrics_port']}/metrics")
+        except OSError as e:
+            print(f"Metrics endpoint failed: {e}")
+
+    if config.get('metrics_dump'):
+        services.append(MetricsDumper(metrics, config['metrics_dump'], config.get('metrics_dump_interval', 60)).start())
+    return services
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+DEFAULT_LIMITS = {
+    'requests_per_second': 5.0,       # Tốc độ khởi đầu (token bucket), AIMD tăng dần khi host khỏe
+    'max_requests_per_second': 20.0,  # Trần cứng của tốc độ
+    'burst': 5,                       # Số token tích lũy tối đa
+    'initial_concurrency': None,      # Mặc định: một nửa max_concurrency
+    'max_concurrency': 10,
+    'target_latency': 2.0,        # Latency (giây) còn coi là khỏe để tăng concurrency
+    'max_retry_after': 300,       # Chờ tối đa khi server gửi Retry-After
+}
+
+
+class HostLimiter:
+    """
+    Token bucket + AIMD rate and concurrency for one host.
+    Both start below their ceilings: concurrency grows by ~1 per window of
+    healthy responses and the rate by 0.1 rps per healthy response, up to
+    max_concurrency / max_requests_per_second. Timeouts/429/5xx halve the
+    concurrency; 429/503/timeouts also halve the rate and Retry-After pauses
+    the host
+    """
+
+    def __init__(self, host, requests_per_second=5.0, max_requests_per_second=20.0, burst=5,
+                 initial_concurrency=None, max_concurrency=10, target_latency=2.0, max_retry_after=300):
+        self.host = host
+        self.max_rate = max(float(max_requests_per_second), float(requests_per_second))
+        self.rate = float(requests_per_second)
+        self.burst = max(float(burst), 1.0)
+        self.tokens = self.burst
+        self.max_concurrency = max(int(max_concurrency), 1)
+        if initial_concurrency is None:
+            initial_concurrency = self.max_concurrency // 2
+        self.concurrency = float(min(max(initial_concurrency, 1), self.max_concurrency))
+        self.target_latency = target_latency
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self):
+        """Take a slot if possible; otherwise return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.concurrency):
+                return 0.05
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def has_capacity(self):
+        """True if a request could start now without waiting for a concurrency slot or a pause"""
+        with self._lock:
+            return time.monotonic() >= self.paused_until and self.in_flight < int(self.concurrency)
+
+    def acquire(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency, status=None, timeout=False, error=False, retry_after=None):
+        """Report the outcome of a request started with acquire()"""
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+            throttled = status in (429, 503)
+            if timeout or error or throttled or (status is not None and status >= 500):
+                self.concurrency = max(self.concurrency / 2, 1.0)
+                if throttled or timeout:
+                    self.rate = max(self.rate / 2, 0.1)
+            elif latency <= self.target_latency:
+                self.concurrency = min(self.concurrency + 1 / self.concurrency, self.max_concurrency)
+                self.rate = min(self.rate + 0.1, self.max_rate)
+
+            delay = parse_retry_after(retry_after)
+            if delay:
+                self.paused_until = max(self.paused_until, time.monotonic() + min(delay, self.max_retry_after))
+
+
+class RateLimiter:
+    """Per-host limiters shared by all crawlers"""
+
+    def __init__(self, defaults=None, hosts=None):
+        """
+            defaults: Limits applied to every host (see DEFAULT_LIMITS)
+            hosts: {hostname: limits} overrides, e.g. {"vnexpress.net": {"requests_per_second": 2}}.
+                A host override that sets requests_per_second without max_requests_per_second
+                keeps that rate as the host's ceiling
+        """
+        self.defaults = {**DEFAULT_LIMITS, **(defaults or {})}
+        self.hosts = hosts or {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from the 'rate_limit' section of the YAML config"""
+        rate_limit = config.get('rate_limit')
+        rate_limit = dict(rate_limit) if isinstance(rate_limit, dict) else {}
+        hosts = rate_limit.pop('hosts', None)
+        if config.get('engine') == 'async':
+            rate_limit.setdefault('max_concurrency', config.get('per_host_limit', 50))
+        else:
+            rate_limit.setdefault('max_concurrency', config.get('num_workers', DEFAULT_LIMITS['max_concurrency']))
+        return cls(rate_limit, hosts)
+
+    def get(self, url):
+        host = urlsplit(url).hostname or url
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                overrides = self._host_overrides(host)
+                limits = {**self.defaults, **overrides}
+                if 'requests_per_second' in overrides and 'max_requests_per_second' not in overrides:
+                    limits['max_requests_per_second'] = overrides['requests_per_second']
+                limiter = self._limiters[host] = HostLimiter(host, **limits)
+            return limiter
+
+    def _host_overrides(self, host):
+        # "vnexpress.net" cũng áp dụng cho "www.vnexpress.net"
+        for name, limits in self.hosts.items():
+            if host == name or host.endswith("." + name):
+                return limits
+        return {}
+
+
+def parse_retry_after(value):
+    """Retry-After header (seconds or HTTP date) -> seconds, None if absent/invalid"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
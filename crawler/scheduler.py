@@ -0,0 +1,278 @@
+"""
+Global crawl scheduler (scheduler: global)
+One frontier for every source and one worker budget (global_workers)
+instead of one thread per source plus num_workers threads per crawler
+"""
+
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+from tqdm import tqdm
+from utils.utils import init_output_dirs
+
+
+# Task kinds; listing pages come before articles of the same source
+LISTING = 0
+ARTICLE = 1
+
+
+class CrawlFrontier:
+    """
+    Priority queue of crawl tasks across sources.
+    pop() serves the least served source first, then the task with the
+    smallest priority of that source (listing pages, then newest articles)
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._served = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, source, priority, task):
+        with self._lock:
+            heapq.heappush(self._queues.setdefault(source, []), (priority, next(self._seq), task))
+            self._served.setdefault(source, 0)
+
+    def pop(self, is_ready=None):
+        """
+        Pop the best task whose source is ready
+        @param is_ready (callable): is_ready(source, task) -> bool, e.g. host has capacity
+        @return (source, task) or None if nothing is ready
+        """
+        with self._lock:
+            sources = sorted((s for s, q in self._queues.items() if q), key=lambda s: self._served[s])
+            for source in sources:
+                task = self._queues[source][0][2]
+                if is_ready and not is_ready(source, task):
+                    continue
+                heapq.heappop(self._queues[source])
+                self._served[source] += 1
+                return source, task
+            return None
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+
+class ListingJob:
+    """Listing discovery of one article type of one crawler, wave by wave"""
+
+    def __init__(self, crawler, article_type, urls_dpath, results_dpath):
+        self.crawler = crawler
+        self.article_type = article_type
+        self.safe_article_type = article_type.replace("/", "_")
+        self.urls_fpath = "/".join([urls_dpath, f"{self.safe_article_type}.txt"])
+        self.results_dpath = "/".join([results_dpath, self.safe_article_type])
+
+        self.waves = crawler.listing_waves()
+        self.incremental = crawler.is_incremental_listing()
+        self.wave_index = 0
+        self.pending = 0
+        self.wave_urls = {}       # page -> urls of the current wave
+        self.expired = False      # A page of the current wave is older than max_days_old
+        self.found = {}           # url -> (page, position), first sighting
+        self.articles_pending = 0
+        self.error_urls = []
+
+        # With max_days_old the articles of each wave are crawled before the next wave is fetched,
+        # so listing can stop at a page whose articles all turned out too old (dates in <head>)
+        self.bounded = bool(crawler.max_days_old)
+        self.more_waves = False   # Another wave is due once the articles of this one are done
+        self.last_wave = {}       # page -> urls of the last merged wave
+        self.new_urls = []        # Urls first seen in the last merged wave
+        self.next_index = 0       # Number of the next article output file
+
+    def current_wave(self):
+        return self.waves[self.wave_index]
+
+    def add_page(self, page, urls, expired=False):
+        self.wave_urls[page] = urls
+        self.expired = self.expired or expired
+        self.pending -= 1
+
+    def finish_wave(self):
+        """Merge the finished wave; return True if another wave must be fetched"""
+        wave_urls = [u for page in sorted(self.wave_urls) for u in self.wave_urls[page]]
+        done = self.crawler.is_listing_done(wave_urls, self.found, self.expired, self.incremental)
+
+        self.new_urls = []
+        for page in sorted(self.wave_urls):
+            for position, url in enumerate(self.wave_urls[page]):
+                if url not in self.found:
+                    self.found[url] = (page, position)
+                    self.new_urls.append(url)
+        self.last_wave = self.wave_urls
+        self.wave_urls = {}
+        self.expired = False
+
+        self.wave_index += 1
+        if self.wave_index >= len(self.waves):
+            return False
+        return not done
+
+    def last_wave_expired(self):
+        """A page of the last wave only had articles found too old once crawled"""
+        return any(self.crawler.is_page_expired(urls) for urls in self.last_wave.values())
+
+
+class GlobalScheduler:
+
+    def __init__(self, crawlers, max_workers=8):
+        """
+            crawlers: BaseCrawler instances (task 'type') sharing the worker budget
+            max_workers: Total worker threads over all sources
+        """
+        self.crawlers = crawlers
+        self.max_workers = max(max_workers, 1)
+
+    def crawl_once(self):
+        """Run one cycle for all crawlers. Returns {crawler_name: failed urls}"""
+        frontier = CrawlFrontier()
+        errors = {crawler.crawler_name: [] for crawler in self.crawlers}
+        # crawler_name -> listing jobs not finished yet; the source's time ends with its last job
+        self.open_jobs = {}
+
+        for crawler in self.crawlers:
+            crawler.cycle_stats.start_source(crawler.source)
+            urls_dpath, results_dpath = init_output_dirs(crawler.output_dpath)
+            article_types = crawler.get_article_types()
+            self.open_jobs[crawler.crawler_name] = len(article_types)
+            if not article_types:
+                crawler.cycle_stats.finish_source(crawler.source)
+            for article_type in article_types:
+                job = ListingJob(crawler, article_type, urls_dpath, results_dpath)
+                self._push_wave(frontier, job)
+
+        progress = tqdm(total=len(frontier), desc="Global")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while len(frontier) or running:
+                while len(running) < self.max_workers:
+                    item = frontier.pop(self._is_ready)
+                    if item is None:
+                        break
+                    source, task = item
+                    running[executor.submit(self._run_task, task)] = task
+
+                if not running:
+                    # Mọi host đều đang hết lượt, chờ rate limiter
+                    time.sleep(0.05)
+                    continue
+
+                done, _ = concurrent.futures.wait(running, timeout=0.5,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    pushed = self._on_task_done(frontier, task, future.result(), errors)
+                    progress.total += pushed
+                    progress.update(1)
+        progress.close()
+
+        for crawler in self.crawlers:
+            crawler.full_sweep_pending = False
+        return errors
+
+    def _push_wave(self, frontier, job):
+        wave = job.current_wave()
+        job.pending = len(wave)
+        for page in wave:
+            url = job.crawler.get_listing_url(job.article_type, page)
+            frontier.push(job.crawler.crawler_name, (LISTING, page), (LISTING, job, page, url))
+        return len(wave)
+
+    @staticmethod
+    def _is_ready(source, task):
+        """Skip hosts whose rate limiter has no free slot"""
+        crawler, url = task[1].crawler, task[3]
+        limiter = crawler.transport.limiter
+        return limiter is None or limiter.get(url).has_capacity()
+
+    @staticmethod
+    def _run_task(task):
+        kind, job, key, url = task
+        crawler = job.crawler
+        try:
+            if kind == LISTING:
+                return crawler.get_urls_of_type_thread(job.article_type, key)
+            return crawler.crawl_url_thread(job.results_dpath, url, key)
+        except Exception:
+            return ([], False) if kind == LISTING else url
+
+    def _on_task_done(self, frontier, task, result, errors):
+        """Handle a finished task, return the number of new tasks pushed"""
+        kind, job, key, url = task
+        crawler = job.crawler
+
+        if kind == ARTICLE:
+            if result is not None:
+                errors[crawler.crawler_name].append(result)
+                job.error_urls.append(result)
+            job.articles_pending -= 1
+            return self._articles_done(frontier, job) if not job.articles_pending else 0
+
+        job.add_page(key, *result)
+        if job.pending:
+            return 0
+        more_waves = job.finish_wave()
+        if job.bounded:
+            job.more_waves = more_waves
+            return self._push_articles(frontier, job, job.new_urls) or self._articles_done(frontier, job)
+        if more_waves:
+            return self._push_wave(frontier, job)
+        self._save_urls(job)
+        return self._push_articles(frontier, job, sorted(job.found, key=job.found.get)) or \
+            self._articles_done(frontier, job)
+
+    def _articles_done(self, frontier, job):
+        """
+        Every queued article of job is done: fetch the next listing wave
+        (bounded listing, unless a page of this one was all too old), else
+        finish the job. Returns the number of new tasks pushed
+        """
+        crawler = job.crawler
+        if job.more_waves and not job.last_wave_expired():
+            job.more_waves = False
+            return self._push_wave(frontier, job)
+
+        if job.bounded:
+            self._save_urls(job)
+        crawler.finish_listing(job.article_type, job.error_urls)
+
+        # Thời gian của nguồn = đến khi job cuối cùng của nó xong
+        self.open_jobs[crawler.crawler_name] -= 1
+        if not self.open_jobs[crawler.crawler_name]:
+            crawler.cycle_stats.finish_source(crawler.source)
+        return 0
+
+    @staticmethod
+    def _save_urls(job):
+        """Listing done: save the urls file, newest (first page, top) first"""
+        crawler = job.crawler
+        articles_urls = sorted(job.found, key=job.found.get)
+        print(f"[{crawler.crawler_name}] {job.article_type}: found {len(articles_urls)} unique URLs")
+        crawler.cycle_stats.add(crawler.source, 'discovered', len(articles_urls))
+
+        with open(job.urls_fpath, "w", encoding="utf-8") as urls_file:
+            urls_file.write("\n".join(articles_urls))
+
+    def _push_articles(self, frontier, job, urls):
+        """Queue the articles of urls (in order of priority) not crawled yet, return how many"""
+        crawler = job.crawler
+        crawler.create_output_dir(job.results_dpath)
+        crawler.index_len = len(str(job.next_index + len(urls)))
+
+        pushed = 0
+        for index, url in enumerate(urls, job.next_index):
+            if url in crawler.crawled_urls:
+                crawler.cycle_stats.add(crawler.source, 'skipped')
+                continue
+            frontier.push(crawler.crawler_name, (ARTICLE, job.found[url]), (ARTICLE, job, index, url))
+            pushed += 1
+        job.next_index += len(urls)
+
+        job.articles_pending = pushed
+        return pushed
@@ -0,0 +1,95 @@
+import os
+import re
+import unicodedata
+
+
+DICTIONARY_FPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vietnamese_words.txt")
+
+# Dấu câu tách câu thành các đoạn; một từ ghép không vượt qua dấu câu
+PUNCTUATION_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+SYLLABLE_RE = re.compile(r"\w+", re.UNICODE)
+
+END = ""  # Khóa đánh dấu cuối từ trong trie (không âm tiết nào rỗng)
+
+
+class WordSegmenter:
+    """
+    Dictionary-based Vietnamese word segmenter: greedy longest match over a
+    syllable trie. "Tên lửa hành trình" -> "tên_lửa_hành_trình", so compound
+    words are single terms of a whitespace-analyzed field. Syllables outside
+    the dictionary stay single words; stopwords (also multi-syllable ones,
+    "có thể" -> "có_thể") are dropped
+    """
+
+    def __init__(self, words=(), stopwords=()):
+        """
+            words: Dictionary words, syllables separated by spaces
+            stopwords: Words left out of the output
+        """
+        self.trie = {}
+        self.size = 0
+        self.stopwords = set()
+        for word in words:
+            self.add_word(word)
+        for word in stopwords:
+            self.add_word(word)
+            self.stopwords.add("_".join(self._syllables(word)))
+
+    @classmethod
+    def from_files(cls, fpaths=(DICTIONARY_FPATH,), stopwords=()):
+        """Segmenter over dictionary files: one word of two or more syllables per line, '#' comments"""
+        words = []
+        for fpath in fpaths:
+            with open(fpath, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip() or line.lstrip().startswith("#"):
+                        continue
+                    if len(cls._syllables(line)) < 2:
+                        print(f"{fpath}:{line_number}: '{line.strip()}' is a single syllable, skipped")
+                        continue
+                    words.append(line)
+        return cls(words, stopwords)
+
+    @staticmethod
+    def _syllables(text):
+        return SYLLABLE_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+    def add_word(self, word):
+        syllables = self._syllables(word)
+        if len(syllables) < 2:
+            return  # Từ một âm tiết không cần trong trie
+        node = self.trie
+        for syllable in syllables:
+            node = node.setdefault(syllable, {})
+        if END not in node:
+            node[END] = True
+            self.size += 1
+
+    def words(self, text):
+        """Words of text, lowercase, syllables of a compound joined by '_'"""
+        words = []
+        for chunk in PUNCTUATION_RE.split(unicodedata.normalize("NFC", text).lower()):
+            syllables = SYLLABLE_RE.findall(chunk)
+            n = len(syllables)
+            i = 0
+            while i < n:
+                # Khớp dài nhất bắt đầu tại i
+                node = self.trie
+                j = i
+                end = i + 1
+                while j < n:
+                    node = node.get(syllables[j])
+                    if node is None:
+                        break
+                    j += 1
+                    if END in node:
+                        end = j
+                word = syllables[i] if end == i + 1 else "_".join(syllables[i:end])
+                if word not in self.stopwords:
+                    words.append(word)
+                i = end
+        return words
+
+    def segment(self, text):
+        """Segmented text for a whitespace-analyzed field ('' for None)"""
+        return " ".join(self.words(text)) if text else ""
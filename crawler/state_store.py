@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class CrawlStateStore:
+    """
+    Durable crawl state (SQLite) so restarts skip already crawled articles.
+    One row per article url: fetch time, HTTP validators, content hash, index status,
+    and why the article was skipped without being stored (e.g. too_old)
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                source TEXT,
+                fetched_at TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                indexed INTEGER NOT NULL DEFAULT 0,
+                skipped TEXT
+            )
+        """)
+        # Database tạo trước khi có cột skipped
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(articles)")}
+        if "skipped" not in columns:
+            self.conn.execute("ALTER TABLE articles ADD COLUMN skipped TEXT")
+        self.conn.commit()
+
+    def load(self, source=None):
+        """Return {url: row dict} for all known articles (of source if given)"""
+        query = "SELECT url, source, fetched_at, etag, last_modified, content_hash, indexed, skipped FROM articles"
+        params = ()
+        if source:
+            query += " WHERE source = ?"
+            params = (source,)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        keys = ("url", "source", "fetched_at", "etag", "last_modified", "content_hash", "indexed", "skipped")
+        return {row[0]: dict(zip(keys, row)) for row in rows}
+
+    def record_validators(self, url, source, etag=None, last_modified=None):
+        """Save ETag/Last-Modified seen for url"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO articles (url, source, etag, last_modified) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified
+            """, (url, source, etag, last_modified))
+            self.conn.commit()
+
+    def record_fetch(self, url, source, content_hash=None, skipped=None):
+        """Save a successfully crawled article, or one skipped for the given reason (no content)"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO articles (url, source, fetched_at, content_hash, skipped) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET fetched_at = excluded.fetched_at,
+                                               content_hash = excluded.content_hash,
+                                               skipped = excluded.skipped
+            """, (url, source, datetime.now().isoformat(timespec="seconds"), content_hash, skipped))
+            self.conn.commit()
+
+    def mark_indexed(self, url, indexed=True):
+        with self._lock:
+            self.conn.execute("UPDATE articles SET indexed = ? WHERE url = ?", (int(indexed), url))
+            self.conn.commit()
+
+    def mark_indexed_many(self, urls, indexed=True):
+        """mark_indexed for many urls in one transaction (backfill)"""
+        with self._lock:
+            self.conn.executemany("UPDATE articles SET indexed = ? WHERE url = ?", [(int(indexed), url) for url in urls])
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
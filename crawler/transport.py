@@ -0,0 +1,224 @@
+import collections
+import socket
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.poolmanager import PoolManager
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+from crawler.rate_limiter import RateLimiter
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class DNSCache:
+    """
+    Cache địa chỉ IP theo (host, port) với TTL và số entry tối đa (LRU).
+    Mỗi HttpTransport có cache riêng, chỉ connection pool của transport đó
+    dùng (xem CachedDNSAdapter); socket.getaddrinfo của process không bị thay thế
+    """
+
+    def __init__(self, ttl=300, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """IP addresses of host, in getaddrinfo order (socket.gaierror if the lookup fails)"""
+        key = (host, port)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry:
+                if entry[0] > now:
+                    self._cache.move_to_end(key)
+                    return entry[1]
+                del self._cache[key]
+
+        addresses = []
+        for *_, sockaddr in socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+            if sockaddr[0] not in addresses:
+                addresses.append(sockaddr[0])
+        with self._lock:
+            self._cache[key] = (now + self.ttl, addresses)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return addresses
+
+
+class CachedDNSConnectionMixin:
+    """Connect to the cached addresses of the host; TLS SNI and cert checks still use the host name"""
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def _new_conn(self):
+        if self.dns_cache is None:
+            return super()._new_conn()
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.resolve(host, self.port)
+        except (socket.gaierror, UnicodeError):
+            return super()._new_conn()  # urllib3 tự báo lỗi phân giải tên miền
+
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:  # Gồm cả NewConnectionError: thử địa chỉ tiếp theo
+                    error = e
+        finally:
+            self._dns_host = host
+        if error is None:
+            return super()._new_conn()
+        raise error
+
+
+class CachedDNSHTTPConnection(CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class CachedDNSHTTPSConnection(CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedDNSHTTPConnection
+
+
+class CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedDNSHTTPSConnection
+
+
+class CachedDNSPoolManager(PoolManager):
+    """PoolManager whose pools hand the given DNS cache to every new connection"""
+
+    def __init__(self, dns_cache, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+        self.pool_classes_by_scheme = {
+            "http": CachedDNSHTTPConnectionPool,
+            "https": CachedDNSHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.conn_kw["dns_cache"] = self.dns_cache
+        return pool
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools resolve hosts through its own DNS cache"""
+
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache  # HTTPAdapter.__init__ gọi init_poolmanager
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = CachedDNSPoolManager(self.dns_cache, num_pools=connections, maxsize=maxsize,
+                                                block=block, **pool_kwargs)
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport for all crawlers: one requests.Session with
+    per-host keep-alive pools, DNS caching, gzip negotiation and default
+    timeouts/headers
+    """
+
+    def __init__(self, pool_size=10, timeout=20, headers=None, max_retries=2, dns_cache_ttl=300,
+                 dns_cache_size=1024, limiter=None):
+        """
+            pool_size: Max kept-alive connections per host (usually num_workers)
+            timeout: Default timeout (seconds) when the caller does not pass one
+            headers: Extra headers merged over DEFAULT_HEADERS
+            max_retries: Retries on connection errors (not on read timeouts)
+            dns_cache_ttl: Seconds to cache DNS answers, 0 to disable
+            dns_cache_size: Max (host, port) entries kept in the DNS cache
+            limiter: RateLimiter applied per host, None to disable
+        """
+        self.timeout = timeout
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+
+        retry = Retry(total=max_retries, connect=max_retries, read=0, status=0, backoff_factor=0.5)
+        pool_kwargs = dict(pool_connections=8, pool_maxsize=max(pool_size, 1), max_retries=retry)
+        if dns_cache_ttl:
+            self.dns_cache = DNSCache(ttl=dns_cache_ttl, max_size=dns_cache_size)
+            adapter = CachedDNSAdapter(self.dns_cache, **pool_kwargs)
+        else:
+            self.dns_cache = None
+            adapter = HTTPAdapter(**pool_kwargs)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the transport (and its per-host rate limiter) from the YAML config"""
+        # rate_limit: false để tắt, hoặc dict cấu hình (xem rate_limiter.DEFAULT_LIMITS)
+        limiter = RateLimiter.from_config(config) if config.get('rate_limit', True) is not False else None
+        return cls(
+            pool_size=config.get('num_workers', 1),
+            timeout=config.get('request_timeout', 20),
+            headers=config.get('http_headers'),
+            dns_cache_ttl=config.get('dns_cache_ttl', 300),
+            dns_cache_size=config.get('dns_cache_size', 1024),
+            limiter=limiter
+        )
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if not self.limiter:
+            return self.session.request(method, url, **kwargs)
+
+        host_limiter = self.limiter.get(url)
+        host_limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.Timeout:
+            host_limiter.release(time.monotonic() - start, timeout=True)
+            raise
+        except requests.exceptions.RequestException:
+            host_limiter.release(time.monotonic() - start, error=True)
+            raise
+
+        host_limiter.release(time.monotonic() - start, status=response.status_code,
+                             retry_after=response.headers.get("Retry-After"))
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        self.session.close()
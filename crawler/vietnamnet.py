@@ -1,67 +1,53 @@
-import requests
-from bs4 import BeautifulSoup
+from crawler.article import Article
 from crawler.base_crawler import BaseCrawler
-from utils.bs4_utils import get_text_from_tag
+from utils.bs4_utils import get_text_from_tag, class_strainer
+from utils.date_utils import normalize_date
 
 
 class VietNamNetCrawler(BaseCrawler):
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.base_url = "https://vietnamnet.vn"
+    base_url = "https://vietnamnet.vn"
+    listing_timeout = 15
+    article_strainer = class_strainer("content-detail-title", "bread-crumb-detail__time", "content-detail-sapo",
+                                      "sm-sapo-mb-0", "maincontent", "main-content")
+    listing_strainer = class_strainer("horizontalPost__main-title", "vnn-title", "title-bold")
 
-    def extract_content(self, url):
-        try:
-            response = requests.get(url, timeout=20)
-            soup = BeautifulSoup(response.content, "html.parser")
+    def parse_article(self, content):
+        soup = self.make_soup(content, self.article_strainer)
 
-            title = soup.find("h1", class_="content-detail-title")
-            if not title:
-                return None, None, None, None
-
-            date_tag = soup.find("div", class_="bread-crumb-detail__time")
-            date = date_tag.text.strip() if date_tag else "N/A"
+        title = soup.find("h1", class_="content-detail-title")
+        if not title:
+            return None
 
-            desc = soup.find("h2", class_=["content-detail-sapo", "sm-sapo-mb-0"])
-            description = (get_text_from_tag(p) for p in desc.contents) if desc else ()
+        date_tag = soup.find("div", class_="bread-crumb-detail__time")
+        date = date_tag.text.strip() if date_tag else "N/A"
 
-            content = soup.find("div", class_=["maincontent", "main-content"])
-            paragraphs = (get_text_from_tag(p) for p in content.find_all("p")) if content else ()
+        desc = soup.find("h2", class_=["content-detail-sapo", "sm-sapo-mb-0"])
+        description = [get_text_from_tag(p) for p in desc.contents] if desc else []
 
-            return title.text, date, description, paragraphs
-        except:
-            return None, None, None, None
+        content = soup.find("div", class_=["maincontent", "main-content"])
+        paragraphs = [get_text_from_tag(p) for p in content.find_all("p")] if content else []
 
-    def write_content(self, url, output_fpath):
-        title, date, description, paragraphs = self.extract_content(url)
-        if not title:
-            return False
+        return Article(title=title.text, date=date, publish_date=normalize_date(date, self.source),
+                       description=description, paragraphs=paragraphs)
 
-        with open(output_fpath, "w", encoding="utf-8") as f:
-            f.write(f"{title}\nNgày: {date}\n\n")
-            for p in description:
-                f.write(f"{p}\n")
-            for p in paragraphs:
-                f.write(f"{p}\n")
-        return True
+    def get_listing_url(self, article_type, page_number):
+        if page_number == 1:
+            return f"{self.base_url}/{article_type}"
+        return f"{self.base_url}/{article_type}-page{page_number - 1}"
 
-    def get_urls_of_type_thread(self, article_type, page_number):
-        try:
-            url = f"{self.base_url}/{article_type}" if page_number == 1 else f"{self.base_url}/{article_type}-page{page_number - 1}"
-            response = requests.get(url, timeout=15)
-            soup = BeautifulSoup(response.content, "html.parser")
+    def parse_listing(self, content):
+        soup = self.make_soup(content, self.listing_strainer)
 
-            urls = []
-            titles = soup.find_all(class_=["horizontalPost__main-title", "vnn-title", "title-bold"])
+        urls = []
+        titles = soup.find_all(class_=["horizontalPost__main-title", "vnn-title", "title-bold"])
 
-            for title in titles:
-                a_tag = title.find("a")
-                if a_tag:
-                    href = a_tag.get("href")
-                    if href:
-                        full_url = href if href.startswith('http') else f"{self.base_url}{href}"
-                        urls.append(full_url)
+        for title in titles:
+            a_tag = title.find("a")
+            if a_tag:
+                href = a_tag.get("href")
+                if href:
+                    full_url = href if href.startswith('http') else f"{self.base_url}{href}"
+                    urls.append(full_url)
 
-            return list(set(urls))
-        except:
-            return []
\ No newline at end of file
+        return list(set(urls))
@@ -1,90 +1,47 @@
-import requests
-from bs4 import BeautifulSoup
-from crawler.base_crawler import BaseCrawler
-from utils.bs4_utils import get_text_from_tag
+from crawler.article import Article
+from crawler.base_crawler import BaseCrawler, ListedUrl
+from utils.bs4_utils import get_text_from_tag, class_strainer
+from utils.date_utils import normalize_date, timestamp_to_iso
 
 
 class VNExpressCrawler(BaseCrawler):
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.consecutive_timeouts = 0
-        self.is_blocked = False
+    base_url = "https://vnexpress.net"
+    listing_timeout = 30
+    article_strainer = class_strainer("title-detail", "date", "description", "Normal")
+    # item-news giữ data-publishtime (ngày đăng) của từng bài trên trang danh sách
+    listing_strainer = class_strainer("item-news", "title-news")
 
-    def reset_blocked_status(self):
-        """Reset trạng thái bị chặn cho cycle mới"""
-        self.consecutive_timeouts = 0
-        self.is_blocked = False
+    def parse_article(self, content):
+        soup = self.make_soup(content, self.article_strainer)
 
-    def extract_content(self, url):
-        if self.is_blocked:
-            return None, None, None, None
-
-        try:
-            response = requests.get(url, timeout=20)
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            title = soup.find("h1", class_="title-detail")
-            if not title:
-                self.consecutive_timeouts = 0
-                return None, None, None, None
-
-            date_tag = soup.find("span", class_="date")
-            date = date_tag.text.strip() if date_tag else "N/A"
-
-            desc = soup.find("p", class_="description")
-            description = (get_text_from_tag(p) for p in desc.contents) if desc else ()
-
-            paragraphs = (get_text_from_tag(p) for p in soup.find_all("p", class_="Normal"))
-
-            self.consecutive_timeouts = 0
-            return title.text, date, description, paragraphs
-        except requests.exceptions.Timeout:
-            self.consecutive_timeouts += 1
-            if self.consecutive_timeouts >= 3:
-                self.is_blocked = True
-            return None, None, None, None
-        except:
-            self.consecutive_timeouts = 0
-            return None, None, None, None
-
-    def write_content(self, url, output_fpath):
-        if self.is_blocked:
-            return False
+        title = soup.find("h1", class_="title-detail")
+        if not title:
+            return None
 
-        title, date, description, paragraphs = self.extract_content(url)
+        date_tag = soup.find("span", class_="date")
+        date = date_tag.text.strip() if date_tag else "N/A"
 
-        if not title:
-            return False
+        desc = soup.find("p", class_="description")
+        description = [get_text_from_tag(p) for p in desc.contents] if desc else []
 
-        with open(output_fpath, "w", encoding="utf-8") as f:
-            f.write(f"{title}\nNgày: {date}\n\n")
-            for p in description:
-                f.write(f"{p}\n")
-            for p in paragraphs:
-                f.write(f"{p}\n")
-        return True
+        paragraphs = [get_text_from_tag(p) for p in soup.find_all("p", class_="Normal")]
 
-    def get_urls_of_type_thread(self, article_type, page_number):
-        if self.is_blocked:
-            return []
+        return Article(title=title.text, date=date, publish_date=normalize_date(date, self.source),
+                       description=description, paragraphs=paragraphs)
 
-        try:
-            url = f"https://vnexpress.net/{article_type}-p{page_number}"
-            response = requests.get(url, timeout=30)
-            soup = BeautifulSoup(response.content, "html.parser")
+    def get_listing_url(self, article_type, page_number):
+        return f"{self.base_url}/{article_type}-p{page_number}"
 
-            titles = soup.find_all(class_="title-news")
-            if not titles:
-                return []
+    def parse_listing(self, content):
+        soup = self.make_soup(content, self.listing_strainer)
+        titles = soup.find_all(class_="title-news")
 
-            self.consecutive_timeouts = 0
-            return [t.find("a").get("href") for t in titles if t.find("a")]
-        except requests.exceptions.Timeout:
-            self.consecutive_timeouts += 1
-            if self.consecutive_timeouts >= 3:
-                self.is_blocked = True
-            return []
-        except:
-            self.consecutive_timeouts = 0
-            return []
+        urls = []
+        for t in titles:
+            link = t.find("a")
+            if link:
+                item = t.find_parent("article")
+                published = item.get("data-publishtime") if item else None
+                urls.append(ListedUrl(link.get("href"), timestamp_to_iso(published) if published else None))
+        return urls
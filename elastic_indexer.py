@@ -4,55 +4,154 @@ Integrates with crawler to index articles as they are crawled
 """
 
 import hashlib
+import base64
+import concurrent.futures
+import json
+import queue
 import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from functools import lru_cache
+from elasticsearch import BadRequestError, Elasticsearch, NotFoundError
+from elasticsearch.helpers import bulk, expand_action
+from crawler.article import Article
+from crawler.dedup import NearDuplicateIndex
+from crawler.metrics import metrics
+from crawler.segmenter import WordSegmenter
+from utils.date_utils import TIME_ZONE, normalize_date
+
+
+# Vietnamese stopwords (analyzer of the ES index, tokenizer of local_index)
+VIETNAMESE_STOPWORDS = [
+    # Đại từ
+    "tôi", "tao", "mình", "ta", "chúng tôi", "chúng ta", "họ", "nó", "ông", "bà",
+    "anh", "chị", "em", "cô", "chú", "cậu", "mày", "thằng", "con", "nó",
+    # Chức năng ngữ pháp
+    "bị", "bởi", "cả", "các", "cái", "cần", "càng", "chỉ", "chiếc", "cho",
+    "chứ", "chưa", "chuyện", "có", "có thể", "cứ", "của", "cùng", "cũng",
+    "đã", "đang", "đây", "để", "đến nỗi", "đều", "điều", "do", "đó",
+    "được", "dưới", "gì", "khi", "không", "là", "lại", "lên", "lúc",
+    "mà", "mỗi", "một cách", "này", "nên", "nếu", "ngay", "nhiều", "như",
+    "nhưng", "những", "nơi", "nữa", "phải", "qua", "ra", "rằng", "rất",
+    "rồi", "sau", "sẽ", "so", "sự", "tại", "theo", "thì", "trên", "trước",
+    "từ", "từng", "và", "vẫn", "vào", "vậy", "vì", "việc", "với", "vừa"
+]
+
+# Title/body segmented into words at ingest (word_segmenter): "tên_lửa hành_trình ..."
+SEGMENTED_FIELDS = ["title_seg", "body_seg"]
+SEGMENTED_MAPPING = {field: {"type": "text", "analyzer": "whitespace"} for field in SEGMENTED_FIELDS}
 
 
 class ElasticIndexer:
     """Real-time indexer for crawled articles"""
 
-    def __init__(self, es_url="http://localhost:9200", username=None, password=None, index_name="news_quansu"):
+    def __init__(self, es_url="http://localhost:9200", username=None, password=None, index_name="news_quansu",
+                 connections_per_node=10, partition=None):
         """
             es_url: Elasticsearch URL
             username: Username for authentication (optional)
             password: Password for authentication (optional)
             index_name: Index name to use
+            connections_per_node: Size of the client's HTTP connection pool per ES node
+            partition: None for one index, 'monthly' for one index per publish month
+                       (<index_name>-YYYY.MM, undated documents in <index_name>-undated)
+                       read through the <index_name>-read alias; writes go straight to
+                       the partition of the document (target_index)
         """
         self.es_url = es_url
         self.index_name = index_name
 
-        # Create ES client
+        # Monthly partitions: searches go through read_index, writes name their partition directly.
+        # Undated documents always go to the same partition (undated_index) so a re-crawl never
+        # adds a second copy
+        self.partition = partition if partition == "monthly" else None
+        self.read_index = f"{index_name}-read" if self.partition else index_name
+        self.undated_index = f"{index_name}-undated"
+        self.partition_check_interval = 60
+        self._partitions = None        # (checked_at, [indices behind the read alias])
+        self._undated = None           # (checked_at, undated_index holds documents)
+
+        # Create ES client (thread-safe, một pool kết nối dùng chung)
         if username and password:
-            self.es = Elasticsearch(es_url, basic_auth=(username, password), request_timeout=30)
+            self.es = Elasticsearch(es_url, basic_auth=(username, password), request_timeout=30,
+                                    connections_per_node=connections_per_node)
         else:
-            self.es = Elasticsearch(es_url, request_timeout=30)
+            self.es = Elasticsearch(es_url, request_timeout=30, connections_per_node=connections_per_node)
+
+        # Background bulk pipeline (start_bulk_pipeline)
+        self.bulk_indexer = None
+
+        # Near-duplicate detection across sources (enable_dedup)
+        self.dedup = None
+
+        # Search result cache (enable_search_cache), tagged by index generation
+        self.search_cache = None
+        self._generation = 0          # Bumped when this indexer commits documents
+        self._remote_generation = None
+        self._generation_checked = 0.0
+        self.generation_check_interval = 5
+
+        # Searches coalesced into _msearch requests (enable_search_batching)
+        self.search_batcher = None
+
+        # Tiered search (search): escalate while fewer than size hits score >= tier_min_score
+        self.search_mode = "tiered"
+        self.tier_min_score = 1.0
+
+        # Point-in-time kept open between pages of search_page
+        self.pit_keep_alive = "2m"
 
         # Ensure index exists
         self._ensure_index()
 
     def _ensure_index(self):
         """Tạo index với hỗ trợ tìm kiếm có dấu và không dấu"""
+        if self.partition:
+            self._ensure_partitions()
+            return
+        if self.es.indices.exists_alias(name=f"{self.index_name}-read"):
+            # Index đã chia partition (es_partition: monthly) nhưng config thiếu es_partition:
+            # dùng các alias thay vì tạo một index rỗng không chia partition
+            print(f"{self.index_name} is partitioned by month, using {self.index_name}-read")
+            self.partition = "monthly"
+            self.read_index = f"{self.index_name}-read"
+            self._ensure_partitions()
+            return
+        if self.es.indices.exists_alias(name=self.index_name):
+            return  # Alias do người dùng tạo: không tạo index trùng tên
         if self.es.indices.exists(index=self.index_name):
+            self._put_segmented_mapping(self.index_name)
+            self._check_date_format(self.index_name)
             return
 
-        # Vietnamese stopwords
-        vietnamese_stopwords = [
-            # Đại từ
-            "tôi", "tao", "mình", "ta", "chúng tôi", "chúng ta", "họ", "nó", "ông", "bà",
-            "anh", "chị", "em", "cô", "chú", "cậu", "mày", "thằng", "con", "nó",
-            # Chức năng ngữ pháp
-            "bị", "bởi", "cả", "các", "cái", "cần", "càng", "chỉ", "chiếc", "cho",
-            "chứ", "chưa", "chuyện", "có", "có thể", "cứ", "của", "cùng", "cũng",
-            "đã", "đang", "đây", "để", "đến nỗi", "đều", "điều", "do", "đó",
-            "được", "dưới", "gì", "khi", "không", "là", "lại", "lên", "lúc",
-            "mà", "mỗi", "một cách", "này", "nên", "nếu", "ngay", "nhiều", "như",
-            "nhưng", "những", "nơi", "nữa", "phải", "qua", "ra", "rằng", "rất",
-            "rồi", "sau", "sẽ", "so", "sự", "tại", "theo", "thì", "trên", "trước",
-            "từ", "từng", "và", "vẫn", "vào", "vậy", "vì", "việc", "với", "vừa"
-        ]
+        self.es.indices.create(index=self.index_name, body=self._index_body())
+
+    def _check_date_format(self, index):
+        """Warn about indices created when publish_date was only a day: timestamps are dropped there"""
+        try:
+            mappings = self.es.indices.get_mapping(index=index)
+        except NotFoundError:
+            return
+        for name, entry in mappings.items():
+            date_format = entry["mappings"].get("properties", {}).get("publish_date", {}).get("format")
+            if date_format == "yyyy-MM-dd":
+                print(f"Warning: {name} maps publish_date as yyyy-MM-dd and ignores timestamps; "
+                      f"recreate it (delete_index.py) then run backfill.py --reset")
 
+    def _put_segmented_mapping(self, index):
+        """Add the *_seg fields to an index created before them (the analyzer is built in)"""
+        try:
+            self.es.indices.put_mapping(index=index, properties=SEGMENTED_MAPPING)
+        except BadRequestError as e:
+            print(f"Cannot add {', '.join(SEGMENTED_FIELDS)} to {index}: {e}")
+
+    def _index_body(self):
+        """Settings (analyzers) and mappings of an article index"""
         settings = {
             "settings": {
                 "number_of_shards": 1,
@@ -61,7 +160,7 @@ class ElasticIndexer:
                     "filter": {
                         "vietnamese_stop": {
                             "type": "stop",
-                            "stopwords": vietnamese_stopwords
+                            "stopwords": VIETNAMESE_STOPWORDS
                         },
                         "ascii_folding": {
                             "type": "asciifolding",
@@ -104,50 +203,181 @@ class ElasticIndexer:
                             }
                         }
                     },
-                    "publish_date": {"type": "date", "format": "yyyy-MM-dd", "ignore_malformed": True},
+                    # Timestamp ISO có múi giờ; "yyyy-MM-dd" cho document cũ chỉ có ngày
+                    "publish_date": {"type": "date", "format": "strict_date_optional_time||yyyy-MM-dd",
+                                     "ignore_malformed": True},
                     "publish_date_str": {"type": "text"},
                     "source": {"type": "keyword"},
                     "category": {"type": "keyword"},
-                    "url": {"type": "keyword"}
+                    "url": {"type": "keyword"},
+                    "summary": {"type": "text", "index": False},
+                    "duplicate_urls": {"type": "keyword"},
+                    **SEGMENTED_MAPPING
                 }
             }
         }
 
-        self.es.indices.create(index=self.index_name, body=settings)
+        return settings
 
-    def parse_article_content(self, content, source, category, url):
-        """Parse nội dung bài báo"""
-        lines = content.strip().split('\n')
-        if not lines:
-            return None
+    def _ensure_partitions(self, settings=None):
+        """
+        Index template of the monthly partitions (analyzers, mappings, read
+        alias), the undated partition, and an existing unpartitioned index
+        added to the read alias so it stays searchable
+        """
+        body = self._index_body()
+        self.es.indices.put_index_template(
+            name=self.index_name,
+            index_patterns=[f"{self.index_name}-*"],
+            template={
+                "settings": {**body["settings"], **(settings or {})},
+                "mappings": body["mappings"],
+                "aliases": {self.read_index: {}}
+            },
+            priority=100
+        )
+        if settings is not None:
+            return
 
-        title = lines[0].strip()
+        if self.es.indices.exists(index=self.index_name) and not self.es.indices.exists_alias(name=self.index_name):
+            self.es.indices.put_alias(index=self.index_name, name=self.read_index)
+        if self.es.indices.exists_alias(name=self.read_index):
+            self._put_segmented_mapping(self.read_index)
+            self._check_date_format(self.read_index)
+        self._ensure_undated_partition()
 
-        publish_date_str = ""
-        publish_date = None
-        if len(lines) > 1 and "Ngày:" in lines[1]:
-            publish_date_str = lines[1].replace("Ngày:", "").strip()
-            date_match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', publish_date_str)
-            if date_match:
-                day, month, year = date_match.groups()
-                publish_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    def _ensure_undated_partition(self):
+        """
+        Create the undated partition and drop the <index_name>-write alias of
+        earlier versions: it followed the current month, so writing through
+        it put a second copy of an undated document in every month
+        """
+        try:
+            self.es.indices.create(index=self.undated_index)
+        except BadRequestError:
+            pass  # Đã tồn tại (process khác vừa tạo)
 
-        body = "\n".join(lines[2:]).strip() if len(lines) > 2 else ""
+        legacy_alias = f"{self.index_name}-write"
+        try:
+            indices = list(self.es.indices.get_alias(name=legacy_alias))
+        except NotFoundError:
+            indices = []
+        if indices:
+            print(f"Removing alias {legacy_alias}: documents are written to their partition directly")
+            self.es.indices.update_aliases(
+                actions=[{"remove": {"index": index, "alias": legacy_alias}} for index in indices])
+        self._partitions = None
 
-        # Dùng title+source làm _id để tránh duplicate
-        unique_key = f"{title}_{source}"
-        doc_id = hashlib.md5(unique_key.encode()).hexdigest()
+    def target_index(self, publish_date):
+        """
+        Index a document is written to (no alias): the partition of its
+        publish month, else the undated partition. Both only depend on the
+        document, so the same _id always lands in the same partition
+        """
+        if not self.partition:
+            return self.index_name
+        if not publish_date:
+            return self.undated_index
+        # Partition mới được tạo tự động (template) ở lần ghi đầu tiên
+        return f"{self.index_name}-{publish_date[:4]}.{publish_date[5:7]}"
 
-        return {
-            "_id": doc_id,
-            "title": title,
-            "publish_date_str": publish_date_str,
-            "publish_date": publish_date,
-            "body": body,
-            "source": source,
-            "category": category,
-            "url": url
-        }
+    def stale_copy_actions(self, index, doc_id):
+        """
+        Bulk actions deleting other copies of a document written to index: an
+        article indexed without a publish date and dated later (re-crawl) has
+        a copy left in the undated partition. A missing copy answers 404
+        """
+        if not self.partition or index == self.undated_index or not self._has_undated():
+            return []
+        return [{"_op_type": "delete", "_index": self.undated_index, "_id": doc_id}]
+
+    def _has_undated(self):
+        """undated_index holds documents (cached partition_check_interval seconds)"""
+        now = time.monotonic()
+        if self._undated is None or now - self._undated[0] >= self.partition_check_interval:
+            try:
+                count = self.es.count(index=self.undated_index)["count"]
+            except NotFoundError:
+                count = 0
+            except Exception:
+                count = 1  # Không biết: vẫn gửi lệnh xóa (404 nếu không có bản cũ)
+            self._undated = (now, count > 0)
+        return self._undated[1]
+
+    def partitions(self, refresh=False):
+        """Indices behind the read alias (cached partition_check_interval seconds)"""
+        if not self.partition:
+            return [self.index_name]
+        now = time.monotonic()
+        if refresh or self._partitions is None or now - self._partitions[0] >= self.partition_check_interval:
+            try:
+                indices = sorted(self.es.indices.get_alias(name=self.read_index))
+            except NotFoundError:
+                indices = []
+            self._partitions = (now, indices)
+        return self._partitions[1]
+
+    def _search_index(self, params):
+        """Indices a search reads: with monthly partitions, only those overlapping [from_date, to_date]"""
+        if not self.partition or not (params["from_date"] or params["to_date"]):
+            return self.read_index
+        try:
+            low = params["from_date"] and datetime.strptime(params["from_date"][:7], "%Y-%m").strftime("%Y.%m")
+            high = params["to_date"] and datetime.strptime(params["to_date"][:7], "%Y-%m").strftime("%Y.%m")
+        except ValueError:
+            return self.read_index  # Date math (now-7d...): để ES lọc trên mọi partition
+
+        indices = []
+        for index in self.partitions():
+            month = index[len(self.index_name) + 1:]
+            if index == self.undated_index:
+                continue  # Bài không có ngày không khớp khoảng ngày nào
+            if not re.fullmatch(r"\d{4}\.\d{2}", month):
+                indices.append(index)  # Index cũ không chia partition chứa mọi ngày
+            elif (not low or month >= low) and (not high or month <= high):
+                indices.append(index)
+        return ",".join(indices) or self.read_index
+
+    @contextmanager
+    def bulk_load(self, refresh_interval="-1", replicas=0):
+        """
+        with indexer.bulk_load(): ... -- bulk-friendly settings (no refresh, no
+        replicas) on every index, and on partitions created meanwhile, for the
+        duration of a backfill; the previous settings are restored afterwards
+        """
+        indices = self.partitions(refresh=True) if self.partition else [self.index_name]
+        response = self.es.indices.get_settings(index=",".join(indices), flat_settings=True)
+        saved = {index: {
+            "refresh_interval": entry["settings"].get("index.refresh_interval"),
+            "number_of_replicas": entry["settings"].get("index.number_of_replicas"),
+        } for index, entry in response.items()}
+
+        bulk_settings = {"refresh_interval": refresh_interval, "number_of_replicas": replicas}
+        self.es.indices.put_settings(index=",".join(saved), settings={"index": bulk_settings})
+        if self.partition:
+            self._ensure_partitions(settings=bulk_settings)
+        print(f"Bulk load settings on {len(saved)} indices: {bulk_settings}")
+
+        try:
+            yield self
+        finally:
+            self.flush()
+            if self.partition:
+                self._ensure_partitions(settings={})
+            replicas = self._index_body()["settings"]["number_of_replicas"]
+            default = {"refresh_interval": None, "number_of_replicas": replicas}
+            for index in self.partitions(refresh=True) if self.partition else [self.index_name]:
+                self.es.indices.put_settings(index=index, settings={"index": saved.get(index, default)})
+            self.es.indices.refresh(index=self.read_index)
+            print(f"Index settings restored on {len(saved)} indices")
+
+    def parse_article_content(self, content, source, category, url):
+        """Parse nội dung bài báo (file .txt đã lưu)"""
+        return parse_article_content(content, source, category, url)
+
+    def article_to_document(self, article):
+        """Article record -> Elasticsearch document (with _id)"""
+        return article_to_document(article)
 
     def index_article(self, content, source, category, url):
         """
@@ -168,11 +398,133 @@ class ElasticIndexer:
                 return False
 
             doc_id = article.pop("_id")
-            self.es.index(index=self.index_name, id=doc_id, document=article)
+            index = self.target_index(article["publish_date"])
+            for action in self.stale_copy_actions(index, doc_id):
+                self._send_action(action)
+            self.es.index(index=index, id=doc_id, document=article)
+            self._bump_generation()
             return True
         except:
             return False
 
+    def start_bulk_pipeline(self, **options):
+        """Start (once) the background BulkIndexer used by submit_article"""
+        if self.bulk_indexer is None:
+            self.bulk_indexer = BulkIndexer(self.es, on_commit=self._bump_generation, **options)
+        return self.bulk_indexer
+
+    def enable_dedup(self, db_path, max_distance=3, min_words=30):
+        """Link near-duplicate bodies (SimHash) to the first indexed copy instead of indexing them"""
+        if self.dedup is None:
+            self.dedup = NearDuplicateIndex(db_path, max_distance=max_distance, min_words=min_words)
+        return self.dedup
+
+    # Thêm url của bản trùng vào bài gốc
+    LINK_DUPLICATE_SCRIPT = (
+        "if (ctx._source.duplicate_urls == null) { ctx._source.duplicate_urls = []; } "
+        "if (!ctx._source.duplicate_urls.contains(params.url)) { ctx._source.duplicate_urls.add(params.url); }"
+    )
+
+    def _duplicate_link_action(self, canonical_key, url):
+        # Với partition, key trong dedup là "<index>/<_id>" (key cũ chỉ có _id: index không chia partition)
+        index, _, canonical_id = canonical_key.rpartition("/")
+        return {
+            "_op_type": "update",
+            "_index": index or self.index_name,
+            "_id": canonical_id,
+            "script": {"source": self.LINK_DUPLICATE_SCRIPT, "lang": "painless", "params": {"url": url}}
+        }
+
+    def _register_fingerprint(self, key, fingerprint, document, on_indexed):
+        """on_indexed callback that first registers the fingerprint of the accepted document"""
+        dedup = self.dedup
+
+        def callback():
+            try:
+                dedup.add(key, fingerprint, document["source"], document["url"])
+            finally:
+                if on_indexed:
+                    on_indexed()
+        return callback
+
+    def submit_article(self, article, on_indexed=None):
+        """
+        Queue an Article record for background bulk indexing (indexed
+        synchronously when the pipeline is not started)
+
+        Args:
+            article: crawler.article.Article
+            on_indexed: Called with no argument once Elasticsearch accepted the document
+
+        Returns:
+            True if queued/indexed, False otherwise
+        """
+        actions, on_indexed = self.document_actions(self.article_to_document(article), on_indexed)
+
+        if self.bulk_indexer is None:
+            try:
+                for action in actions:
+                    self._send_action(action)
+            except:
+                return False
+            self._bump_generation()
+            if on_indexed:
+                on_indexed()
+            return True
+
+        for action in actions[:-1]:
+            self.bulk_indexer.submit(action)
+        self.bulk_indexer.submit(actions[-1], on_indexed)
+        return True
+
+    def document_actions(self, document, on_indexed=None):
+        """
+        Bulk actions writing a document (with _id): deletes of its stale
+        partition copies then the index action, or, for a near-duplicate, the
+        update linking it to the first copy (submit_article, backfill)
+
+        Returns:
+            (actions, on_indexed to call once the last action succeeded; it
+            registers the SimHash fingerprint of the document first)
+        """
+        doc_id = document.pop("_id")
+        index = self.target_index(document["publish_date"])
+        action = {"_index": index, "_id": doc_id, "_source": document}
+        if self.dedup:
+            key = f"{index}/{doc_id}" if self.partition else doc_id
+            canonical_key, fingerprint = self.dedup.find(key, document["body"])
+            if canonical_key:
+                return [self._duplicate_link_action(canonical_key, document["url"])], on_indexed
+            if fingerprint is not None:
+                on_indexed = self._register_fingerprint(key, fingerprint, document, on_indexed)
+        return self.stale_copy_actions(index, doc_id) + [action], on_indexed
+
+    def _send_action(self, action):
+        """One bulk action as a single request (no bulk pipeline)"""
+        op_type = action.get("_op_type", "index")
+        if op_type == "update":
+            self.es.update(index=action["_index"], id=action["_id"], script=action["script"])
+        elif op_type == "delete":
+            self.es.options(ignore_status=404).delete(index=action["_index"], id=action["_id"])
+        else:
+            self.es.index(index=action["_index"], id=action["_id"], document=action["_source"])
+
+    def flush(self):
+        """Wait until every queued document has been sent"""
+        if self.bulk_indexer:
+            self.bulk_indexer.flush()
+
+    def close(self):
+        if self.bulk_indexer:
+            self.bulk_indexer.close()
+            self.bulk_indexer = None
+        if self.dedup:
+            self.dedup.close()
+            self.dedup = None
+        if self.search_batcher:
+            self.search_batcher.close()
+            self.search_batcher = None
+
     def bulk_index_articles(self, articles):
         """
         Bulk index multiple articles
@@ -185,24 +537,210 @@ class ElasticIndexer:
         """
         actions = [
             {
-                "_index": self.index_name,
+                "_index": self.target_index(article.get("publish_date")),
                 "_id": article["_id"],
                 "_source": {k: v for k, v in article.items() if k != "_id"}
             }
             for article in articles
         ]
 
+        stale_actions = [stale for action in actions for stale in self.stale_copy_actions(action["_index"], action["_id"])]
+        if stale_actions:
+            bulk(self.es, stale_actions, raise_on_error=False)  # 404 = không có bản cũ
         success, failed = bulk(self.es, actions, stats_only=True, raise_on_error=False)
+        if success:
+            self._bump_generation()
         return success
 
-    def search(self, query, size=10, source=None, from_date=None, to_date=None):
-        """Tìm kiếm ưu tiên: có dấu chính xác > không dấu > sai chính tả"""
-        must = []
+    def enable_search_cache(self, max_entries=1024, ttl=300, generation_check_interval=5):
+        """
+        Cache search() results (LRU + TTL). Entries are tagged with the index
+        generation: documents committed by this indexer invalidate them at
+        once, writes from other processes within generation_check_interval seconds
+        """
+        if self.search_cache is None:
+            self.search_cache = SearchCache(max_entries=max_entries, ttl=ttl)
+        self.generation_check_interval = generation_check_interval
+        return self.search_cache
+
+    def enable_search_batching(self, max_wait=0.005, max_batch=64, max_in_flight=4):
+        """
+        Send searches issued concurrently (from several threads) as batched
+        _msearch requests instead of one _search per query. Applies to search(),
+        search_page() and facets()
+        """
+        if self.search_batcher is None:
+            self.search_batcher = MSearchBatcher(self.es, max_wait=max_wait, max_batch=max_batch,
+                                                 max_in_flight=max_in_flight)
+        return self.search_batcher
+
+    def _bump_generation(self):
+        self._generation += 1
+
+    def index_generation(self):
+        """
+        (local commits, index/delete operations of the index). The second part
+        comes from the indices stats API, polled at most every generation_check_interval seconds
+        """
+        now = time.monotonic()
+        if now - self._generation_checked >= self.generation_check_interval:
+            self._generation_checked = now
+            try:
+                stats = self.es.indices.stats(index=self.read_index, metric="indexing")
+                indexing = stats["_all"]["primaries"]["indexing"]
+                self._remote_generation = indexing["index_total"] + indexing["delete_total"]
+            except Exception:
+                pass
+        return self._generation, self._remote_generation
+
+    def search(self, query, size=10, source=None, from_date=None, to_date=None, mode=None, fields=None):
+        """
+        Tìm kiếm ưu tiên: có dấu chính xác > không dấu > sai chính tả
+
+        Args:
+            mode: 'tiered' (default, search_mode) runs the exact+compound tier first and
+                  adds the no-accent then fuzzy clauses only when fewer than size hits
+                  reach tier_min_score; 'full' sends all clauses at once
+            fields: None for the whole _source, 'summary' (SUMMARY_FIELDS) or a list of fields
+
+        Returns:
+            List of hits; each carries 'tier', the tier that answered
+        """
+        params = self._search_params(query, size, source, from_date, to_date, mode, fields)
+        results = self._cached(("list", params), lambda: self._hits(*self._search(params)))
+        return [dict(r) for r in results]
+
+    def search_page(self, query=None, size=10, source=None, from_date=None, to_date=None, mode=None,
+                    fields="summary", cursor=None):
+        """
+        One page of results with the total hit count and a cursor to the next page.
+        A point-in-time is opened before the first page and every page reads it
+        with search_after: all pages see the same snapshot and deep pages cost
+        the same as the first one. Pages are not cached (each PIT is a new snapshot)
+
+        Args:
+            cursor: Cursor returned by the previous page; the other arguments are then ignored
+
+        Returns:
+            {"hits": [...], "total": int, "total_relation": "eq"|"gte", "tier": str,
+             "cursor": str or None on the last page}
+        """
+        if cursor:
+            state = decode_cursor(cursor)
+            params, tier, pit_id = state["params"], state["tier"], state["pit"]
+            response = self._run_search(self._tier_clauses(params["query"], tier), params, pit_id=pit_id,
+                                        search_after=state["after"], track_total_hits=True)
+        else:
+            params = self._search_params(query, size, source, from_date, to_date, mode, fields)
+            # PIT mở trước trang đầu: trang 1 và các trang sau đọc cùng một snapshot
+            pit_id = self.es.open_point_in_time(index=self._search_index(params),
+                                                keep_alive=self.pit_keep_alive)["id"]
+            try:
+                tier, response = self._search(params, pit_id=pit_id, track_total_hits=True)
+            except Exception:
+                self._close_pit(pit_id)
+                raise
+        pit_id = response.get("pit_id", pit_id)
+        page = self._page(tier, response)
+
+        after = page.pop("after")
+        page["cursor"] = None
+        if len(page["hits"]) < params["size"]:
+            self._close_pit(pit_id)
+        else:
+            page["cursor"] = encode_cursor({"params": params, "tier": page["tier"], "pit": pit_id, "after": after})
+        return page
+
+    def _cached(self, key, compute):
+        """compute() through the search cache (if enabled), tagged with the index generation"""
+        if self.search_cache is None:
+            return compute()
+
+        key = json.dumps(key, ensure_ascii=False, default=str)
+        generation = self.index_generation()
+        value = self.search_cache.get(key, generation)
+        if value is None:
+            value = compute()
+            self.search_cache.put(key, generation, value)
+        return value
+
+    def _page(self, tier, response):
+        raw_hits = response["hits"]["hits"]
+        total = response["hits"]["total"]
+        return {
+            "hits": self._hits(tier, response),
+            "total": total["value"],
+            "total_relation": total["relation"],
+            "tier": tier,
+            "after": raw_hits[-1]["sort"] if raw_hits else None
+        }
+
+    def close_cursor(self, cursor):
+        """Release the point-in-time of a cursor that will not be followed"""
+        pit_id = decode_cursor(cursor)["pit"]
+        if pit_id:
+            self._close_pit(pit_id)
+
+    def _close_pit(self, pit_id):
+        try:
+            self.es.close_point_in_time(id=pit_id)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _search_params(query, size, source, from_date, to_date, mode, fields):
+        if fields == "summary":
+            fields = SUMMARY_FIELDS
+        return {
+            "query": normalize_query(query),
+            "size": size,
+            "source": source,
+            "from_date": from_date,
+            "to_date": to_date,
+            "mode": mode,
+            "fields": list(fields) if fields else None,
+        }
+
+    def _search(self, params, pit_id=None, track_total_hits=False):
+        """Run the query (escalating through the tiers), return (tier, raw response)"""
+        query, size = params["query"], params["size"]
+        mode = params["mode"] or self.search_mode
+        options = {"pit_id": pit_id, "track_total_hits": track_total_hits}
+
+        if not query:
+            return "all", self._run_search([], params, **options)
+
+        if mode == "full":
+            return "full", self._run_search(self._tier_clauses(query, "full"), params, **options)
+
+        # Mỗi tầng giữ nguyên các mệnh đề (và boost) của tầng trước, chỉ thêm mệnh đề mới
+        tiers = self._query_tiers(query)
         should = []
+        for i, (tier, clauses) in enumerate(tiers):
+            should = should + clauses
+            response = self._run_search(should, params, **options)
+            options["pit_id"] = response.get("pit_id", options["pit_id"])
+            confident = sum(1 for hit in response["hits"]["hits"] if (hit["_score"] or 0) >= self.tier_min_score)
+            if confident >= size or i == len(tiers) - 1:
+                metrics.count("search_tier", "search", tier)
+                return tier, response
 
-        if query:
+    def _tier_clauses(self, query, tier):
+        """Should clauses sent by a tier (with the clauses of the tiers before it)"""
+        if tier == "all":
+            return []
+        should = []
+        for name, clauses in self._query_tiers(query):
+            should += clauses
+            if name == tier:
+                break
+        return should
+
+    def _query_tiers(self, query):
+        """[(tier, should clauses)] from the cheapest to the most expensive"""
+        exact = [
             # 1. Ưu tiên CAO NHẤT: Match có dấu chính xác
-            should.append({
+            {
                 "multi_match": {
                     "query": query,
                     "fields": ["title^5", "body"],
@@ -210,43 +748,55 @@ class ElasticIndexer:
                     "operator": "or",
                     "boost": 10
                 }
-            })
-
-            # 2. Ưu tiên CAO: Phrase match có dấu
-            should.append({
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^10", "body^2"],
-                    "type": "phrase",
-                    "slop": 2,
-                    "boost": 15
-                }
-            })
-
-            # 3. Ưu tiên TRUNG BÌNH: Match không dấu
-            should.append({
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title.no_accent^5", "body.no_accent"],
-                    "type": "best_fields",
-                    "operator": "or",
-                    "boost": 7.5
-                }
-            })
-
-            # 4. Ưu tiên THẤP: Match với fuzziness
-            should.append({
+            },
+        ]
+        segmented = word_segmenter().segment(query)
+        if "_" in segmented:
+            # 2. Ưu tiên CAO: Từ ghép khớp nguyên từ trên field đã tách từ
+            # (thay cho phrase match có slop: chỉ là term query, không cần positions)
+            exact.append({
                 "multi_match": {
-                    "query": query,
-                    "fields": ["title^5", "body"],
+                    "query": segmented,
+                    "fields": ["title_seg^10", "body_seg^2"],
                     "type": "best_fields",
-                    "fuzziness": "AUTO",
                     "operator": "or",
-                    "boost": 2
+                    "boost": 15
                 }
             })
+        return [
+            ("exact", exact),
+            ("no_accent", [
+                # 3. Ưu tiên TRUNG BÌNH: Match không dấu
+                {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["title.no_accent^5", "body.no_accent"],
+                        "type": "best_fields",
+                        "operator": "or",
+                        "boost": 7.5
+                    }
+                },
+            ]),
+            ("fuzzy", [
+                # 4. Ưu tiên THẤP: Match với fuzziness
+                {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["title^5", "body"],
+                        "type": "best_fields",
+                        "fuzziness": "AUTO",
+                        "operator": "or",
+                        "boost": 2
+                    }
+                },
+            ]),
+        ]
 
+    def _filtered_query(self, should, params):
+        """Bool query: at least one should clause, plus the source and date filters"""
+        must = []
 
+        if should:
             # Bắt buộc ít nhất 1 trong các điều kiện should phải match
             must.append({
                 "bool": {
@@ -254,26 +804,31 @@ class ElasticIndexer:
                     "minimum_should_match": 1
                 }
             })
-            should = []  # Reset should cho bool ngoài
 
-        if source:
-            must.append({"term": {"source": source}})
+        if params["source"]:
+            must.append({"term": {"source": params["source"]}})
 
-        if from_date or to_date:
-            date_range = {}
-            if from_date:
-                date_range["gte"] = from_date
-            if to_date:
-                date_range["lte"] = to_date
+        if params["from_date"] or params["to_date"]:
+            # Ngày không kèm giờ tính theo giờ Việt Nam; to_date là một ngày thì lấy hết ngày đó
+            date_range = {"time_zone": TIME_ZONE}
+            if params["from_date"]:
+                date_range["gte"] = params["from_date"]
+            if params["to_date"]:
+                to_date = params["to_date"]
+                date_range["lte"] = f"{to_date}||/d" if re.fullmatch(r"\d{4}-\d{2}-\d{2}", to_date) else to_date
             must.append({"range": {"publish_date": date_range}})
 
+        return {
+            "bool": {
+                "must": must if must else [{"match_all": {}}]
+            }
+        }
+
+    def _run_search(self, should, params, pit_id=None, search_after=None, track_total_hits=False):
         search_body = {
-            "query": {
-                "bool": {
-                    "must": must if must else [{"match_all": {}}]
-                }
-            },
-            "size": size,
+            "query": self._filtered_query(should, params),
+            "size": params["size"],
+            "track_total_hits": track_total_hits,
             "sort": [
                 "_score",
                 {"publish_date": {"order": "desc", "unmapped_type": "date"}}
@@ -294,17 +849,504 @@ class ElasticIndexer:
                 }
             }
         }
+        # Field *_seg chỉ dùng để tìm kiếm, không trả về
+        search_body["_source"] = params["fields"] or {"excludes": SEGMENTED_FIELDS}
+        if search_after:
+            search_body["search_after"] = search_after
+
+        if pit_id:
+            # Với point-in-time, index nằm trong PIT. _shard_doc (duy nhất trong PIT) phân định các kết quả
+            # cùng điểm và cùng ngày nên search_after không bỏ sót hay lặp kết quả giữa các trang
+            search_body["pit"] = {"id": pit_id, "keep_alive": self.pit_keep_alive}
+            search_body["sort"].append({"_shard_doc": "asc"})
+            return self._execute_search(search_body)
+        return self._execute_search(search_body, index=self._search_index(params))
+
+    def _execute_search(self, body, index=None):
+        """One search request: through the _msearch batcher if enabled, else a plain _search"""
+        if self.search_batcher:
+            return self.search_batcher.search(body, index)
+        if index:
+            return self.es.search(index=index, body=body)
+        return self.es.search(body=body)
+
+    def facets(self, query=None, source=None, from_date=None, to_date=None, size=20, interval="month"):
+        """
+        Hit counts per source, per category and per publish date interval for
+        the documents matching query (with all the clauses of the 'full' mode)
+
+        Returns:
+            {"total": int, "source": [{"key", "count"}], "category": [...], "date": [...]}
+        """
+        params = self._search_params(query, 0, source, from_date, to_date, "full", None)
+        key = ("facets", params, size, interval)
+        return self._cached(key, lambda: self._facets(params, size, interval))
+
+    def _facets(self, params, size, interval):
+        should = self._tier_clauses(params["query"], "full") if params["query"] else []
+        body = {
+            "query": self._filtered_query(should, params),
+            "size": 0,
+            "track_total_hits": True,
+            "aggs": {
+                "source": {"terms": {"field": "source", "size": size}},
+                "category": {"terms": {"field": "category", "size": size}},
+                "date": {"date_histogram": {"field": "publish_date", "calendar_interval": interval,
+                                            "time_zone": TIME_ZONE, "format": "yyyy-MM-dd", "min_doc_count": 1}}
+            }
+        }
+        response = self._execute_search(body, index=self._search_index(params))
+        aggregations = response["aggregations"]
+        facets = {"total": response["hits"]["total"]["value"]}
+        for name in ("source", "category"):
+            facets[name] = [{"key": b["key"], "count": b["doc_count"]} for b in aggregations[name]["buckets"]]
+        facets["date"] = [{"key": b["key_as_string"], "count": b["doc_count"]}
+                          for b in aggregations["date"]["buckets"]]
+        return facets
 
-        results = self.es.search(index=self.index_name, body=search_body)
+    def get_document(self, doc_id, fields=None):
+        """Stored document by id (None if missing); fields as in search()"""
+        if fields == "summary":
+            fields = SUMMARY_FIELDS
+        if self.partition:
+            # GET theo _id không dùng được trên alias nhiều index
+            body = {"query": {"ids": {"values": [doc_id]}}, "size": 1,
+                    "_source": list(fields) if fields else {"excludes": SEGMENTED_FIELDS}}
+            hits = self._execute_search(body, index=self.read_index)["hits"]["hits"]
+            return {"_id": hits[0]["_id"], **hits[0]["_source"]} if hits else None
+        try:
+            response = self.es.get(index=self.index_name, id=doc_id, source_includes=fields or None,
+                                   source_excludes=None if fields else SEGMENTED_FIELDS)
+        except NotFoundError:
+            return None
+        return {"_id": response["_id"], **response["_source"]}
 
+    @staticmethod
+    def _hits(tier, response):
         return [
             {
                 **hit["_source"],
                 "score": hit["_score"],
+                "tier": tier,
                 "matched_in_title": hit.get("highlight", {}).get("title", []),
                 "matched_in_body": hit.get("highlight", {}).get("body", [])
             }
-            for hit in results["hits"]["hits"]
+            for hit in response["hits"]["hits"]
         ]
 
 
+def parse_article_content(content, source, category, url):
+    """Saved .txt article -> Elasticsearch document (None if empty); usable without a client"""
+    article = Article.from_text(content, source, category, url)
+    if not article:
+        return None
+    return article_to_document(article)
+
+
+def article_to_document(article):
+    """Article record -> Elasticsearch document (with _id)"""
+    title = article.title.strip()
+    publish_date_str = article.date or ""
+    # Bài lưu trước khi có publish_date: chuẩn hóa lại từ ngày dạng text
+    publish_date = article.publish_date or normalize_date(publish_date_str, article.source)
+
+    # Dùng title+source làm _id để tránh duplicate
+    unique_key = f"{title}_{article.source}"
+    doc_id = hashlib.md5(unique_key.encode()).hexdigest()
+
+    return {
+        "_id": doc_id,
+        "title": title,
+        "publish_date_str": publish_date_str,
+        "publish_date": publish_date,
+        "body": article.body,
+        "title_seg": word_segmenter().segment(title),
+        "body_seg": word_segmenter().segment(article.body),
+        "summary": article_summary(article),
+        "source": article.source,
+        "category": article.category,
+        "url": article.url
+    }
+
+
+@lru_cache(maxsize=1)
+def word_segmenter():
+    """WordSegmenter shared by documents and queries (bundled dictionary, index stopwords)"""
+    return WordSegmenter.from_files(stopwords=VIETNAMESE_STOPWORDS)
+
+
+# Fields of the 'summary' projection (no body)
+SUMMARY_FIELDS = ["title", "summary", "url", "source", "category", "publish_date", "publish_date_str"]
+
+
+def article_summary(article, max_chars=300):
+    """Short preview stored with the document: the sapo, else the beginning of the body"""
+    text = " ".join(line.strip() for line in article.description if line.strip()) or article.body
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+def encode_cursor(state):
+    """Opaque cursor: zlib-compressed JSON in URL-safe base64"""
+    return base64.urlsafe_b64encode(zlib.compress(json.dumps(state, ensure_ascii=False).encode("utf-8"))).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(zlib.decompress(base64.urlsafe_b64decode(cursor.encode())).decode("utf-8"))
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+def normalize_query(query):
+    """Unicode NFC, lowercase and collapsed whitespace (cache key and query sent to ES)"""
+    if not query:
+        return query
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class SearchCache:
+    """
+    LRU + TTL cache of search results. An entry only counts as a hit if it
+    was stored under the current index generation
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        """
+            max_entries: Entries kept, least recently used evicted first
+            ttl: Seconds an entry stays valid (also bounds staleness before an ES refresh)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, generation, results)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._miss("misses")
+            expires_at, entry_generation, results = entry
+            if entry_generation != generation or expires_at < time.monotonic():
+                del self._entries[key]
+                return self._miss("stale")
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        metrics.count("search_cache", "search", "hit")
+        return results
+
+    def _miss(self, reason):
+        self.stats[reason] += 1
+        metrics.count("search_cache", "search", reason)
+        return None
+
+    def put(self, key, generation, results):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, generation, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["stale"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MSearchBatcher:
+    """
+    Coalesces searches issued concurrently from many threads into _msearch
+    requests: a batch is sent max_wait seconds after its first search (or
+    once it holds max_batch searches), the caller blocks until its own
+    response is back
+    """
+
+    def __init__(self, es, max_wait=0.005, max_batch=64, max_in_flight=4):
+        """
+            es: Elasticsearch client
+            max_wait: Seconds a batch stays open after its first search
+            max_batch: Send a batch once it holds this many searches
+            max_in_flight: _msearch requests running at the same time
+        """
+        self.es = es
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+
+        self.queue = queue.Queue()
+        self.stats = {"searches": 0, "requests": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight,
+                                                              thread_name_prefix="msearch")
+        self.thread = threading.Thread(target=self._run, name="msearch-batcher", daemon=True)
+        self.thread.start()
+
+    def search(self, body, index=None):
+        """Queue one search (index None for point-in-time searches) and wait for its response"""
+        if self._closed:
+            raise RuntimeError("MSearchBatcher is closed")
+        future = concurrent.futures.Future()
+        self.queue.put((index, body, future))
+        return future.result()
+
+    def close(self):
+        """Send the searches still queued and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def batch_size(self):
+        """Mean number of searches per _msearch request"""
+        with self._stats_lock:
+            return self.stats["searches"] / self.stats["requests"] if self.stats["requests"] else 0.0
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self.executor.submit(self._send, batch)
+            if stop:
+                return
+
+    def _send(self, batch):
+        searches = []
+        for index, body, _ in batch:
+            searches.append({"index": index} if index else {})
+            searches.append(body)
+
+        with metrics.stage("msearch_request", "_msearch") as m:
+            try:
+                responses = self.es.msearch(searches=searches)["responses"]
+            except Exception as e:
+                m.outcome = "error"
+                for _, _, future in batch:
+                    future.set_exception(e)
+                self._count("errors", len(batch))
+                return
+        metrics.count("msearch_searches", "_msearch", "ok", len(batch))
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["searches"] += len(batch)
+
+        for (_, _, future), response in zip(batch, responses):
+            if "error" in response:
+                error = response["error"]
+                reason = error.get("reason", error) if isinstance(error, dict) else error
+                future.set_exception(RuntimeError(f"Search failed ({response.get('status')}): {reason}"))
+                self._count("errors")
+            else:
+                future.set_result(response)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+
+class BulkIndexer:
+    """
+    Bounded queue + background thread that sends documents to _bulk in
+    batches (by count, bytes or max latency) and retries failed items
+    """
+
+    # Item statuses worth retrying (rejected execution, gateway errors...)
+    RETRY_STATUSES = {429, 502, 503, 504}
+
+    # Metrics label of actions without a _source: near-duplicate links, stale partition copies
+    ACTION_LABELS = {"update": "duplicate_link", "delete": "stale_copy"}
+
+    def __init__(self, es, max_docs=500, max_bytes=5 * 1024 * 1024, max_latency=2.0,
+                 queue_size=10000, max_retries=3, retry_backoff=1.0, on_commit=None):
+        """
+            es: Elasticsearch client
+            max_docs: Send a batch once it holds this many documents
+            max_bytes: ... or this many bytes of JSON
+            max_latency: ... or once its oldest document waited this long (seconds)
+            queue_size: Max queued documents, submit() blocks when full
+            max_retries: Retries per document on 429/5xx item errors
+            retry_backoff: Base backoff (seconds), doubled per retry
+            on_commit: Called after a request that indexed at least one document
+        """
+        self.es = es
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_commit = on_commit
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"queued": 0, "indexed": 0, "failed": 0, "retried": 0, "requests": 0}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self.thread = threading.Thread(target=self._run, name="bulk-indexer", daemon=True)
+        self.thread.start()
+
+    def submit(self, action, on_indexed=None):
+        """Queue a bulk action (helpers.bulk format); blocks while the queue is full"""
+        if self._closed:
+            raise RuntimeError("BulkIndexer is closed")
+        self.queue.put((action, on_indexed, 0))
+        self._count("queued")
+
+    def flush(self):
+        """Block until every queued document has been sent (or given up)"""
+        self.queue.join()
+
+    def close(self):
+        """Flush remaining documents and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            try:
+                stop = self._collect(batch)
+                self._send(batch)
+            except Exception as e:
+                # Thread không được chết: không ai đọc queue nữa thì submit()/flush() treo mãi
+                print(f"[BulkIndexer] Batch of {len(batch)} documents failed: {e}")
+                self._count("failed", len(batch))
+                metrics.count("index_docs", "_bulk", "error")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+            if stop:
+                self.queue.task_done()
+                return
+
+    def _collect(self, batch):
+        """Fill batch from the queue until a size/latency limit; True if the stop marker was read"""
+        batch_bytes = self._size(batch[0][0])
+        deadline = time.monotonic() + self.max_latency
+
+        while len(batch) < self.max_docs and batch_bytes < self.max_bytes:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return True
+            batch.append(item)
+            batch_bytes += self._size(item[0])
+        return False
+
+    @staticmethod
+    def _size(action):
+        try:
+            return len(json.dumps(action.get("_source", action), ensure_ascii=False, default=str))
+        except (TypeError, ValueError):
+            # Không serialize được: _send loại riêng action này
+            return 0
+
+    def _send(self, batch):
+        """Send one batch; failed items with retryable statuses are resent alone with backoff"""
+        attempt_items = batch
+        while attempt_items:
+            operations = []
+            sendable = []
+            for item in attempt_items:
+                try:
+                    meta, body = expand_action(item[0])
+                    encoded = [meta] if body is None else [meta, body]
+                    json.dumps(encoded, ensure_ascii=False, default=str)
+                except Exception as e:
+                    print(f"[BulkIndexer] Dropping unserialisable action: {e}")
+                    self._count("failed")
+                    metrics.count("index_docs", "_bulk", "error")
+                    continue
+                operations.extend(encoded)
+                sendable.append(item)
+            attempt_items = sendable
+            if not attempt_items:
+                return
+
+            with metrics.stage("bulk_request", "_bulk") as m:
+                try:
+                    response = self.es.bulk(operations=operations)
+                    results = [next(iter(item.values())) for item in response["items"]]
+                except Exception:
+                    m.outcome = "error"
+                    results = [{"status": 503} for _ in attempt_items]
+            self._count("requests")
+
+            if self.on_commit and any(result.get("status", 500) < 300 for result in results):
+                try:
+                    self.on_commit()
+                except Exception as e:
+                    print(f"[BulkIndexer] on_commit failed: {e}")
+
+            retry = []
+            for (action, on_indexed, attempts), result in zip(attempt_items, results):
+                status = result.get("status", 500)
+                op_type = action.get("_op_type", "index")
+                source = action.get("_source", {}).get("source", self.ACTION_LABELS.get(op_type, op_type))
+                if status < 300 or (op_type == "delete" and status == 404):
+                    self._count("indexed")
+                    metrics.count("index_docs", source, "ok")
+                    if on_indexed:
+                        try:
+                            on_indexed()
+                        except Exception:
+                            pass
+                elif status in self.RETRY_STATUSES and attempts < self.max_retries:
+                    retry.append((action, on_indexed, attempts + 1))
+                    metrics.count("index_docs", source, "retried")
+                else:
+                    self._count("failed")
+                    metrics.count("index_docs", source, "http_error")
+
+            if retry:
+                self._count("retried", len(retry))
+                time.sleep(self.retry_backoff * (2 ** (retry[0][2] - 1)))
+            attempt_items = retry
@@ -0,0 +1,581 @@
+"""
+Offline BM25 search over the crawled articles, without Elasticsearch
+
+    python local_index.py update --config config_quansu.yml    # Đọc bài mới từ segment store
+    python local_index.py search "tên lửa" --size 10
+
+The index is a list of immutable segments; each one is a directory of .npy
+arrays (postings, term frequencies, document lengths, filters) opened with
+mmap, plus the documents themselves. New articles become a new segment on
+commit(); segments are merged once there are more than max_segments.
+search() and search_page() return the same hits as ElasticIndexer
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from crawler.article_store import SegmentedArticleStore
+from elastic_indexer import (SEGMENTED_FIELDS, SUMMARY_FIELDS, VIETNAMESE_STOPWORDS, article_to_document,
+                             decode_cursor, encode_cursor, normalize_query)
+
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(VIETNAMESE_STOPWORDS)
+EPOCH = date(1970, 1, 1)
+
+
+def tokenize(text):
+    """Lowercase NFC word tokens without stopwords (like the vietnamese_analyzer of the ES index)"""
+    return [token for token in TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower())
+            if token not in STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def fold(term):
+    """Accent-folded form of a term: 'tên' -> 'ten', 'đường' -> 'duong'"""
+    decomposed = unicodedata.normalize("NFD", term.replace("đ", "d").replace("Đ", "D"))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def to_day(publish_date):
+    """'YYYY-MM-DD' or ISO timestamp (local day) -> days since 1970-01-01, -1 if missing/invalid"""
+    try:
+        return (date.fromisoformat(publish_date[:10]) - EPOCH).days
+    except (TypeError, ValueError):
+        return -1
+
+
+class IndexSegment:
+    """One immutable segment: postings (term -> docs, tf in title, tf in body) and its documents"""
+
+    ARRAYS = ("offsets", "docs", "tf_title", "tf_body", "title_len", "body_len", "source", "day")
+
+    def __init__(self, dpath):
+        self.dpath = dpath
+        self.name = os.path.basename(dpath)
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(dpath, f"{name}.npy"), mmap_mode="r"))
+        self.store_offsets = np.load(os.path.join(dpath, "store_offsets.npy"), mmap_mode="r")
+        # Bản sao trong bộ nhớ: bài bị thay thế được đánh dấu xóa rồi ghi lại khi commit
+        self.deleted = np.load(os.path.join(dpath, "deleted.npy"))
+
+        with open(os.path.join(dpath, "terms.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+        with open(os.path.join(dpath, "keys.json"), encoding="utf-8") as f:
+            self.keys = json.load(f)
+        self.vocab = {term: i for i, term in enumerate(terms)}
+
+        # Shadow vocabulary: dạng không dấu -> các term có dấu tương ứng
+        self.folded = {}
+        for term in terms:
+            self.folded.setdefault(fold(term), []).append(term)
+
+        self._store = open(os.path.join(dpath, "store.bin"), "rb")
+        self._store_lock = threading.Lock()
+        self._norms = None  # (avg_title, avg_body, norm_title, norm_body)
+
+    def __len__(self):
+        return len(self.title_len)
+
+    def postings(self, term):
+        """(docs, tf_title, tf_body) of term, None if absent"""
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.docs[start:end], self.tf_title[start:end], self.tf_body[start:end]
+
+    def df(self, term):
+        term_id = self.vocab.get(term)
+        return 0 if term_id is None else int(self.offsets[term_id + 1] - self.offsets[term_id])
+
+    def norms(self, avg_title, avg_body, b):
+        """Length normalisation 1 - b + b * len / avg per document (cached per corpus averages)"""
+        if self._norms is None or self._norms[:2] != (avg_title, avg_body):
+            norm_title = (1 - b + b * np.asarray(self.title_len, dtype=np.float32) / max(avg_title, 1e-9))
+            norm_body = (1 - b + b * np.asarray(self.body_len, dtype=np.float32) / max(avg_body, 1e-9))
+            self._norms = (avg_title, avg_body, norm_title, norm_body)
+        return self._norms[2], self._norms[3]
+
+    def document(self, local_id):
+        start, end = int(self.store_offsets[local_id]), int(self.store_offsets[local_id + 1])
+        with self._store_lock:
+            self._store.seek(start)
+            payload = self._store.read(end - start)
+        return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+    def live_count(self):
+        return len(self) - int(self.deleted.sum())
+
+    def save_deleted(self):
+        np.save(os.path.join(self.dpath, "deleted.npy"), self.deleted)
+
+    def close(self):
+        self._store.close()
+
+    @classmethod
+    def write(cls, dpath, documents, sources):
+        """
+        Write documents (ES documents with _id) as a new segment in dpath
+
+        Args:
+            sources: Source names list shared by the index; new names are appended
+        """
+        tmp_dpath = f"{dpath}.tmp"
+        shutil.rmtree(tmp_dpath, ignore_errors=True)
+        os.makedirs(tmp_dpath)
+
+        postings = {}  # term -> [(local id, tf title, tf body)]
+        title_len, body_len, source_ids, days, store_offsets = [], [], [], [], [0]
+        with open(os.path.join(tmp_dpath, "store.bin"), "wb") as store:
+            for local_id, document in enumerate(documents):
+                title_tokens = Counter(tokenize(document["title"]))
+                body_tokens = Counter(tokenize(document["body"]))
+                for term in title_tokens.keys() | body_tokens.keys():
+                    postings.setdefault(term, []).append((local_id, title_tokens[term], body_tokens[term]))
+                title_len.append(sum(title_tokens.values()))
+                body_len.append(sum(body_tokens.values()))
+
+                if document["source"] not in sources:
+                    sources.append(document["source"])
+                source_ids.append(sources.index(document["source"]))
+                days.append(to_day(document["publish_date"]))
+
+                store.write(zlib.compress(json.dumps(document, ensure_ascii=False).encode("utf-8")))
+                store_offsets.append(store.tell())
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        entries = [entry for term in terms for entry in postings[term]]
+        columns = np.array(entries, dtype=np.int64).reshape(-1, 3)
+
+        arrays = {
+            "offsets": offsets,
+            "docs": columns[:, 0].astype(np.int32),
+            # tf > 65535 trong một bài không có ý nghĩa thực tế
+            "tf_title": np.minimum(columns[:, 1], 65535).astype(np.uint16),
+            "tf_body": np.minimum(columns[:, 2], 65535).astype(np.uint16),
+            "title_len": np.array(title_len, dtype=np.int32),
+            "body_len": np.array(body_len, dtype=np.int32),
+            "source": np.array(source_ids, dtype=np.int16),
+            "day": np.array(days, dtype=np.int32),
+            "store_offsets": np.array(store_offsets, dtype=np.int64),
+            "deleted": np.zeros(len(title_len), dtype=bool),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dpath, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dpath, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dpath, "keys.json"), "w", encoding="utf-8") as f:
+            json.dump([document["_id"] for document in documents], f)
+
+        os.replace(tmp_dpath, dpath)
+        return cls(dpath)
+
+
+class LocalIndex:
+    """
+    BM25F index of the crawled articles stored in dpath, with the same
+    search interface as ElasticIndexer
+    """
+
+    def __init__(self, dpath, k1=1.2, b=0.75, title_boost=5.0, accent_weight=0.75, max_segments=8):
+        """
+            dpath: Index directory (created if missing)
+            k1, b: BM25 parameters
+            title_boost: Weight of a title occurrence relative to a body occurrence
+            accent_weight: Weight of terms matched only through the accent-folded vocabulary
+            max_segments: Merge every segment into one once there are more than this many
+        """
+        self.dpath = dpath
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.accent_weight = accent_weight
+        self.max_segments = max_segments
+
+        # Tiered search: accent-folded variants only when fewer than size hits match exactly
+        self.search_mode = "tiered"
+        self.search_cache = None  # Không cần cache: truy vấn chạy trong bộ nhớ
+
+        self._pending = []   # Documents added since the last commit
+        self._cached_stats = None
+        self._lock = threading.RLock()
+
+        os.makedirs(dpath, exist_ok=True)
+        self.meta = {"segments": [], "sources": [], "next_segment": 1, "checkpoints": {}}
+        meta_fpath = os.path.join(dpath, "meta.json")
+        if os.path.exists(meta_fpath):
+            with open(meta_fpath, encoding="utf-8") as f:
+                self.meta.update(json.load(f))
+
+        self.segments = [IndexSegment(os.path.join(dpath, name)) for name in self.meta["segments"]]
+        self._locations = {}  # _id -> (segment, local id) of the live copy
+        for segment in self.segments:
+            for local_id, key in enumerate(segment.keys):
+                if not segment.deleted[local_id]:
+                    self._locations[key] = (segment, local_id)
+
+    def __len__(self):
+        return sum(segment.live_count() for segment in self.segments)
+
+    def add_article(self, article):
+        """Queue an Article; it becomes searchable at the next commit()"""
+        self.add_document(article_to_document(article))
+
+    def add_document(self, document):
+        # Field *_seg của ES không cần cho BM25 cục bộ
+        document = {k: v for k, v in document.items() if k not in SEGMENTED_FIELDS}
+        with self._lock:
+            self._pending.append(document)
+
+    def commit(self):
+        """Write the queued documents as a new segment (a newer copy of a document replaces the older one)"""
+        with self._lock:
+            if not self._pending:
+                return 0
+
+            latest = {}
+            for document in self._pending:
+                latest[document["_id"]] = document
+            documents = list(latest.values())
+            self._pending = []
+
+            name = f"seg-{self.meta['next_segment']:06d}"
+            self.meta["next_segment"] += 1
+            segment = IndexSegment.write(os.path.join(self.dpath, name), documents, self.meta["sources"])
+
+            replaced = set()
+            for local_id, key in enumerate(segment.keys):
+                old = self._locations.get(key)
+                if old:
+                    old[0].deleted[old[1]] = True
+                    replaced.add(old[0])
+                self._locations[key] = (segment, local_id)
+            for old_segment in replaced:
+                old_segment.save_deleted()
+
+            self.segments = self.segments + [segment]
+            self.meta["segments"].append(name)
+            self._save_meta()
+
+            if len(self.segments) > self.max_segments:
+                self.merge()
+            return len(documents)
+
+    def merge(self):
+        """Rewrite the live documents of every segment as one segment"""
+        with self._lock:
+            old_segments = self.segments
+            documents = [segment.document(local_id) for segment in old_segments
+                         for local_id in np.flatnonzero(~segment.deleted)]
+
+            name = f"seg-{self.meta['next_segment']:06d}"
+            self.meta["next_segment"] += 1
+            segment = IndexSegment.write(os.path.join(self.dpath, name), documents, self.meta["sources"])
+
+            self.segments = [segment]
+            self._locations = {key: (segment, local_id) for local_id, key in enumerate(segment.keys)}
+            self.meta["segments"] = [name]
+            self._save_meta()
+
+            for old_segment in old_segments:
+                old_segment.close()
+                shutil.rmtree(old_segment.dpath, ignore_errors=True)
+
+    def _save_meta(self):
+        meta_fpath = os.path.join(self.dpath, "meta.json")
+        with open(f"{meta_fpath}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(f"{meta_fpath}.tmp", meta_fpath)
+
+    def update_from_store(self, store, commit_every=5000):
+        """
+        Index the records appended to a SegmentedArticleStore since the last
+        update (checkpoint per store kept in meta.json)
+
+        Returns:
+            Number of articles read
+        """
+        root = os.path.abspath(store.root)
+        checkpoint = self.meta["checkpoints"].get(root)
+        segments = store.segments()
+        if checkpoint:
+            segments = [segment for segment in segments if segment >= checkpoint[0]]
+
+        count = 0
+        for segment, offset, article in store.iter_records(segments):
+            if checkpoint and (segment, offset) <= tuple(checkpoint):
+                continue
+            self.add_article(article)
+            count += 1
+            if count % commit_every == 0:
+                self.meta["checkpoints"][root] = [segment, offset]
+                self.commit()
+            checkpoint_now = [segment, offset]
+        if count:
+            self.meta["checkpoints"][root] = checkpoint_now
+            self.commit()
+        return count
+
+    def _stats(self, segments):
+        """(live docs, average title length, average body length) over segments"""
+        key = tuple((segment.name, segment.live_count()) for segment in segments)
+        if self._cached_stats is None or self._cached_stats[0] != key:
+            self._cached_stats = (key, self._compute_stats(segments))
+        return self._cached_stats[1]
+
+    @staticmethod
+    def _compute_stats(segments):
+        n, title_total, body_total = 0, 0, 0
+        for segment in segments:
+            live = ~segment.deleted
+            n += int(live.sum())
+            title_total += int(np.asarray(segment.title_len)[live].sum())
+            body_total += int(np.asarray(segment.body_len)[live].sum())
+        return n, title_total / max(n, 1), body_total / max(n, 1)
+
+    def _idf(self, segments, term, n):
+        df = sum(segment.df(term) for segment in segments)
+        return float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+
+    def _query_terms(self, segments, tokens, with_variants):
+        """{term: weight}: the query tokens, plus their accented/unaccented variants from the shadow vocabulary"""
+        weights = {token: 1.0 for token in tokens}
+        if with_variants:
+            for token in tokens:
+                for segment in segments:
+                    for variant in segment.folded.get(fold(token), ()):
+                        weights.setdefault(variant, self.accent_weight)
+        return weights
+
+    def _mask(self, segment, params):
+        """Live documents matching the source and date filters"""
+        mask = ~segment.deleted
+        if params["source"]:
+            sources = self.meta["sources"]
+            if params["source"] not in sources:
+                return np.zeros(len(segment), dtype=bool)
+            mask &= np.asarray(segment.source) == sources.index(params["source"])
+        if params["from_date"] or params["to_date"]:
+            day = np.asarray(segment.day)
+            mask &= day >= 0
+            if params["from_date"]:
+                mask &= day >= to_day(params["from_date"])
+            if params["to_date"]:
+                mask &= day <= to_day(params["to_date"])
+        return mask
+
+    def _score(self, segments, weights):
+        """BM25F scores per segment (float32 array per segment)"""
+        n, avg_title, avg_body = self._stats(segments)
+        idf = {term: self._idf(segments, term, n) for term in weights}
+        scores = []
+        for segment in segments:
+            norm_title, norm_body = segment.norms(avg_title, avg_body, self.b)
+            acc = np.zeros(len(segment), dtype=np.float32)
+            for term, weight in weights.items():
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                docs, tf_title, tf_body = postings
+                tf = self.title_boost * tf_title / norm_title[docs] + tf_body / norm_body[docs]
+                acc[docs] += weight * idf[term] * tf * (self.k1 + 1) / (self.k1 + tf)
+            scores.append(acc)
+        return scores
+
+    def _ranked(self, params, limit):
+        """(tier, total, [(score, segment, local id)]) of the best limit documents"""
+        segments = self.segments
+        masks = [self._mask(segment, params) for segment in segments]
+        tokens = list(dict.fromkeys(tokenize(params["query"] or "")))
+
+        if not tokens:
+            tier = "all"
+            scores = [mask.astype(np.float32) for mask in masks]
+        else:
+            mode = params["mode"] or self.search_mode
+            tier = "full" if mode == "full" else "exact"
+            scores = self._score(segments, self._query_terms(segments, tokens, mode == "full"))
+            scores = [np.where(mask, s, 0) for s, mask in zip(scores, masks)]
+            if tier == "exact" and sum(int((s > 0).sum()) for s in scores) < params["size"]:
+                tier = "no_accent"
+                scores = self._score(segments, self._query_terms(segments, tokens, True))
+                scores = [np.where(mask, s, 0) for s, mask in zip(scores, masks)]
+
+        # Top-k mỗi segment rồi gộp: sắp theo điểm giảm dần, cùng điểm thì bài mới hơn trước
+        candidates = []
+        total = 0
+        for segment, segment_scores in zip(segments, scores):
+            matched = np.flatnonzero(segment_scores > 0)
+            total += len(matched)
+            if len(matched) > limit:
+                matched = matched[np.argpartition(-segment_scores[matched], limit - 1)[:limit]]
+            day = np.asarray(segment.day)
+            candidates.extend((float(segment_scores[i]), int(day[i]), segment, int(i)) for i in matched)
+        candidates.sort(key=lambda c: (-c[0], -c[1]))
+        return tier, total, [(score, segment, local_id) for score, _, segment, local_id in candidates[:limit]]
+
+    def search(self, query, size=10, source=None, from_date=None, to_date=None, mode=None, fields=None):
+        """
+        BM25 search with the result format of ElasticIndexer.search
+
+        Args:
+            mode: 'tiered' (default) matches the query terms as typed and adds their
+                  accented/unaccented variants only when fewer than size documents match;
+                  'full' always includes the variants
+            fields: None for the whole document, 'summary' (SUMMARY_FIELDS) or a list of fields
+
+        Returns:
+            List of hits with score, tier, matched_in_title and matched_in_body
+        """
+        params = self._search_params(query, size, source, from_date, to_date, mode, fields)
+        tier, _, ranked = self._ranked(params, size)
+        return self._hits(tier, ranked, params)
+
+    def search_page(self, query=None, size=10, source=None, from_date=None, to_date=None, mode=None,
+                    fields="summary", cursor=None):
+        """One page of results with the total and a cursor, as ElasticIndexer.search_page"""
+        if cursor:
+            state = decode_cursor(cursor)
+            params, offset = state["params"], state["offset"]
+        else:
+            params, offset = self._search_params(query, size, source, from_date, to_date, mode, fields), 0
+
+        tier, total, ranked = self._ranked(params, offset + params["size"])
+        hits = self._hits(tier, ranked[offset:], params)
+        next_offset = offset + len(hits)
+        return {
+            "hits": hits,
+            "total": total,
+            "total_relation": "eq",
+            "tier": tier,
+            "cursor": encode_cursor({"params": params, "offset": next_offset}) if next_offset < total else None
+        }
+
+    def close_cursor(self, cursor):
+        """Nothing to release (cursors of the local index only hold an offset)"""
+
+    @staticmethod
+    def _search_params(query, size, source, from_date, to_date, mode, fields):
+        if fields == "summary":
+            fields = SUMMARY_FIELDS
+        return {
+            "query": normalize_query(query),
+            "size": size,
+            "source": source,
+            "from_date": from_date,
+            "to_date": to_date,
+            "mode": mode,
+            "fields": list(fields) if fields else None,
+        }
+
+    def _hits(self, tier, ranked, params):
+        tokens = set(tokenize(params["query"] or ""))
+        if tier == "exact":
+            matches = tokens.__contains__
+        else:
+            folded = {fold(token) for token in tokens}
+            matches = lambda word: fold(word) in folded
+
+        hits = []
+        for score, segment, local_id in ranked:
+            document = segment.document(local_id)
+            document.pop("_id", None)
+            source = {k: document.get(k) for k in params["fields"]} if params["fields"] else document
+            hits.append({
+                **source,
+                "score": score,
+                "tier": tier,
+                "matched_in_title": highlight_title(document["title"], matches),
+                "matched_in_body": highlight_fragments(document["body"], matches)
+            })
+        return hits
+
+    def close(self):
+        self.commit()
+        for segment in self.segments:
+            segment.close()
+
+
+def _mark(text, matches):
+    return TOKEN_RE.sub(lambda m: f"<mark>{m.group()}</mark>" if matches(m.group().lower()) else m.group(), text)
+
+
+def highlight_title(title, matches):
+    """[title with <mark> around matched words] or [] (like the ES title highlight)"""
+    if not any(matches(word) for word in TOKEN_RE.findall(title.lower())):
+        return []
+    return [_mark(title, matches)]
+
+
+def highlight_fragments(body, matches, fragment_size=150, number_of_fragments=3):
+    """Up to number_of_fragments ~fragment_size characters around matched words"""
+    fragments = []
+    for line in body.split("\n"):
+        for m in TOKEN_RE.finditer(line):
+            if matches(m.group().lower()):
+                # Bắt đầu đoạn trích ở đầu một từ
+                start = line.rfind(" ", 0, max(0, m.start() - fragment_size // 3)) + 1
+                fragments.append(_mark(line[start:start + fragment_size], matches))
+                break
+        if len(fragments) >= number_of_fragments:
+            break
+    return fragments
+
+
+def store_dpaths(config):
+    """Segment stores written by the crawlers of a YAML config"""
+    output_dpath = config.get('output_dpath', 'result')
+    if config.get('crawlers'):
+        return [f"{output_dpath}/{c['name']}_quansu/store" for c in config['crawlers']]
+    return [config.get('store_dpath') or f"{output_dpath}/store"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline BM25 index of the crawled articles")
+    parser.add_argument("command", choices=["update", "search", "merge"])
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--config", default="config_quansu.yml", help="Config file")
+    parser.add_argument("--index", help="Index directory (default: local_index_dpath or <output_dpath>/local_index)")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--source")
+    args = parser.parse_args()
+
+    from utils.utils import get_config
+    config = get_config(args.config)
+    index = LocalIndex(args.index or config.get('local_index_dpath')
+                       or f"{config.get('output_dpath', 'result')}/local_index")
+
+    if args.command == "update":
+        for store_dpath in store_dpaths(config):
+            if not os.path.exists(store_dpath):
+                continue
+            store = SegmentedArticleStore(store_dpath)
+            print(f"{store_dpath}: {index.update_from_store(store)} new articles")
+            store.close()
+        print(f"Index: {len(index)} articles in {len(index.segments)} segments")
+    elif args.command == "merge":
+        index.merge()
+        print(f"Index: {len(index)} articles in 1 segment")
+    else:
+        for i, hit in enumerate(index.search(args.query, size=args.size, source=args.source, fields="summary"), 1):
+            print(f"[{i}] {hit['score']:.2f} {hit['title']} ({hit['source']}, {hit['publish_date_str']})")
+            print(f"    {hit['url']}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,11 @@
 Công cụ tìm kiếm tin tức tiếng Việt
 """
 
+import argparse
+import os
+import time
 from elastic_indexer import ElasticIndexer
+from utils.utils import get_config
 
 
 def print_article(article, index):
@@ -34,32 +38,55 @@ def print_article(article, index):
     print(f"Ngay: {article.get('publish_date_str', 'N/A')}")
     print(f"Link: {article.get('url', 'N/A')}")
     print(f"\nNoi dung:")
-    body = article.get('body', '')
-    preview = body[:250] + "..." if len(body) > 250 else body
+    # Kết quả dạng summary không kèm body; bài index cũ chưa có summary thì dùng đoạn highlight
+    preview = article.get('summary') or " ".join(matched_body).replace('<mark>', '').replace('</mark>', '')
     print(preview)
 
 
 def main():
     """Hàm tìm kiếm chính"""
+    parser = argparse.ArgumentParser(description="Interactive news search")
+    parser.add_argument("--config", default="config_quansu.yml", help="Config file (es_* keys, es_partition)")
+    args = parser.parse_args()
+    config = get_config(args.config) if os.path.exists(args.config) else {}
+    # Index BM25 cục bộ (python local_index.py update), dùng khi không kết nối được Elasticsearch
+    local_index_dpath = config.get('local_index_dpath') or f"{config.get('output_dpath', 'result')}/local_index"
+
     print("=" * 80)
     print("TÌM KIẾM TIN TỨC CHIẾN TRANH")
     print("=" * 80)
 
     try:
+        # Cùng index (và alias partition) với crawler
         indexer = ElasticIndexer(
-            es_url="http://localhost:9200",
-            index_name="news_quansu"
+            es_url=config.get('es_url', 'http://localhost:9200'),
+            username=config.get('es_username'),
+            password=config.get('es_password'),
+            index_name=config.get('es_index', 'news_quansu'),
+            partition=config.get('es_partition')
         )
+        # Truy vấn lặp lại được trả từ cache, tự vô hiệu khi index có bài mới
+        indexer.enable_search_cache(max_entries=1024, ttl=300)
         print("Đã kết nối Elasticsearch")
     except Exception as e:
         print(f"Lỗi kết nối: {e}")
-        return
-
+        if not os.path.exists(os.path.join(local_index_dpath, "meta.json")):
+            return
+        from local_index import LocalIndex
+        indexer = LocalIndex(local_index_dpath)
+        print(f"Dùng index cục bộ {local_index_dpath} ({len(indexer)} bài)")
+
+    cursor = None
+    shown = 0
     while True:
         print("\n" + "=" * 80)
-        query = input("Nhập từ khóa (hoặc 'thoat' để kết thúc): ").strip()
+        prompt = "Nhập từ khóa (" + ("'n' để xem tiếp, " if cursor else "") + "'thoat' để kết thúc): "
+        query = input(prompt).strip()
         if query.lower() in ['thoat', 'quit', 'exit', 'q']:
-
+            if indexer.search_cache:
+                stats = indexer.search_cache.stats
+                print(f"Cache: {stats['hits']} hit, {stats['misses'] + stats['stale']} miss "
+                      f"({indexer.search_cache.hit_rate():.0%})")
             break
 
         if not query:
@@ -67,16 +94,29 @@ def main():
             continue
 
         try:
-            results = indexer.search(query, size=10)
+            start = time.perf_counter()
+            if query.lower() == 'n' and cursor:
+                page = indexer.search_page(cursor=cursor)
+            else:
+                if cursor:
+                    indexer.close_cursor(cursor)
+                page = indexer.search_page(query, size=10, fields="summary")
+                shown = 0
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            cursor = page['cursor']
+            results = page['hits']
 
             if not results:
                 print("\nKhông tìm thấy bài báo nào")
                 continue
 
-            print(f"\nTìm thấy {len(results)} bài báo:")
+            total = f"{page['total']}+" if page['total_relation'] == 'gte' else page['total']
+            print(f"\nTìm thấy {total} bài báo, hiển thị {shown + 1}-{shown + len(results)} "
+                  f"({elapsed_ms:.2f} ms, tầng {page['tier']}):")
 
-            for i, article in enumerate(results, 1):
+            for i, article in enumerate(results, shown + 1):
                 print_article(article, i)
+            shown += len(results)
 
             print("\n" + "=" * 80)
 
@@ -0,0 +1,187 @@
+"""
+HTTP search service (JSON) cho giao diện web
+
+    python search_service.py --config config_quansu.yml --port 8080
+
+    GET /search?q=tên lửa&size=10&source=vnexpress&from=2024-01-01&to=2024-12-31&fields=summary
+    GET /search?cursor=...           Trang tiếp theo
+    GET /facets?q=tên lửa            Số bài theo source, category, tháng
+    GET /doc/<id>?fields=summary     Một bài theo _id
+    GET /health
+
+Requests run on a thread pool over one ElasticIndexer: a shared, pooled ES
+client, the search cache, and an MSearchBatcher that coalesces the queries
+arriving within search_batch_wait_ms into one _msearch request
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import json
+import time
+
+from aiohttp import web
+
+from crawler.metrics import metrics, start_metrics
+from elastic_indexer import ElasticIndexer
+from utils.utils import get_config
+
+
+MAX_PAGE_SIZE = 100
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status,
+                             dumps=functools.partial(json.dumps, ensure_ascii=False, default=str))
+
+
+def parse_fields(value, default="summary"):
+    """'summary', 'all' (whole _source) or a comma separated list of fields"""
+    value = value or default
+    if value == "all":
+        return None
+    if value == "summary":
+        return value
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def parse_size(value, default=10):
+    try:
+        size = int(value) if value else default
+    except ValueError:
+        raise ValueError(f"Invalid size: {value}")
+    return max(0, min(size, MAX_PAGE_SIZE))
+
+
+class SearchService:
+    """aiohttp application exposing ElasticIndexer search, facets and document lookup"""
+
+    def __init__(self, indexer, workers=64, cors_origin=None):
+        """
+            indexer: ElasticIndexer (search cache / batching already enabled)
+            workers: Threads running indexer calls; bounds the searches in progress
+            cors_origin: Value of Access-Control-Allow-Origin (None = no CORS header)
+        """
+        self.indexer = indexer
+        self.cors_origin = cors_origin
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.router.add_get("/search", self.handle_search)
+        self.app.router.add_get("/facets", self.handle_facets)
+        self.app.router.add_get("/doc/{doc_id}", self.handle_doc)
+        self.app.router.add_get("/health", self.handle_health)
+        self.app.on_cleanup.append(self._cleanup)
+
+    async def _call(self, func, *args, **kwargs):
+        # ElasticIndexer là code đồng bộ: chạy trong thread pool để không chặn event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else "unknown"
+        with metrics.stage("http_request", route) as m:
+            try:
+                response = await handler(request)
+            except web.HTTPException as e:
+                m.outcome = "http_error"
+                response = json_response({"error": e.reason}, status=e.status)
+            except ValueError as e:
+                m.outcome = "http_error"
+                response = json_response({"error": str(e)}, status=400)
+            except Exception as e:
+                m.outcome = "error"
+                response = json_response({"error": f"Search backend error: {e}"}, status=502)
+        if self.cors_origin:
+            response.headers["Access-Control-Allow-Origin"] = self.cors_origin
+        return response
+
+    async def handle_search(self, request):
+        query = request.query
+        start = time.perf_counter()
+        if query.get("cursor"):
+            page = await self._call(self.indexer.search_page, cursor=query["cursor"])
+        else:
+            page = await self._call(
+                self.indexer.search_page, query.get("q"), size=parse_size(query.get("size")),
+                source=query.get("source"), from_date=query.get("from"), to_date=query.get("to"),
+                mode=query.get("mode"), fields=parse_fields(query.get("fields")))
+        page["took_ms"] = round(1000 * (time.perf_counter() - start), 2)
+        return json_response(page)
+
+    async def handle_facets(self, request):
+        query = request.query
+        facets = await self._call(
+            self.indexer.facets, query.get("q"), source=query.get("source"), from_date=query.get("from"),
+            to_date=query.get("to"), size=parse_size(query.get("size"), default=20),
+            interval=query.get("interval", "month"))
+        return json_response(facets)
+
+    async def handle_doc(self, request):
+        fields = parse_fields(request.query.get("fields"), default="all")
+        document = await self._call(self.indexer.get_document, request.match_info["doc_id"], fields=fields)
+        if document is None:
+            raise web.HTTPNotFound(reason="Document not found")
+        return json_response(document)
+
+    async def handle_health(self, request):
+        health = {"index": self.indexer.read_index}
+        if self.indexer.search_cache:
+            health["cache"] = {**self.indexer.search_cache.stats, "entries": len(self.indexer.search_cache),
+                               "hit_rate": round(self.indexer.search_cache.hit_rate(), 4)}
+        if self.indexer.search_batcher:
+            health["msearch"] = {**self.indexer.search_batcher.stats,
+                                 "mean_batch": round(self.indexer.search_batcher.batch_size(), 2)}
+        return json_response(health)
+
+    async def _cleanup(self, app):
+        self.executor.shutdown(wait=False)
+        self.indexer.close()
+
+
+def create_service(config):
+    """SearchService from the YAML config (es_* and search_* keys)"""
+    workers = config.get('search_workers', 64)
+    indexer = ElasticIndexer(
+        es_url=config.get('es_url', 'http://localhost:9200'),
+        username=config.get('es_username'),
+        password=config.get('es_password'),
+        index_name=config.get('es_index', 'news_quansu'),
+        connections_per_node=config.get('es_connections', 32),
+        partition=config.get('es_partition')
+    )
+    indexer.enable_search_cache(
+        max_entries=config.get('search_cache_entries', 4096),
+        ttl=config.get('search_cache_ttl', 300)
+    )
+    if config.get('search_batch', True):
+        indexer.enable_search_batching(
+            max_wait=config.get('search_batch_wait_ms', 5) / 1000,
+            max_batch=config.get('search_batch_max', 64),
+            max_in_flight=config.get('search_batch_in_flight', 4)
+        )
+    return SearchService(indexer, workers=workers, cors_origin=config.get('search_cors_origin'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="News search HTTP service")
+    parser.add_argument("--config", default="config_quansu.yml", help="Config file")
+    parser.add_argument("--host", help="Default: search_host or 127.0.0.1")
+    parser.add_argument("--port", type=int, help="Default: search_port or 8080")
+    args = parser.parse_args()
+
+    config = get_config(args.config)
+    metrics_services = start_metrics(config)
+    service = create_service(config)
+    try:
+        web.run_app(service.app, host=args.host or config.get('search_host', '127.0.0.1'),
+                    port=args.port or config.get('search_port', 8080))
+    finally:
+        for metrics_service in metrics_services:
+            metrics_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
+import re
 import requests
+from functools import lru_cache
 
-from bs4 import BeautifulSoup, NavigableString
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer
+
+
+# Ưu tiên parser viết bằng C, html.parser luôn có sẵn
+HTML_PARSERS = ("lxml", "html.parser", "html5lib")
 
 
 def get_text_from_tag(tag):
@@ -8,4 +14,41 @@ def get_text_from_tag(tag):
         return tag
                     
     # else if isinstance(tag, Tag):
-    return tag.text
\ No newline at end of file
+    return tag.text
+
+
+@lru_cache(maxsize=None)
+def resolve_parser(name):
+    """Return name if that BeautifulSoup tree builder is installed, otherwise html.parser"""
+    if name not in HTML_PARSERS:
+        raise ValueError(f"Unknown html_parser: {name}. Available: {list(HTML_PARSERS)}")
+
+    try:
+        BeautifulSoup("", name)
+        return name
+    except Exception:
+        print(f"html_parser '{name}' is not installed, falling back to html.parser")
+        return "html.parser"
+
+
+def class_strainer(*classes):
+    """
+    SoupStrainer keeping only tags (and their subtrees) having one of classes.
+    Matches the raw class attribute with a regex so multi-class tags such as
+    'title-page detail' work on every bs4 version
+    """
+    pattern = r"(?:^|\s)(?:%s)(?:\s|$)" % "|".join(re.escape(c) for c in classes)
+    return SoupStrainer(attrs={"class": re.compile(pattern)})
+
+
+def make_soup(content, parser="html.parser", parse_only=None, encoding=None):
+    """
+    Build a (possibly partial) tree
+    @param content (bytes): raw HTML
+    @param parser (str): tree builder, see resolve_parser
+    @param parse_only (SoupStrainer): only materialise matching tags
+    @param encoding (str): known charset, skips encoding detection
+    """
+    if isinstance(content, str):
+        encoding = None
+    return BeautifulSoup(content, parser, parse_only=parse_only, from_encoding=encoding)
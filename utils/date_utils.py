@@ -1,65 +1,104 @@
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 
-def parse_qdnd_date(date_str):
+# Giờ Việt Nam: ngày không ghi múi giờ hiểu theo GMT+7, mọi timestamp được quy về múi giờ này
+TIME_ZONE = "+07:00"
+VN_TZ = timezone(timedelta(hours=7))
+
+# "Thứ ba, 30/12/2025, 14:30 (GMT+7)" (vnexpress), "Thứ hai, 12/03/2024 - 10:30" (dantri),
+# "12/03/2024 10:30" (vietnamnet); giờ và múi giờ có thể thiếu
+DMY_RE = re.compile(
+    r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4})"
+    r"(?:[\s,|-]*(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?)?"
+    r"(?:[^\d]*?GMT\s*(?P<tz_sign>[+-])(?P<tz_hour>\d{1,2})(?::?(?P<tz_minute>\d{2}))?)?"
+)
+# "2025-05-27T06:31:00+07:00" (qdnd, ld+json / <time datetime>)
+ISO_RE = re.compile(
+    r"(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})"
+    r"(?:[T ](?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?(?:\.\d+)?)?"
+    r"\s*(?:(?P<utc>Z)|(?P<tz_sign>[+-])(?P<tz_hour>\d{2}):?(?P<tz_minute>\d{2}))?"
+)
+
+# Pattern của từng trang, thử trước; các pattern còn lại dùng cho ngày đã được định dạng lại
+# (vd. qdnd lưu "Thứ hai, 27/05/2025, 06:31 (GMT+7)") hoặc nguồn không biết
+SITE_PATTERNS = {
+    "vnexpress": (DMY_RE,),
+    "dantri": (DMY_RE,),
+    "vietnamnet": (DMY_RE,),
+    "qdnd": (ISO_RE,),
+}
+FALLBACK_PATTERNS = (DMY_RE, ISO_RE)
+
+
+@lru_cache(maxsize=8192)
+def parse_date(date_str, source=None):
     """
-    Parse QDND date format: 2025-05-27T06:31:00+07:00
+    Publish date scraped as free text -> timezone-aware datetime in GMT+7
+    (None if no date is found). Memoised: listing and article pages repeat
+    the same strings
     """
-    try:
-        if '+' in date_str:
-            date_str = date_str.split('+')[0]
-        elif 'Z' in date_str:
-            date_str = date_str.replace('Z', '')
-
-        return datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S")
-    except:
+    if not date_str or date_str == "N/A":
         return None
+    site_patterns = SITE_PATTERNS.get(source, ())
+    for pattern in site_patterns + tuple(p for p in FALLBACK_PATTERNS if p not in site_patterns):
+        match = pattern.search(date_str)
+        if match:
+            dt = _to_datetime(match)
+            if dt:
+                return dt
+    return None
 
 
-def parse_dantri_date(date_str):
-    """Parse DanTri date format"""
+def _to_datetime(match):
+    g = match.groupdict()
+    if g.get("utc"):
+        tz = timezone.utc
+    elif g["tz_sign"]:
+        offset = timedelta(hours=int(g["tz_hour"]), minutes=int(g["tz_minute"] or 0))
+        tz = timezone(-offset if g["tz_sign"] == "-" else offset)
+    else:
+        tz = VN_TZ
     try:
-        return datetime.strptime(date_str, "%d/%m/%Y %H:%M %Z")
-    except:
-        try:
-            return datetime.strptime(date_str, "%d/%m/%Y")
-        except:
-            return None
+        dt = datetime(int(g["year"]), int(g["month"]), int(g["day"]), int(g["hour"] or 0),
+                      int(g["minute"] or 0), int(g["second"] or 0), tzinfo=tz)
+    except ValueError:
+        return None  # 31/02/...
+    return dt.astimezone(VN_TZ)
 
 
-def parse_vietnamnet_date(date_str):
-    """Parse VietnamNet date format"""
+def timestamp_to_iso(value):
+    """Unix timestamp (e.g. data-publishtime of a listing item) -> ISO 8601 in GMT+7, None if invalid"""
     try:
-        return datetime.strptime(date_str, "%d/%m/%Y %H:%M")
-    except:
+        return datetime.fromtimestamp(int(value), VN_TZ).isoformat()
+    except (TypeError, ValueError, OverflowError, OSError):
         return None
 
 
-def parse_vnexpress_date(date_str):
-    """Parse VNExpress date format"""
-    try:
-        # Format: "Thứ ba, 30/12/2025, 14:30 (GMT+7)"
-        date_str = date_str.split(',')[-2].strip()  # Lấy phần "30/12/2025"
-        return datetime.strptime(date_str, "%d/%m/%Y")
-    except:
-        return None
+def normalize_date(date_str, source=None):
+    """
+    ISO 8601 publish date with offset, e.g.
+    'Thứ ba, 30/12/2025, 14:30 (GMT+7)' -> '2025-12-30T14:30:00+07:00' (None if no date)
+    """
+    dt = parse_date(date_str, source)
+    return dt.isoformat() if dt else None
 
 
-def is_recent_article(date_str, max_days_old, parse_func):
+def is_recent_article(date_str, max_days_old, source=None):
     """
     Kiểm tra xem bài viết có trong khoảng max_days_old ngày không
+    (max_days_old có thể lẻ: 0.5 = 12 giờ)
     """
-    article_date = parse_func(date_str)
+    article_date = parse_date(date_str, source)
     if not article_date:
         return True  # Nếu không parse được, coi như là mới
-
-    days_old = (datetime.now() - article_date).days
-    return days_old <= max_days_old
+    return datetime.now(VN_TZ) - article_date <= timedelta(days=max_days_old)
 
 
-def get_days_old(date_str, parse_func):
+def get_days_old(date_str, source=None):
     """Tính số ngày từ ngày xuất bản đến hiện tại"""
-    article_date = parse_func(date_str)
+    article_date = parse_date(date_str, source)
     if not article_date:
         return None
-    return (datetime.now() - article_date).days
\ No newline at end of file
+    return (datetime.now(VN_TZ) - article_date).days